@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_idmap'))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+import filter_gpred
+import xml_backend as xml
+from wmap import SourceGraphWMAP
+from pipeline import preset_pipeline
+from dmrs_preprocess import iter_file
+
+from generate import CorpusGenerator
+
+
+GPRED_FILTER_FILE = os.path.join(ROOT, 'dmrs_preprocess', 'config', 'gpred_filter')
+
+
+def process_corpus(corpus, backend):
+    """
+    Run the full preprocessing pipeline and word mapping on a corpus with the given XML backend, and cycle removal on
+    the output of a separate labelling pass.
+    :param corpus: List of (dmrs, untok, tok) tuples
+    :param backend: XML backend name
+    :return: List of (preprocessed DMRS, word mapped DMRS, second pass DMRS) string tuples
+    """
+
+    xml.use_backend(backend)
+
+    pipeline = preset_pipeline(token_align_opt=True,
+                               unaligned_align_opt=True,
+                               label_opt=True,
+                               handle_ltop_opt=True,
+                               gpred_filter=filter_gpred.parse_gpred_filter_file(GPRED_FILTER_FILE),
+                               gpred_curb_opt=3,
+                               cycle_remove_opt=True,
+                               attach_untok=True,
+                               attach_tok=True)
+
+    # Second pass removing cycles from DMRS that were labelled by an earlier run, as when the preprocessing is split
+    # into two invocations of dmrs_preprocess
+    first_pass = preset_pipeline(token_align_opt=True, label_opt=True, handle_ltop_opt=True)
+    second_pass = preset_pipeline(cycle_remove_opt=True)
+
+    wmap = SourceGraphWMAP()
+    outputs = []
+
+    for dmrs, untok, tok in corpus:
+        dmrs_processed = pipeline.run(dmrs, untok, tok)
+        dmrs_mapped = xml.tostring(wmap.wmap_sentence(xml.fromstring(dmrs_processed)), encoding='utf-8')
+
+        dmrs_labelled = first_pass.run(dmrs, untok, tok)
+        dmrs_second_pass = second_pass.run(dmrs_labelled.decode('utf-8'), untok, tok)
+
+        outputs.append((dmrs_processed, dmrs_mapped, dmrs_second_pass))
+
+    return outputs
+
+
+def check_backends(corpus):
+    """
+    Check that lxml and ElementTree produce byte-identical output on a corpus.
+    :param corpus: List of (dmrs, untok, tok) tuples
+    :return: List of indexes of sentences with differing output
+    """
+
+    etree_outputs = process_corpus(corpus, 'etree')
+    lxml_outputs = process_corpus(corpus, 'lxml')
+
+    return [index for index, (etree_output, lxml_output) in enumerate(zip(etree_outputs, lxml_outputs))
+            if etree_output != lxml_output]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Check that the lxml and ElementTree XML backends produce the same '
+                                                 'output.')
+    parser.add_argument('-i', '--input', default=None,
+                        help='Check on an existing corpus in input.dmrs, input.untok and input.tok instead of a '
+                             'generated one.')
+    parser.add_argument('-n', '--sentences', default=200, type=int, help='Number of generated sentences.')
+    parser.add_argument('--seed', default=0, type=int, help='Random seed.')
+
+    args = parser.parse_args()
+
+    if xml.lxml_etree is None:
+        sys.stderr.write('lxml is not installed.\n')
+        sys.exit(1)
+
+    if args.input is not None:
+        corpus = zip(iter_file(args.input + '.dmrs', format='dmrs'),
+                     iter_file(args.input + '.untok', format='untok'),
+                     iter_file(args.input + '.tok', format='tok'))
+
+    else:
+        # Unusual characters and whitespace exercise escaping differences between the serializers
+        generator = CorpusGenerator(unknown_rate=0.2, seed=args.seed)
+        corpus = []
+
+        for dmrs, untok, tok in generator.corpus(args.sentences):
+            untok = untok.decode('utf-8').replace(u' ', u'\t', 1) + u' \xe9&<>"\'\r'
+            corpus.append((dmrs.decode('utf-8'), untok, [token.decode('utf-8') for token in tok]))
+
+    differing = check_backends(corpus)
+
+    if differing:
+        sys.stderr.write('Output differs for %d of %d sentences, first at sentence %d.\n' %
+                         (len(differing), len(corpus), differing[0]))
+        sys.exit(1)
+
+    sys.stderr.write('Output is identical for all %d sentences.\n' % len(corpus))
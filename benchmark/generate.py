@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+
+import random
+import argparse
+import xml.etree.ElementTree as xml
+
+
+NOUNS = ['dog', 'cat', 'table', 'idea', 'river', 'teacher', 'garden', 'letter', 'window', 'city', 'book', 'farmer',
+         'road', 'song', 'child', 'market', 'storm', 'engine', 'bridge', 'doctor']
+VERBS = [('see', 'saw'), ('chase', 'chased'), ('find', 'found'), ('build', 'built'), ('write', 'wrote'),
+         ('visit', 'visited'), ('paint', 'painted'), ('follow', 'followed'), ('carry', 'carried'), ('love', 'loved')]
+INTRANSITIVE_VERBS = [('sleep', 'slept'), ('arrive', 'arrived'), ('laugh', 'laughed'), ('wait', 'waited')]
+ADJECTIVES = ['old', 'red', 'quiet', 'large', 'strange', 'happy', 'wet', 'bright']
+NAMES = ['Kim', 'Sandy', 'Lee', 'Pat', 'Robin', 'Alex']
+PRONOUNS = [('it', 'sg'), ('they', 'pl')]
+UNKNOWN_WORDS = [('flurbed', 'VBD', 'v'), ('zorpings', 'NNS', 'n'), ('blickish', 'JJ', 'a'), ('quonked', 'VBN', 'v')]
+
+# Function words that ACE does not turn into nodes and that the unaligned token heuristics try to align
+AUXILIARIES = [('did', 'past'), ('will', 'fut'), ('has', 'pres'), ('does', 'pres')]
+
+
+class SentenceBuilder(object):
+    """
+    Build a DMRS together with the untokenized and tokenized sentence it aligns to.
+    """
+
+    def __init__(self):
+        self.untok = ''
+        self.tok = []
+        self.nodes = []
+        self.links = []
+        self.next_nodeid = 10000
+
+    def add_word(self, word):
+        """
+        Append a word to the sentence.
+        :return: Tuple of (cfrom, cto) character span
+        """
+
+        if self.untok:
+            self.untok += ' '
+
+        cfrom = len(self.untok)
+        self.untok += word
+        self.tok.append(word)
+
+        return cfrom, len(self.untok)
+
+    def add_punctuation(self, mark):
+        self.untok += mark
+        self.tok.append(mark)
+
+    def add_realpred(self, span, lemma, pos, sense=None, sortinfo=None):
+        attrib = {'lemma': lemma, 'pos': pos}
+
+        if sense is not None:
+            attrib['sense'] = sense
+
+        return self._add_node(span, ('realpred', attrib), sortinfo)
+
+    def add_gpred(self, span, gpred, sortinfo=None, carg=None):
+        return self._add_node(span, ('gpred', gpred), sortinfo, carg=carg)
+
+    def _add_node(self, span, pred, sortinfo, carg=None):
+        nodeid = str(self.next_nodeid)
+        self.next_nodeid += 1
+        self.nodes.append((nodeid, span, pred, sortinfo or {}, carg))
+        return nodeid
+
+    def add_link(self, from_nodeid, to_nodeid, rargname, post):
+        self.links.append((from_nodeid, to_nodeid, rargname, post))
+
+    def to_xml(self, index):
+        """
+        Serialize the DMRS in the layout written by mrs_to_dmrs.
+        :param index: Node id of the DMRS index
+        :return: DMRS XML string
+        """
+
+        dmrs_xml = xml.Element('dmrs', {'cfrom': '-1', 'cto': '-1', 'index': index})
+        dmrs_xml.text = '\n'
+
+        for nodeid, (cfrom, cto), (pred_tag, pred), sortinfo, carg in self.nodes:
+            node = xml.SubElement(dmrs_xml, 'node', {'nodeid': nodeid, 'cfrom': str(cfrom), 'cto': str(cto)})
+
+            if carg is not None:
+                node.attrib['carg'] = carg
+
+            if pred_tag == 'realpred':
+                xml.SubElement(node, 'realpred', pred)
+            else:
+                xml.SubElement(node, 'gpred').text = pred
+
+            xml.SubElement(node, 'sortinfo', sortinfo)
+            node.tail = '\n'
+
+        for from_nodeid, to_nodeid, rargname, post in self.links:
+            link = xml.SubElement(dmrs_xml, 'link', {'from': from_nodeid, 'to': to_nodeid})
+            xml.SubElement(link, 'rargname').text = rargname
+            xml.SubElement(link, 'post').text = post
+            link.tail = '\n'
+
+        return xml.tostring(dmrs_xml, encoding='utf-8')
+
+
+def noun_sortinfo(num='sg'):
+    return {'cvarsort': 'x', 'ind': '+', 'num': num, 'pers': '3'}
+
+
+def event_sortinfo(tense='past'):
+    return {'cvarsort': 'e', 'mood': 'indicative', 'perf': '-', 'prog': '-', 'sf': 'prop', 'tense': tense}
+
+
+class CorpusGenerator(object):
+
+    def __init__(self, nodes=30, gpred_density=0.3, reentrancy=0.3, unknown_rate=0.05, unaligned_rate=0.2, seed=0):
+        """
+        Generator of synthetic DMRS graphs with matching untokenized and tokenized sentences.
+        :param nodes: Approximate number of nodes per DMRS
+        :param gpred_density: Probability that a noun phrase is built from general predicates (proper names, bare
+         plurals, compounds, pronouns)
+        :param reentrancy: Probability that a clause contains a reentrancy (control verb, verb conjunction with
+         a shared subject or an EQ modifier), each of which creates a cycle
+        :param unknown_rate: Probability that a content word is an unknown word (e.g. lemma="flurbed/VBD")
+        :param unaligned_rate: Probability that a verb is preceded by an auxiliary that has no node of its own
+        :param seed: Random seed
+        """
+
+        self.nodes = nodes
+        self.gpred_density = gpred_density
+        self.reentrancy = reentrancy
+        self.unknown_rate = unknown_rate
+        self.unaligned_rate = unaligned_rate
+        self.random = random.Random(seed)
+        self.pending_adjectives = []
+
+    def sentence(self):
+        """
+        Generate a single sentence.
+        :return: Tuple of (DMRS XML string, untokenized sentence string, list of tokens)
+        """
+
+        builder = SentenceBuilder()
+        top = self.clause(builder)
+
+        while len(builder.nodes) < self.nodes:
+            # Subordinate a new clause to the sentence so far, keeping the graph connected
+            span = builder.add_word('because')
+            subord = builder.add_realpred(span, 'because', 'x', sortinfo=event_sortinfo('untensed'))
+            verb = self.clause(builder)
+
+            builder.add_link(subord, top, 'ARG1', 'H')
+            builder.add_link(subord, verb, 'ARG2', 'H')
+            top = subord
+
+        builder.add_punctuation('.')
+        builder.add_link('0', top, '', 'H')
+
+        return builder.to_xml(top), builder.untok, builder.tok
+
+    def clause(self, builder):
+        """
+        Generate a clause with a subject, one or two verbs and an optional object.
+        :return: Node id of the main verb
+        """
+
+        subject = self.noun_phrase(builder)
+
+        reentrancy = None
+        if self.random.random() < self.reentrancy:
+            reentrancy = self.random.choice(['control', 'conjunction', 'eq'])
+
+        if reentrancy == 'control':
+            # Subject control: "X tried to V Y", the subject is shared by both verbs
+            span = builder.add_word('tried')
+            control_verb = builder.add_realpred(span, 'try', 'v', '1', event_sortinfo())
+            builder.add_word('to')
+            verb = self.verb(builder, tense='untensed')
+
+            builder.add_link(control_verb, subject, 'ARG1', 'NEQ')
+            builder.add_link(control_verb, verb, 'ARG2', 'H')
+            builder.add_link(verb, subject, 'ARG1', 'NEQ')
+            main_verb = control_verb
+
+        elif reentrancy == 'conjunction':
+            # Verb conjunction: "X V1 and V2 Y", the subject is shared by both verbs
+            left_verb = self.verb(builder, intransitive=True)
+            span = builder.add_word('and')
+            conj = builder.add_realpred(span, 'and', 'c', sortinfo=event_sortinfo())
+            verb = self.verb(builder)
+
+            builder.add_link(left_verb, subject, 'ARG1', 'NEQ')
+            builder.add_link(verb, subject, 'ARG1', 'NEQ')
+            builder.add_link(conj, left_verb, 'L-INDEX', 'NEQ')
+            builder.add_link(conj, verb, 'R-INDEX', 'NEQ')
+            builder.add_link(conj, left_verb, 'L-HNDL', 'HEQ')
+            builder.add_link(conj, verb, 'R-HNDL', 'HEQ')
+            main_verb = conj
+
+        else:
+            verb = self.verb(builder)
+            builder.add_link(verb, subject, 'ARG1', 'NEQ')
+            main_verb = verb
+
+        obj = self.noun_phrase(builder)
+        builder.add_link(verb, obj, 'ARG2', 'NEQ')
+
+        if reentrancy == 'eq':
+            # Prepositional modifier of the verb whose object is the subject: "X V Y with X"
+            span = builder.add_word('with')
+            prep = builder.add_realpred(span, 'with', 'p', sortinfo=event_sortinfo('untensed'))
+            builder.add_link(prep, verb, 'ARG1', 'EQ')
+            builder.add_link(prep, subject, 'ARG2', 'NEQ')
+            builder.add_word(self.random.choice(['them', 'him', 'her']))
+
+        return main_verb
+
+    def verb(self, builder, tense='past', intransitive=False):
+
+        if tense != 'untensed' and self.random.random() < self.unaligned_rate:
+            auxiliary, tense = self.random.choice(AUXILIARIES)
+            builder.add_word(auxiliary)
+            untensed = True
+        else:
+            untensed = tense == 'untensed'
+
+        if self.random.random() < self.unknown_rate:
+            word, tag, _ = self.random.choice([entry for entry in UNKNOWN_WORDS if entry[2] == 'v'])
+            span = builder.add_word(word)
+            return builder.add_realpred(span, '%s/%s' % (word, tag), 'u', 'unknown', event_sortinfo(tense))
+
+        lemma, past = self.random.choice(INTRANSITIVE_VERBS if intransitive else VERBS)
+        span = builder.add_word(lemma if untensed else past)
+        return builder.add_realpred(span, lemma, 'v', '1', event_sortinfo(tense))
+
+    def noun_phrase(self, builder):
+        """
+        Generate a noun phrase with its quantifier.
+        :return: Node id of the head noun
+        """
+
+        self.pending_adjectives = []
+
+        if self.random.random() < self.gpred_density:
+            kind = self.random.choice(['proper', 'bare_plural', 'compound', 'pronoun'])
+        else:
+            kind = 'definite'
+
+        if kind == 'proper':
+            name = self.random.choice(NAMES)
+            span = builder.add_word(name)
+            quantifier = builder.add_gpred(span, 'proper_q')
+            noun = builder.add_gpred(span, 'named', noun_sortinfo(), carg='"%s"' % name)
+
+        elif kind == 'pronoun':
+            pronoun, num = self.random.choice(PRONOUNS)
+            span = builder.add_word(pronoun)
+            quantifier = builder.add_gpred(span, 'pronoun_q')
+            noun = builder.add_gpred(span, 'pron', noun_sortinfo(num))
+
+        elif kind == 'bare_plural':
+            start = len(builder.untok) + 1 if builder.untok else 0
+            self.adjectives(builder)
+            noun, (_, end) = self.noun(builder, num='pl')
+            quantifier = builder.add_gpred((start, end), 'udef_q')
+
+        elif kind == 'compound':
+            span = builder.add_word('the')
+            quantifier = builder.add_realpred(span, 'the', 'q')
+            modifier, (modifier_start, _) = self.noun(builder)
+            noun, (_, end) = self.noun(builder)
+            modifier_quantifier = builder.add_gpred((modifier_start, end), 'udef_q')
+            compound = builder.add_gpred((modifier_start, end), 'compound', event_sortinfo('untensed'))
+            builder.add_link(modifier_quantifier, modifier, 'RSTR', 'H')
+            builder.add_link(compound, noun, 'ARG1', 'EQ')
+            builder.add_link(compound, modifier, 'ARG2', 'NEQ')
+
+        else:
+            span = builder.add_word('the')
+            quantifier = builder.add_realpred(span, 'the', 'q')
+            self.adjectives(builder)
+            noun, _ = self.noun(builder)
+
+        builder.add_link(quantifier, noun, 'RSTR', 'H')
+
+        for adjective in self.pending_adjectives:
+            builder.add_link(adjective, noun, 'ARG1', 'EQ')
+
+        return noun
+
+    def adjectives(self, builder):
+        while self.random.random() < 0.3:
+            adjective = self.random.choice(ADJECTIVES)
+            span = builder.add_word(adjective)
+            self.pending_adjectives.append(builder.add_realpred(span, adjective, 'a', '1', event_sortinfo('untensed')))
+
+    def noun(self, builder, num='sg'):
+        """
+        :return: Tuple of (node id, character span)
+        """
+
+        if self.random.random() < self.unknown_rate:
+            word, tag, _ = self.random.choice([entry for entry in UNKNOWN_WORDS if entry[2] == 'n'])
+            word_span = builder.add_word(word)
+            nodeid = builder.add_realpred(word_span, '%s/%s' % (word, tag), 'u', 'unknown', noun_sortinfo(num))
+
+        else:
+            lemma = self.random.choice(NOUNS)
+            word_span = builder.add_word(lemma + 's' if num == 'pl' else lemma)
+            nodeid = builder.add_realpred(word_span, lemma, 'n', '1', noun_sortinfo(num))
+
+        return nodeid, word_span
+
+    def corpus(self, sentences):
+        """
+        :param sentences: Number of sentences
+        :return: Generator of (DMRS XML string, untokenized sentence string, list of tokens) tuples
+        """
+
+        for _ in xrange(sentences):
+            yield self.sentence()
+
+
+def write_corpus(prefix, corpus):
+    """
+    Write a corpus to prefix.dmrs, prefix.untok and prefix.tok in the formats read by dmrs_preprocess.
+    """
+
+    with open(prefix + '.dmrs', 'wb') as dmrs_file, \
+            open(prefix + '.untok', 'wb') as untok_file, \
+            open(prefix + '.tok', 'wb') as tok_file:
+
+        for dmrs, untok, tok in corpus:
+            dmrs_file.write('%s\n\n' % dmrs)
+            untok_file.write('%s\n' % untok)
+            tok_file.write('%s\n' % ' '.join(tok))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Synthetic DMRS corpus generator.')
+    parser.add_argument('-n', '--sentences', default=1000, type=int, help='Number of sentences.')
+    parser.add_argument('--nodes', default=30, type=int, help='Approximate number of nodes per DMRS.')
+    parser.add_argument('--gpred_density', default=0.3, type=float,
+                        help='Probability that a noun phrase is built from general predicates.')
+    parser.add_argument('--reentrancy', default=0.3, type=float,
+                        help='Probability that a clause contains a reentrancy creating a cycle.')
+    parser.add_argument('--unknown_rate', default=0.05, type=float,
+                        help='Probability that a content word is an unknown word.')
+    parser.add_argument('--unaligned_rate', default=0.2, type=float,
+                        help='Probability that a verb is preceded by an auxiliary without a node.')
+    parser.add_argument('--seed', default=0, type=int, help='Random seed.')
+    parser.add_argument('output_prefix', help='Output files are written to output_prefix.dmrs, .untok and .tok')
+
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(nodes=args.nodes,
+                                gpred_density=args.gpred_density,
+                                reentrancy=args.reentrancy,
+                                unknown_rate=args.unknown_rate,
+                                unaligned_rate=args.unaligned_rate,
+                                seed=args.seed)
+
+    write_corpus(args.output_prefix, generator.corpus(args.sentences))
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import argparse
+import platform
+from timeit import default_timer
+from itertools import izip
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_idmap'))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+import token_align
+import unaligned_tokens_align
+import filter_gpred
+import cycle_remove
+import label
+import handle_ltop
+import xml_backend as xml
+from wmap import SourceGraphWMAP
+from pipeline import Pipeline, preset_pipeline
+from dmrs_preprocess import iter_file
+
+from generate import CorpusGenerator
+
+
+GPRED_FILTER_FILE = os.path.join(ROOT, 'dmrs_preprocess', 'config', 'gpred_filter')
+
+
+def run_handle_ltop(dmrs_xml, untok, tok, context):
+    return handle_ltop.handle_ltop_links(dmrs_xml)
+
+
+def run_filter_gpred(dmrs_xml, untok, tok, context):
+    return filter_gpred.filter_gpred(dmrs_xml, context['gpred_filter'], handle_ltop=True)
+
+
+def run_token_align(dmrs_xml, untok, tok, context):
+    return token_align.align(dmrs_xml, untok, tok)
+
+
+def run_unaligned_tokens_align(dmrs_xml, untok, tok, context):
+    return unaligned_tokens_align.align(dmrs_xml, tok)
+
+
+def run_gpred_curb(dmrs_xml, untok, tok, context):
+    return filter_gpred.curb_gpred_spans(dmrs_xml)
+
+
+def run_label(dmrs_xml, untok, tok, context):
+    return label.create_label(dmrs_xml, carg_clean=True)
+
+
+def run_cycle_remove(dmrs_xml, untok, tok, context):
+    return cycle_remove.cycle_remove(dmrs_xml)
+
+
+def run_wmap_sentence(dmrs_xml, untok, tok, context):
+    return context['wmap'].wmap_sentence(dmrs_xml)
+
+
+# Stages in pipeline order as (name, function, timed). Every stage runs on the output of the stages before it,
+# untimed stages only prepare input for the following ones.
+BENCHMARK_STAGES = [
+    ('handle_ltop.handle_ltop_links', run_handle_ltop, False),
+    ('filter_gpred.filter_gpred', run_filter_gpred, True),
+    ('token_align.align', run_token_align, True),
+    ('unaligned_tokens_align.align', run_unaligned_tokens_align, True),
+    ('filter_gpred.curb_gpred_spans', run_gpred_curb, False),
+    ('label.create_label', run_label, True),
+    ('cycle_remove.cycle_remove', run_cycle_remove, True),
+    ('SourceGraphWMAP.wmap_sentence', run_wmap_sentence, True),
+]
+
+
+def new_context(gpred_filter):
+    # Word maps grow as sentences are mapped, so every repetition starts with an empty one
+    return {'gpred_filter': gpred_filter, 'wmap': SourceGraphWMAP()}
+
+
+def time_stage(func, states, corpus, repeat, gpred_filter):
+    """
+    Time a stage over the whole corpus.
+    :param func: Stage function taking (dmrs_xml, untok, tok, context)
+    :param states: List of serialized DMRS produced by the preceding stages
+    :param corpus: List of (dmrs, untok, tok) tuples
+    :param repeat: Number of repetitions
+    :param gpred_filter: Set of general predicates to filter
+    :return: Tuple of (list of times in seconds, list of serialized output DMRS)
+    """
+
+    times = []
+    outputs = None
+
+    for _ in xrange(repeat):
+        # Stages modify DMRS in place, so every repetition parses a fresh copy outside of the timed region
+        inputs = [xml.fromstring(dmrs) for dmrs in states]
+        context = new_context(gpred_filter)
+
+        start = default_timer()
+        outputs = [func(dmrs_xml, untok, tok, context) for dmrs_xml, (_, untok, tok) in izip(inputs, corpus)]
+        times.append(default_timer() - start)
+
+    return times, [xml.tostring(dmrs_xml, encoding='utf-8') for dmrs_xml in outputs]
+
+
+def time_pipeline(pipeline, corpus, repeat):
+    times = []
+
+    for _ in xrange(repeat):
+        start = default_timer()
+
+        for dmrs, untok, tok in corpus:
+            pipeline.run(dmrs, untok, tok)
+
+        times.append(default_timer() - start)
+
+    return times
+
+
+def timing_result(times, sentences):
+    return OrderedDict([('time', min(times)),
+                        ('per_sentence', min(times) / sentences if sentences else 0.0),
+                        ('times', times)])
+
+
+def run_benchmark(corpus, repeat=3):
+    """
+    Time each public stage and the full pipeline on a corpus.
+    :param corpus: List of (dmrs, untok, tok) tuples
+    :param repeat: Number of repetitions. The fastest one is reported.
+    :return: Dictionary of results
+    """
+
+    gpred_filter = filter_gpred.parse_gpred_filter_file(GPRED_FILTER_FILE)
+
+    parsed = [Pipeline.parse(dmrs) for dmrs, _, _ in corpus]
+    states = [xml.tostring(dmrs_xml, encoding='utf-8') for dmrs_xml in parsed]
+
+    results = OrderedDict()
+    results['corpus'] = OrderedDict([('sentences', len(corpus)),
+                                     ('nodes', sum(len(dmrs_xml.findall('node')) for dmrs_xml in parsed)),
+                                     ('links', sum(len(dmrs_xml.findall('link')) for dmrs_xml in parsed))])
+    results['repeat'] = repeat
+    results['python'] = platform.python_version()
+    results['xml_backend'] = xml.backend_name()
+
+    stages = OrderedDict()
+    for name, func, timed in BENCHMARK_STAGES:
+        times, states = time_stage(func, states, corpus, repeat if timed else 1, gpred_filter)
+
+        if timed:
+            stages[name] = timing_result(times, len(corpus))
+
+    results['stages'] = stages
+
+    pipeline = preset_pipeline(token_align_opt=True,
+                               unaligned_align_opt=True,
+                               label_opt=True,
+                               handle_ltop_opt=True,
+                               gpred_filter=gpred_filter,
+                               gpred_curb_opt=3,
+                               cycle_remove_opt=True,
+                               attach_untok=True,
+                               attach_tok=True)
+
+    results['pipeline'] = timing_result(time_pipeline(pipeline, corpus, repeat), len(corpus))
+
+    return results
+
+
+def compare(results, baseline):
+    """
+    Format a comparison of benchmark results against baseline results.
+    :return: Comparison table string
+    """
+
+    rows = [(name, result['time'], baseline['stages'].get(name, {}).get('time'))
+            for name, result in results['stages'].items()]
+    rows.append(('pipeline', results['pipeline']['time'], baseline['pipeline']['time']))
+
+    lines = ['%-32s %10s %10s %8s' % ('', 'baseline', 'current', 'speedup')]
+
+    for name, time, baseline_time in rows:
+        if baseline_time is None:
+            lines.append('%-32s %10s %10.4f %8s' % (name, '-', time, '-'))
+        else:
+            lines.append('%-32s %10.4f %10.4f %7.2fx' % (name, baseline_time, time, baseline_time / time))
+
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark DMRS preprocessing stages.')
+    parser.add_argument('-i', '--input', default=None,
+                        help='Benchmark on an existing corpus in input.dmrs, input.untok and input.tok instead of '
+                             'a generated one.')
+    parser.add_argument('-n', '--sentences', default=200, type=int, help='Number of generated sentences.')
+    parser.add_argument('--nodes', default=30, type=int, help='Approximate number of nodes per generated DMRS.')
+    parser.add_argument('--gpred_density', default=0.3, type=float,
+                        help='Probability that a generated noun phrase is built from general predicates.')
+    parser.add_argument('--reentrancy', default=0.3, type=float,
+                        help='Probability that a generated clause contains a reentrancy creating a cycle.')
+    parser.add_argument('--unknown_rate', default=0.05, type=float,
+                        help='Probability that a generated content word is an unknown word.')
+    parser.add_argument('--unaligned_rate', default=0.2, type=float,
+                        help='Probability that a generated verb is preceded by an auxiliary without a node.')
+    parser.add_argument('--seed', default=0, type=int, help='Random seed.')
+    parser.add_argument('--xml_backend', default='auto', choices=xml.BACKENDS,
+                        help='XML parser and serializer. auto uses lxml if it is installed and ElementTree otherwise.')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='Number of repetitions of each measurement.')
+    parser.add_argument('-c', '--compare', default=None, help='Compare results against an earlier results file.')
+    parser.add_argument('-o', '--output', default='-', help='Results JSON file. Set "-" to output to standard output.')
+
+    args = parser.parse_args()
+
+    try:
+        xml.use_backend(args.xml_backend)
+
+    except ImportError as e:
+        parser.error(str(e))
+
+    if args.input is not None:
+        corpus = list(izip(iter_file(args.input + '.dmrs', format='dmrs'),
+                           iter_file(args.input + '.untok', format='untok'),
+                           iter_file(args.input + '.tok', format='tok')))
+        source = OrderedDict([('input', args.input)])
+
+    else:
+        generator = CorpusGenerator(nodes=args.nodes,
+                                    gpred_density=args.gpred_density,
+                                    reentrancy=args.reentrancy,
+                                    unknown_rate=args.unknown_rate,
+                                    unaligned_rate=args.unaligned_rate,
+                                    seed=args.seed)
+
+        corpus = [(dmrs.decode('utf-8'), untok.decode('utf-8'), [token.decode('utf-8') for token in tok])
+                  for dmrs, untok, tok in generator.corpus(args.sentences)]
+
+        source = OrderedDict([('nodes', args.nodes),
+                              ('gpred_density', args.gpred_density),
+                              ('reentrancy', args.reentrancy),
+                              ('unknown_rate', args.unknown_rate),
+                              ('unaligned_rate', args.unaligned_rate),
+                              ('seed', args.seed)])
+
+    results = run_benchmark(corpus, repeat=args.repeat)
+    results['corpus']['source'] = source
+
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'wb') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.compare is not None:
+        with open(args.compare, 'rb') as f:
+            baseline = json.load(f)
+
+        sys.stderr.write(compare(results, baseline) + '\n')
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+import os
+import gc
+import sys
+import math
+import json
+import argparse
+from timeit import default_timer
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+import token_align
+import filter_gpred
+import handle_ltop
+import label
+import cycle_remove
+import xml_backend as xml
+from graph import load_xml
+from unaligned_tokens_align import get_unaligned_tokens
+
+from generate import CorpusGenerator
+
+
+GPRED_FILTER_FILE = os.path.join(ROOT, 'dmrs_preprocess', 'config', 'gpred_filter')
+
+# Approximate graph sizes in nodes checked by default
+SIZES = [10, 25, 50, 100, 250, 500, 1000, 2000]
+
+
+def prepare_directed_cycle(dmrs, untok, tok, context):
+    dmrs_xml = label.create_label(handle_ltop.handle_ltop_links(xml.fromstring(dmrs)))
+    return lambda: load_xml(dmrs_xml).contains_directed_cycle()
+
+
+def prepare_undirected_cycle(dmrs, untok, tok, context):
+    dmrs_xml = label.create_label(handle_ltop.handle_ltop_links(xml.fromstring(dmrs)))
+    return lambda: load_xml(dmrs_xml).contains_undirected_cycle()
+
+
+def prepare_cycle_remove(dmrs, untok, tok, context):
+    dmrs_xml = label.create_label(handle_ltop.handle_ltop_links(xml.fromstring(dmrs)))
+    serialized = xml.tostring(dmrs_xml, encoding='utf-8')
+
+    # cycle_remove modifies the DMRS, so time it together with parsing and subtract the parsing time
+    context['baseline'] = lambda: xml.fromstring(serialized)
+    return lambda: cycle_remove.cycle_remove(xml.fromstring(serialized))
+
+
+def prepare_adjacent_nodes(dmrs, untok, tok, context):
+    dmrs_graph = load_xml(label.create_label(handle_ltop.handle_ltop_links(xml.fromstring(dmrs))))
+    return lambda: [dmrs_graph.get_adjacent_nodes(node) for node in dmrs_graph.nodes]
+
+
+def prepare_filter_gpred(dmrs, untok, tok, context):
+    dmrs_xml = handle_ltop.handle_ltop_links(xml.fromstring(dmrs))
+    serialized = xml.tostring(dmrs_xml, encoding='utf-8')
+
+    # filter_gpred modifies the DMRS, so time it together with parsing and subtract the parsing time
+    context['baseline'] = lambda: xml.fromstring(serialized)
+    return lambda: filter_gpred.filter_gpred(xml.fromstring(serialized), context['gpred_filter'])
+
+
+def prepare_unaligned_tokens(dmrs, untok, tok, context):
+    dmrs_xml = token_align.align(xml.fromstring(dmrs), untok, tok)
+    return lambda: get_unaligned_tokens(dmrs_xml, len(tok))
+
+
+def prepare_token_align(dmrs, untok, tok, context):
+    dmrs_xml = xml.fromstring(dmrs)
+    return lambda: token_align.align(dmrs_xml, untok, tok)
+
+
+# Algorithms as (name, function preparing a timed call, maximum growth exponent in the number of nodes).
+# Budgets declare the complexity of the current implementations with a margin for measurement noise. Lower them when
+# an algorithm improves, so that it cannot regress unnoticed, but keep them clear of the spread between runs: repeated
+# runs of cycle_remove fit exponents between 1.35 and 1.7, while the quadratic implementation it replaced fits 1.9 to
+# 2.0.
+ALGORITHMS = [
+    ('DmrsGraph.contains_directed_cycle', prepare_directed_cycle, 1.4),
+    ('DmrsGraph.contains_undirected_cycle', prepare_undirected_cycle, 1.4),
+    ('DmrsGraph.get_adjacent_nodes', prepare_adjacent_nodes, 1.5),
+    ('cycle_remove.cycle_remove', prepare_cycle_remove, 1.85),
+    ('filter_gpred.filter_gpred', prepare_filter_gpred, 2.5),
+    ('unaligned_tokens_align.get_unaligned_tokens', prepare_unaligned_tokens, 2.0),
+    ('token_align.align', prepare_token_align, 2.0),
+]
+
+
+def measure(func, min_time=0.05, repeat=3):
+    """
+    Measure the running time of a call, looping fast calls until min_time has passed. Garbage collection is disabled
+    while timing, as in timeit, since collections triggered by the number of live objects add time that grows with the
+    graph size.
+    :return: Minimum time of a single call over repetitions in seconds
+    """
+
+    best = None
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        for _ in xrange(repeat):
+            loops = 0
+            start = default_timer()
+
+            while True:
+                func()
+                loops += 1
+                elapsed = default_timer() - start
+
+                if elapsed >= min_time:
+                    break
+
+            best = min(best, elapsed / loops) if best is not None else elapsed / loops
+
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return best
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def fit_exponent(sizes, times):
+    """
+    Fit times = c * sizes ^ k by least squares in log-log space.
+    :return: Growth exponent k
+    """
+
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(time, 1e-9)) for time in times]
+
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+
+    covariance = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+    variance = sum((x - x_mean) ** 2 for x in xs)
+
+    return covariance / variance
+
+
+def check_scaling(sizes, fit_from=500, graphs_per_size=5, repeat=5, gpred_density=0.5, reentrancy=0.5, seed=0,
+                  algorithms=None):
+    """
+    Time each algorithm on single DMRS graphs of increasing size and fit growth exponents.
+    :param sizes: List of approximate node counts
+    :param fit_from: Smallest node count used for fitting, so that constant overheads of small graphs do not hide
+     the asymptotic behaviour
+    :param graphs_per_size: Number of different graphs timed at each size. Their times are averaged, which evens out
+     graph-dependent shortcuts (e.g. a search starting from a node that becomes isolated).
+    :param repeat: Number of times each graph is timed. The median time is used.
+    :param gpred_density: General predicate noun phrase probability of generated graphs
+    :param reentrancy: Reentrancy probability of generated graphs
+    :param seed: Random seed
+    :param algorithms: Names of algorithms to check, all by default
+    :return: Dictionary of results per algorithm
+    """
+
+    gpred_filter = filter_gpred.parse_gpred_filter_file(GPRED_FILTER_FILE)
+
+    # Graphs with the same seed share their first clauses, so larger graphs extend smaller ones
+    graphs = []
+    for size in sizes:
+        size_graphs = []
+
+        for graph_seed in xrange(seed, seed + graphs_per_size):
+            generator = CorpusGenerator(nodes=size, gpred_density=gpred_density, reentrancy=reentrancy, seed=graph_seed)
+            dmrs, untok, tok = generator.sentence()
+            size_graphs.append((len(xml.fromstring(dmrs).findall('node')), dmrs, untok.decode('utf-8'),
+                                [token.decode('utf-8') for token in tok]))
+
+        graphs.append(size_graphs)
+
+    results = OrderedDict()
+
+    for name, prepare, budget in ALGORITHMS:
+        if algorithms is not None and name not in algorithms:
+            continue
+
+        calls = []
+        for size_graphs in graphs:
+            size_calls = []
+
+            for nodes, dmrs, untok, tok in size_graphs:
+                context = {'gpred_filter': gpred_filter}
+                size_calls.append((prepare(dmrs, untok, tok, context), context.get('baseline')))
+
+            calls.append(size_calls)
+
+        # Sizes are timed in turns, so that slower periods of the machine affect all sizes alike instead of bending the
+        # fitted curve. The median over turns is kept for every call, which a single disturbed turn cannot move.
+        timings = [[[] for _ in timed_calls] for timed_calls in calls]
+
+        for _ in xrange(repeat):
+            for size_calls, size_timings in zip(calls, timings):
+                for (func, baseline), call_timings in zip(size_calls, size_timings):
+                    elapsed = measure(func, repeat=1)
+
+                    if baseline is not None:
+                        elapsed = max(elapsed - measure(baseline, repeat=1), 1e-9)
+
+                    call_timings.append(elapsed)
+
+        measurements = []
+
+        for size_graphs, size_timings in zip(graphs, timings):
+            total_nodes = sum(nodes for nodes, _, _, _ in size_graphs)
+            total_elapsed = sum(median(call_timings) for call_timings in size_timings)
+
+            measurements.append((total_nodes / len(size_graphs), total_elapsed / len(size_graphs)))
+
+        fitted = [measurement for measurement in measurements if measurement[0] >= fit_from]
+
+        if len(fitted) < 2:
+            fitted = measurements
+
+        exponent = fit_exponent([nodes for nodes, _ in fitted], [seconds for _, seconds in fitted])
+
+        results[name] = OrderedDict([('exponent', exponent),
+                                     ('budget', budget),
+                                     ('passed', exponent <= budget),
+                                     ('measurements', [OrderedDict([('nodes', nodes), ('time', seconds)])
+                                                       for nodes, seconds in measurements])])
+
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Check that graph algorithms scale within their complexity budgets.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES),
+                        help='Comma separated list of approximate graph sizes in nodes.')
+    parser.add_argument('--fit_from', default=500, type=int, help='Smallest graph size used to fit growth exponents.')
+    parser.add_argument('--algorithms', default=None,
+                        help='Comma separated list of algorithms to check. Available algorithms: %s.' %
+                             ', '.join(name for name, _, _ in ALGORITHMS))
+    parser.add_argument('--graphs', default=5, type=int, help='Number of different graphs timed at each size.')
+    parser.add_argument('--repeat', default=5, type=int, help='Number of times each graph is timed.')
+    parser.add_argument('--seed', default=0, type=int, help='Random seed.')
+    parser.add_argument('-o', '--output', default=None, help='Write results to the specified JSON file.')
+
+    args = parser.parse_args()
+
+    results = check_scaling([int(size) for size in args.sizes.split(',')],
+                            fit_from=args.fit_from,
+                            graphs_per_size=args.graphs,
+                            repeat=args.repeat,
+                            seed=args.seed,
+                            algorithms=args.algorithms.split(',') if args.algorithms is not None else None)
+
+    for name, result in results.items():
+        sys.stderr.write('%-45s exponent %.2f, budget %.2f: %s\n' %
+                         (name, result['exponent'], result['budget'], 'ok' if result['passed'] else 'FAILED'))
+
+    if args.output is not None:
+        with open(args.output, 'wb') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if not all(result['passed'] for result in results.values()):
+        sys.exit(1)
@@ -5,10 +5,16 @@ import sys
 import errno
 import argparse
 from collections import Counter
-import xml.etree.ElementTree as xml
+
+# Modules shared by the tools are kept in dmrs_preprocess
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
 
 from vocab import SourceGraphVocab, SourceGraphCargVocab
 from wmap import SourceGraphWMAP
+from utility import open_file, iter_split
+from binary_format import BinaryRecord, BinaryReader, BinaryWriter, is_binary_filename, write_record
+import xml_backend as xml
 
 
 def split_dmrs_file(content):
@@ -27,11 +33,40 @@ def empty(dmrs_xml):
 
 
 def read_file(filename):
-    with open(filename, 'rb') as f:
+    with open_file(filename, 'rb') as f:
         content = f.read().decode('utf-8').strip()
         return split_dmrs_file(content)
 
 
+def iter_dmrs_file(filename):
+    """
+    Read DMRS file one DMRS at a time, yielding the same items as read_file without loading the whole file.
+    """
+
+    with open_file(filename, 'rb') as f:
+        for dmrs in iter_split((line.decode('utf-8') for line in f), '<dmrs'):
+            if dmrs.strip() != '':
+                yield ('<dmrs' + dmrs).strip()
+
+
+def iter_dmrs_xml(filename):
+    """
+    Read DMRS file one DMRS at a time, yielding tuples of DMRS record and DMRS XML. Records of binary DMRS files are
+    BinaryRecord objects, decoded without parsing XML, and DMRS strings otherwise.
+    """
+
+    if is_binary_filename(filename):
+        with open_file(filename, 'rb') as f:
+            for record in BinaryReader(f).iter_records():
+                dmrs_xml = record.to_xml()
+                dmrs_xml.tail = None
+                yield record, dmrs_xml
+
+    else:
+        for dmrs in iter_dmrs_file(filename):
+            yield dmrs, xml.fromstring(dmrs.encode('utf-8'))
+
+
 def vocab_extract_stdin(vocab):
 
     dmrs = ''
@@ -46,8 +81,7 @@ def vocab_extract_stdin(vocab):
             elif dmrs_line.startswith('</dmrs>'):
                 dmrs += dmrs_line
 
-                parser = xml.XMLParser(encoding='utf-8')
-                dmrs_xml = xml.fromstring(dmrs.encode('utf-8'), parser=parser)
+                dmrs_xml = xml.fromstring(dmrs.encode('utf-8'))
                 vocab.extract_sentence(dmrs_xml)
 
             else:
@@ -61,7 +95,7 @@ def create_wmap(vocab_filename, existing_wmap=None):
 
     vocab = Counter()
 
-    with open(vocab_filename) as f:
+    with open_file(vocab_filename, 'rb') as f:
         content = f.read().decode('utf-8').strip()
 
         for line in content.split('\n'):
@@ -98,8 +132,7 @@ def wmap_stdin(wmap, out):
             elif dmrs_line.startswith('</dmrs>'):
                 dmrs += dmrs_line
 
-                parser = xml.XMLParser(encoding='utf-8')
-                dmrs_xml = xml.fromstring(dmrs.encode('utf-8'), parser=parser)
+                dmrs_xml = xml.fromstring(dmrs.encode('utf-8'))
                 wdmrs = wmap.wmap_sentence(dmrs_xml)
                 out.write('%s\n\n' % xml.tostring(wdmrs, encoding='utf-8'))
 
@@ -116,7 +149,8 @@ if __name__ == '__main__':
 
     parser.add_argument('-v', '--vocab_extract', default=None,
                         help='Extract DMRS vocabulary (node and edge labels) from DMRS. '
-                             'If "-" is specified, input will be read from stdin.')
+                             'If "-" is specified, input will be read from stdin. Files ending in .dmrsb are read as '
+                             'binary DMRS.')
 
     parser.add_argument('-c', '--create_wmap', default=None,
                         help='Create a WMAP from a vocabulary file. '
@@ -125,17 +159,31 @@ if __name__ == '__main__':
     parser.add_argument('-w', '--wmap', default=None, help='Existing WMAP file. Required for mapping.')
 
     parser.add_argument('-m', '--map', default=None,
-                        help='Map labels to numeric IDs using an existing word map dictionary. ')
+                        help='Map labels to numeric IDs using an existing word map dictionary. Files ending in .dmrsb '
+                             'are read as binary DMRS.')
+
+    parser.add_argument('--xml_backend', default='auto', choices=xml.BACKENDS,
+                        help='XML parser and serializer. auto uses lxml if it is installed and ElementTree otherwise. '
+                             'Output is the same with every backend.')
 
     parser.add_argument('output', help='Output file (vocabulary, WMAP file, or DMRS with ID mapped labels). '
-                                       'If "-" is specified, output will be written to stdout.')
+                                       'If "-" is specified, output will be written to stdout. Mapped DMRS are '
+                                       'written in the binary format if the file ends in .dmrsb.')
 
     args = parser.parse_args()
 
+    try:
+        xml.use_backend(args.xml_backend)
+
+    except ImportError as e:
+        parser.error(str(e))
+
     if args.output == '-':
         out = sys.stdout
+    elif args.map is not None and is_binary_filename(args.output):
+        out = BinaryWriter(open_file(args.output, 'wb'))
     else:
-        out = open(args.output, 'wb')
+        out = open_file(args.output, 'wb')
 
     if args.vocab_extract is not None:
 
@@ -145,10 +193,7 @@ if __name__ == '__main__':
             vocab_extract_stdin(vocab_extractor)
 
         else:
-            dmrs_list = read_file(args.vocab_extract)
-            for dmrs in dmrs_list:
-                parser = xml.XMLParser(encoding='utf-8')
-                dmrs_xml = xml.fromstring(dmrs.encode('utf-8'), parser=parser)
+            for _, dmrs_xml in iter_dmrs_xml(args.vocab_extract):
                 vocab_extractor.extract_sentence(dmrs_xml)
 
         out.write(str(vocab_extractor))
@@ -165,13 +210,17 @@ if __name__ == '__main__':
             wmap_stdin(wmap, out)
 
         else:
-            dmrs_list = read_file(args.map)
-            for dmrs in dmrs_list:
-                parser = xml.XMLParser(encoding='utf-8')
-                dmrs_xml = xml.fromstring(dmrs.encode('utf-8'), parser=parser)
+            for dmrs, dmrs_xml in iter_dmrs_xml(args.map):
 
                 if empty(dmrs_xml):
-                    out.write('%s\n\n' % dmrs)
+                    if isinstance(dmrs, BinaryRecord) and not isinstance(out, BinaryWriter):
+                        dmrs = dmrs.to_string().strip()
+
+                    write_record(out, dmrs)
+
+                elif isinstance(out, BinaryWriter):
+                    out.write(BinaryRecord.from_xml(wmap.wmap_sentence(dmrs_xml)))
+
                 else:
                     wdmrs = wmap.wmap_sentence(dmrs_xml)
                     out.write('%s\n\n' % xml.tostring(wdmrs, encoding='utf-8'))
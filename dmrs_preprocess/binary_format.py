@@ -0,0 +1,470 @@
+"""
+Compact binary DMRS format for passing DMRS between tools without XML parsing and serialization.
+
+File layout:
+    magic DMRSBIN1
+    records, each a uint32 payload length followed by the payload
+    uint32 0 ending the records
+    index of uint64 record offsets
+    trailer of uint64 record count, uint64 index offset and magic DMRSIDX1
+
+Record payloads are self-contained, so records can be read by index and copied between files without decoding:
+    tree records: uint8 0, uint8 integer width (2 or 4), uint32 string count, uint32 string table length,
+                  uint32 integer count, string table of NUL separated UTF-8 strings, unsigned integers
+    text records: uint8 1, UTF-8 XML text, used for records that do not serialize back to the same text
+
+Tree integers describe elements in document order as tag, attribute count, key and value of every attribute, text,
+tail and child count. Strings are referenced by index into STATIC_STRINGS followed by the record's string table, which
+holds the remaining strings of the record once each. Attribute values that are canonical non-negative decimal integers
+are stored as 2 * value + 1, other values as 2 * string index. Text and tail are 0 for None and string index + 1
+otherwise. All integers are little-endian.
+"""
+
+import sys
+import struct
+from array import array
+
+import xml_backend as xml
+
+
+MAGIC = 'DMRSBIN1'
+INDEX_MAGIC = 'DMRSIDX1'
+EXTENSION = '.dmrsb'
+COMPRESSION_EXTENSIONS = ('.gz', '.bz2', '.xz')
+
+TREE = 0
+TEXT = 1
+
+_LENGTH = struct.Struct('<I')
+_TREE_HEADER = struct.Struct('<BBIII')
+_TRAILER = struct.Struct('<QQ8s')
+
+_ARRAY_TYPES = {2: 'H', 4: 'I'}
+
+# Longer integers could overflow 2 * value + 1 in 32 bits
+_MAX_INLINE_DIGITS = 9
+
+_INDEX_BLOCK = 4096
+
+# Strings common to most DMRS, shared by all records instead of being repeated in every string table. Changing this
+# list changes the format.
+STATIC_STRINGS = [
+    # Elements
+    'dmrs', 'node', 'link', 'realpred', 'gpred', 'sortinfo', 'rargname', 'post',
+    # Attributes
+    'cfrom', 'cto', 'index', 'ltop', 'surface', 'ident', 'nodeid', 'carg', 'label', 'label_idx', 'tokalign', 'untok',
+    'tok', 'from', 'to', 'lemma', 'pos', 'sense', 'cvarsort', 'ind', 'num', 'pers', 'gend', 'pt', 'prontype', 'mood',
+    'perf', 'prog', 'sf', 'tense',
+    # Values
+    '\n', '-1', '+', '-', 'bool', 'x', 'e', 'i', 'u', 'h', 'p', 'sg', 'pl', 'm', 'f', 'n', 'm-or-f', 'std', 'zero',
+    'indicative', 'subjunctive', 'prop', 'ques', 'prop-or-ques', 'comm', 'pres', 'past', 'fut', 'untensed', 'tensed',
+    'v', 'q', 'a', 'c', 'named', 'pron', 'udef_q', 'pronoun_q', 'proper_q', 'def_explicit_q', 'compound',
+    'ARG', 'ARG1', 'ARG2', 'ARG3', 'ARG4', 'RSTR', 'BV', 'L-INDEX', 'R-INDEX', 'L-HNDL', 'R-HNDL', 'MOD',
+    'NEQ', 'EQ', 'H', 'HEQ', 'ARG1_NEQ', 'ARG2_NEQ', 'ARG3_NEQ', 'ARG1_EQ', 'ARG2_EQ', 'ARG1_H', 'ARG2_H', 'ARG3_H',
+    'ARG4_H', 'RSTR_H', 'L-INDEX_NEQ', 'R-INDEX_NEQ', 'L-HNDL_HEQ', 'R-HNDL_HEQ', 'L-HNDL_H', 'R-HNDL_H', 'MOD_EQ',
+]
+
+_STATIC_INDEXES = dict((value, index) for index, value in enumerate(STATIC_STRINGS))
+
+
+class BinaryFormatError(Exception):
+    pass
+
+
+def is_binary_filename(filename):
+    """
+    :param filename: File name, optionally with a compression extension
+    :return: True if the file name has the binary DMRS extension
+    """
+
+    for extension in COMPRESSION_EXTENSIONS:
+        if filename.endswith(extension):
+            filename = filename[:-len(extension)]
+            break
+
+    return filename.endswith(EXTENSION)
+
+
+def encode_tree(dmrs_xml):
+    """
+    Encode a DMRS XML element as a tree record payload.
+    :param dmrs_xml: DMRS XML element of either XML backend
+    :return: Payload string
+    """
+
+    strings = {}
+    ints = []
+
+    def string_index(value):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+
+        index = _STATIC_INDEXES.get(value)
+
+        if index is None:
+            index = strings.get(value)
+
+            if index is None:
+                index = strings[value] = len(STATIC_STRINGS) + len(strings)
+
+        return index
+
+    def encode_element(element):
+        attrib = element.attrib
+
+        ints.append(string_index(element.tag))
+        ints.append(len(attrib))
+
+        # Sorted like ElementTree serializes them, so that equal DMRS always encode to the same bytes
+        for key, value in sorted(attrib.items()):
+            ints.append(string_index(key))
+
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+
+            if value.isdigit() and len(value) <= _MAX_INLINE_DIGITS and (value[0] != '0' or value == '0'):
+                ints.append(2 * int(value) + 1)
+            else:
+                ints.append(2 * string_index(value))
+
+        ints.append(0 if element.text is None else string_index(element.text) + 1)
+        ints.append(0 if element.tail is None else string_index(element.tail) + 1)
+        ints.append(len(element))
+
+        for child in element:
+            encode_element(child)
+
+    encode_element(dmrs_xml)
+
+    table = [None] * len(strings)
+    for value, index in strings.iteritems():
+        table[index - len(STATIC_STRINGS)] = value
+
+    table = '\x00'.join(table)
+
+    width = 2 if max(ints) < 0x10000 else 4
+    integers = array(_ARRAY_TYPES[width], ints)
+
+    if sys.byteorder == 'big':
+        integers.byteswap()
+
+    return _TREE_HEADER.pack(TREE, width, len(strings), len(table), len(ints)) + table + integers.tostring()
+
+
+def decode_tree(payload):
+    """
+    Decode a tree record payload into a DMRS XML element of the current XML backend.
+    :param payload: Payload string
+    :return: DMRS XML element
+    """
+
+    _, width, string_count, table_length, count = _TREE_HEADER.unpack_from(payload)
+
+    table_start = _TREE_HEADER.size
+    table = payload[table_start:table_start + table_length]
+    strings = table.split('\x00') if string_count else []
+
+    # Like XML parsers, return ASCII strings as str and others as unicode
+    try:
+        table.decode('ascii')
+    except UnicodeDecodeError:
+        strings = [_decode_string(value) for value in strings]
+
+    strings = STATIC_STRINGS + strings
+
+    integers = array(_ARRAY_TYPES[width])
+    integers.fromstring(payload[table_start + table_length:table_start + table_length + count * width])
+
+    if sys.byteorder == 'big':
+        integers.byteswap()
+
+    next_int = iter(integers).next
+
+    def decode_element(parent):
+        tag = strings[next_int()]
+
+        attrib = {}
+        for _ in xrange(next_int()):
+            key = strings[next_int()]
+            value = next_int()
+            attrib[key] = str(value >> 1) if value & 1 else strings[value >> 1]
+
+        if parent is None:
+            element = xml.Element(tag, attrib)
+        else:
+            element = xml.SubElement(parent, tag, attrib)
+
+        text = next_int()
+        if text:
+            element.text = strings[text - 1]
+
+        tail = next_int()
+        if tail:
+            element.tail = strings[tail - 1]
+
+        for _ in xrange(next_int()):
+            decode_element(element)
+
+        return element
+
+    return decode_element(None)
+
+
+def _decode_string(value):
+    try:
+        value.decode('ascii')
+        return value
+    except UnicodeDecodeError:
+        return value.decode('utf-8')
+
+
+class BinaryRecord(object):
+    """
+    Single DMRS in binary form. The payload is only decoded when the DMRS is needed as XML.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __repr__(self):
+        return "BinaryRecord(kind=%r,size=%r)" % (self.kind, len(self.payload))
+
+    @classmethod
+    def from_xml(cls, dmrs_xml):
+        return cls(encode_tree(dmrs_xml))
+
+    @classmethod
+    def from_string(cls, dmrs):
+        """
+        Create a record from DMRS XML text. Text that does not serialize back to the same bytes, e.g. because of
+        formatting or parse errors, is stored as is, so that converting back always restores the original text.
+        :param dmrs: DMRS XML string, optionally followed by whitespace
+        :return: BinaryRecord object
+        """
+
+        if isinstance(dmrs, unicode):
+            dmrs = dmrs.encode('utf-8')
+
+        body = dmrs.rstrip()
+
+        try:
+            dmrs_xml = xml.fromstring(body)
+
+        except xml.ParseError:
+            return cls(chr(TEXT) + dmrs)
+
+        dmrs_xml.tail = dmrs[len(body):] or None
+
+        if xml.tostring(dmrs_xml, encoding='utf-8') != dmrs:
+            return cls(chr(TEXT) + dmrs)
+
+        return cls(encode_tree(dmrs_xml))
+
+    @property
+    def kind(self):
+        return ord(self.payload[0])
+
+    def to_xml(self):
+        """
+        :return: DMRS XML element of the current XML backend
+        """
+
+        if self.kind == TEXT:
+            return xml.fromstring(self.payload[1:].strip())
+
+        return decode_tree(self.payload)
+
+    def to_string(self):
+        """
+        :return: UTF-8 encoded DMRS XML string
+        """
+
+        if self.kind == TEXT:
+            return self.payload[1:]
+
+        return xml.tostring(decode_tree(self.payload), encoding='utf-8')
+
+
+class BinaryWriter(object):
+
+    def __init__(self, f):
+        """
+        Write records to a binary DMRS file. The record index is written when the writer is closed.
+        :param f: File object opened for writing. The writer closes it unless it is standard output.
+        """
+
+        self.f = f
+        self.offsets = []
+        self.position = len(MAGIC)
+
+        f.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record):
+        """
+        :param record: BinaryRecord object or DMRS XML string
+        """
+
+        if not isinstance(record, BinaryRecord):
+            record = BinaryRecord.from_string(record)
+
+        payload = record.payload
+
+        self.offsets.append(self.position)
+        self.f.write(_LENGTH.pack(len(payload)))
+        self.f.write(payload)
+        self.position += _LENGTH.size + len(payload)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.write(_LENGTH.pack(0))
+        index_offset = self.position + _LENGTH.size
+
+        for start in xrange(0, len(self.offsets), _INDEX_BLOCK):
+            block = self.offsets[start:start + _INDEX_BLOCK]
+            self.f.write(struct.pack('<%dQ' % len(block), *block))
+
+        self.f.write(_TRAILER.pack(len(self.offsets), index_offset, INDEX_MAGIC))
+
+        if self.f is not sys.stdout:
+            self.f.close()
+
+
+class BinaryReader(object):
+
+    def __init__(self, f):
+        """
+        Read records from a binary DMRS file sequentially or by index.
+        :param f: File object opened for reading
+        """
+
+        self.f = f
+        self.offsets = None
+
+        if f.read(len(MAGIC)) != MAGIC:
+            raise BinaryFormatError('Not a binary DMRS file.')
+
+    def __len__(self):
+        return len(self.index())
+
+    def __getitem__(self, index):
+        self.f.seek(self.index()[index])
+        return self._read_record()
+
+    def index(self):
+        """
+        Load record offsets from the index at the end of the file. Files without an index, e.g. incomplete ones, and
+        compressed files that cannot seek from the end are scanned instead.
+        :return: List of record offsets
+        """
+
+        if self.offsets is None:
+            try:
+                self.offsets = self._read_index()
+            except (IOError, ValueError, BinaryFormatError):
+                self.offsets = self._scan_index()
+
+        return self.offsets
+
+    def _read_index(self):
+        self.f.seek(-_TRAILER.size, 2)
+        count, index_offset, magic = _TRAILER.unpack(self.f.read(_TRAILER.size))
+
+        if magic != INDEX_MAGIC:
+            raise BinaryFormatError('Binary DMRS file has no index.')
+
+        self.f.seek(index_offset)
+        index = self.f.read(count * 8)
+
+        return list(struct.unpack('<%dQ' % count, index))
+
+    def _scan_index(self):
+        offsets = []
+        position = len(MAGIC)
+        self.f.seek(position)
+
+        while True:
+            length = self._read_length()
+
+            if not length:
+                break
+
+            offsets.append(position)
+            self.f.seek(length, 1)
+            position += _LENGTH.size + length
+
+        return offsets
+
+    def _read_length(self):
+        header = self.f.read(_LENGTH.size)
+
+        if not header:
+            return 0
+
+        if len(header) < _LENGTH.size:
+            raise BinaryFormatError('Binary DMRS file ends within a record.')
+
+        return _LENGTH.unpack(header)[0]
+
+    def _read_record(self):
+        length = self._read_length()
+
+        if not length:
+            return None
+
+        payload = self.f.read(length)
+
+        if len(payload) < length:
+            raise BinaryFormatError('Binary DMRS file ends within a record.')
+
+        return BinaryRecord(payload)
+
+    def iter_records(self, start=0):
+        """
+        Read records in order, starting at the given record index.
+        :param start: Index of the first record
+        :return: Generator of BinaryRecord objects
+        """
+
+        if start > 0:
+            offsets = self.index()
+
+            if start >= len(offsets):
+                return
+
+            self.f.seek(offsets[start])
+
+        else:
+            self.f.seek(len(MAGIC))
+
+        while True:
+            record = self._read_record()
+
+            if record is None:
+                break
+
+            yield record
+
+
+def write_record(out, record):
+    """
+    Write a DMRS record to a BinaryWriter or to a text file, where records are followed by a blank line.
+    :param out: BinaryWriter object or file object
+    :param record: BinaryRecord object or DMRS XML string
+    """
+
+    if isinstance(out, BinaryWriter):
+        out.write(record)
+        return
+
+    if isinstance(record, BinaryRecord):
+        record = record.to_string()
+
+    out.write('%s\n\n' % record)
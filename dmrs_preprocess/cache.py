@@ -0,0 +1,153 @@
+import hashlib
+import sqlite3
+
+
+class ConversionCache(object):
+    """
+    Persistent conversion cache stored in an SQLite file. Entries are keyed by a hash of the source string and evicted
+    in least recently used order once the cache grows beyond max_entries.
+    """
+
+    def __init__(self, filename, max_entries=1000000, commit_interval=1000, readonly=False, autocommit=False):
+        """
+        :param filename: SQLite cache file
+        :param max_entries: Maximum number of entries kept in the cache
+        :param commit_interval: Number of writes between commits
+        :param readonly: Do not write to the cache file (e.g. in worker processes of a single writer)
+        :param autocommit: Commit every write immediately. Needed when several processes write to the same cache file.
+        """
+
+        self.filename = filename
+        self.max_entries = max_entries
+        self.commit_interval = commit_interval
+        self.readonly = readonly
+
+        self.hits = 0
+        self.misses = 0
+        self.uncommitted = 0
+
+        if autocommit:
+            self.connection = sqlite3.connect(filename, timeout=60, isolation_level=None)
+        else:
+            self.connection = sqlite3.connect(filename, timeout=60)
+
+        if not readonly:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS cache '
+                                    '(key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used INTEGER NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)')
+            self.connection.commit()
+
+        self.clock = self.connection.execute('SELECT COALESCE(MAX(last_used), 0) FROM cache').fetchone()[0]
+        self.size = self.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def __str__(self):
+        total = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / total if total > 0 else 0.0
+        return 'Cache %s: %d hits, %d misses (%.1f%% hit rate), %d entries' % \
+               (self.filename, self.hits, self.misses, hit_rate, self.size)
+
+    @staticmethod
+    def key(source):
+        if isinstance(source, unicode):
+            source = source.encode('utf-8')
+
+        return hashlib.sha1(source).hexdigest()
+
+    def sync(self):
+        """
+        Reload the clock and entry count after other processes have written to the cache file.
+        """
+
+        self.connection.commit()
+        self.clock = max(self.clock,
+                         self.connection.execute('SELECT COALESCE(MAX(last_used), 0) FROM cache').fetchone()[0])
+        self.size = self.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def lookup(self, key):
+        """
+        Look up a cached value by key without updating usage information or statistics.
+        :param key: Cache key
+        :return: Cached string or None
+        """
+
+        row = self.connection.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+        return str(row[0]) if row is not None else None
+
+    def get(self, key):
+        value = self.lookup(key)
+        self.record(key, value is not None)
+        return value
+
+    def record(self, key, hit):
+        """
+        Update statistics and usage information of a key that was looked up, possibly by another process.
+        """
+
+        if not hit:
+            self.misses += 1
+            return
+
+        self.hits += 1
+
+        if not self.readonly:
+            self.clock += 1
+            self.connection.execute('UPDATE cache SET last_used = ? WHERE key = ?', (self.clock, key))
+            self._written()
+
+    def put(self, key, value):
+        if self.readonly:
+            return
+
+        self.clock += 1
+        cursor = self.connection.execute('INSERT OR IGNORE INTO cache (key, value, last_used) VALUES (?, ?, ?)',
+                                         (key, sqlite3.Binary(value), self.clock))
+        self.size += cursor.rowcount
+        self._written()
+
+        if self.size > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries so that the cache holds at most 90% of max_entries. Entries are counted in
+        the same write transaction that removes them, since other processes may have added entries since this one
+        last counted them.
+        """
+
+        self.connection.commit()
+        self.connection.execute('BEGIN IMMEDIATE')
+
+        try:
+            self.size = self.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            excess = self.size - int(self.max_entries * 0.9)
+
+            if excess > 0:
+                self.connection.execute('DELETE FROM cache WHERE key IN '
+                                        '(SELECT key FROM cache ORDER BY last_used LIMIT ?)', (excess,))
+                self.size -= excess
+
+            self.connection.commit()
+
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+
+        self.uncommitted = 0
+
+    def close(self):
+        if not self.readonly:
+            if self.size > self.max_entries:
+                self.evict()
+
+            self.connection.commit()
+
+        self.connection.close()
+
+    def _written(self):
+        self.uncommitted += 1
+
+        if self.uncommitted >= self.commit_interval:
+            self.connection.commit()
+            self.uncommitted = 0
@@ -0,0 +1,87 @@
+import os
+import json
+
+from binary_format import is_binary_filename
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def is_seekable_output(filename):
+    """
+    Check whether output can be truncated at a byte offset on resume. Standard output, compressed files and binary
+    DMRS files, whose record index is only written at the end, cannot.
+    """
+
+    return filename != '-' and not filename.endswith(('.gz', '.bz2', '.xz')) and not is_binary_filename(filename)
+
+
+def save_checkpoint(filename, sentences, output_offset, inputs, shard=None, stage_keys=(), random_state=None):
+    """
+    Atomically write a checkpoint. The temporary file is renamed over the old checkpoint, so an interrupted write
+    leaves the previous checkpoint intact.
+    :param filename: Checkpoint file
+    :param sentences: Number of sentences written to output
+    :param output_offset: Output file size in bytes after the last written sentence
+    :param inputs: List of input and output filenames the checkpoint belongs to
+    :param shard: Tuple of (shard index, number of shards) or None if all sentences are processed
+    :param stage_keys: List of the pipeline's stage prefix keys, identifying its stages and their options
+    :param random_state: State of the module RNG as returned by random.getstate() after the last written sentence
+    """
+
+    checkpoint = {'sentences': sentences, 'output_offset': output_offset, 'inputs': inputs,
+                  'shard': list(shard) if shard is not None else None, 'stage_keys': list(stage_keys),
+                  'random_state': random_state}
+
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.rename(tmp_filename, filename)
+
+
+def load_checkpoint(filename, inputs, shard=None, stage_keys=()):
+    """
+    Load a checkpoint written by save_checkpoint. Resuming with a different shard or pipeline would mix sentences or
+    outputs of two different runs, so the checkpoint must have been written with the same ones.
+    :param filename: Checkpoint file
+    :param inputs: List of input and output filenames of the current run
+    :param shard: Tuple of (shard index, number of shards) of the current run or None
+    :param stage_keys: List of stage prefix keys of the current pipeline
+    :return: Tuple of (number of sentences written, output byte offset, module RNG state), (0, 0, None) if the
+     checkpoint does not exist. The RNG state can be passed to random.setstate() and is None if it was not recorded.
+    """
+
+    if not os.path.exists(filename):
+        return 0, 0, None
+
+    with open(filename, 'rb') as f:
+        checkpoint = json.load(f)
+
+    if checkpoint['inputs'] != inputs:
+        raise CheckpointError('Checkpoint %s was written for files %s, not %s.' %
+                              (filename, ', '.join(checkpoint['inputs']), ', '.join(inputs)))
+
+    if checkpoint.get('shard') != (list(shard) if shard is not None else None):
+        raise CheckpointError('Checkpoint %s was written for shard %s, not %s.' %
+                              (filename, format_shard(checkpoint.get('shard')), format_shard(shard)))
+
+    if checkpoint.get('stage_keys') != list(stage_keys):
+        raise CheckpointError('Checkpoint %s was written by a pipeline with different stages or stage options.' %
+                              filename)
+
+    # JSON turns the tuples of the RNG state into lists
+    random_state = checkpoint.get('random_state')
+
+    if random_state is not None:
+        version, internal_state, gauss_next = random_state
+        random_state = (version, tuple(internal_state), gauss_next)
+
+    return checkpoint['sentences'], checkpoint['output_offset'], random_state
+
+
+def format_shard(shard):
+    return '%d/%d' % tuple(shard) if shard is not None else 'none'
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+from itertools import islice
+
+from binary_format import BinaryReader, BinaryWriter, is_binary_filename
+from merge_shards import iter_records, copy_record
+from utility import open_file
+
+
+def convert_file(input_filename, out, start=0, stop=None):
+    """
+    Copy DMRS records from an XML or binary DMRS file to a text file or BinaryWriter, converting between formats.
+    Converting a file written by the tools to binary and back restores it byte for byte.
+    :param input_filename: Input file. Files with the binary extension are read as binary DMRS.
+    :param out: File object or BinaryWriter object
+    :param start: Index of the first copied record. Binary files seek to it directly using their record index.
+    :param stop: Index after the last copied record. Copy until the end if None.
+    :return: Number of copied records
+    """
+
+    count = 0
+
+    with open_file(input_filename, 'rb') as f:
+        if is_binary_filename(input_filename):
+            records = BinaryReader(f).iter_records(start)
+        else:
+            records = islice(iter_records(f), start, None)
+
+        if stop is not None:
+            records = islice(records, max(stop - start, 0))
+
+        for record in records:
+            copy_record(out, record)
+            count += 1
+
+    return count
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Convert DMRS between the XML and binary formats. Files ending in '
+                                                 '.dmrsb (optionally compressed) are binary, others XML.')
+    parser.add_argument('--start', default=0, type=int, help='Index of the first converted DMRS.')
+    parser.add_argument('--stop', default=None, type=int,
+                        help='Index after the last converted DMRS. Convert until the end by default.')
+    parser.add_argument('input', help='Input DMRS file.')
+    parser.add_argument('output', help='Output DMRS file. Set "-" to output XML to standard output.')
+
+    args = parser.parse_args()
+
+    if args.output == '-':
+        out = sys.stdout
+    elif is_binary_filename(args.output):
+        out = BinaryWriter(open_file(args.output, 'wb'))
+    else:
+        out = open_file(args.output, 'wb')
+
+    count = convert_file(args.input, out, start=args.start, stop=args.stop)
+
+    if args.output != '-':
+        out.close()
+
+    sys.stderr.write('Converted %d DMRS.\n' % count)
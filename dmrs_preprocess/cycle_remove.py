@@ -1,86 +1,95 @@
-import re
+import time
 import itertools
-from collections import Counter
-import xml.etree.ElementTree as xml
+from collections import Counter, Set
+import xml_backend as xml
 
 from graph import load_xml, dump_xml
 
 
-def cycle_remove(dmrs_xml, debug=False, cnt=None, realization=False):
+def cycle_remove(dmrs_xml, debug=False, cnt=None, realization=False, stats=None, unicode_labels=False):
     """
     Iteratively remove cycles from graph by 1) checking if they match any of the specific patterns and 2) cutting the
     edge specified by the pattern. If no pattern can be matched against the cycle, remove it by using the default pattern.
+    Directed cycles are removed before undirected ones. Cycles are split into connected components that are resolved
+    independently, and after a cut only the nodes around the cut edges are checked again.
     :param dmrs_xml: DMRS XML object
     :param debug: Print information about detected cycles and matched patterns
     :param cnt: If debug is True, needs to be instantiated Counter object to track pattern occurrences
     :param realization: If True, tokalign cannot be used to decide which edge to cut. A simplified method is used instead.
+    :param stats: If given, a list to which a (pattern name, seconds) tuple is appended for every cycle. Cycles that
+     could not be broken are recorded as none_detected.
+    :param unicode_labels: If True, node labels are read as unicode, see graph.load_xml. Set when the labels were created
+     earlier in the same run, so that the cycles are broken the same way with every XML backend.
     :return:
     """
 
-    dmrs_graph = load_xml(dmrs_xml)
+    dmrs_graph = load_xml(dmrs_xml, unicode_labels=unicode_labels)
+    nodes_by_id = dict((node.node_id, node) for node in dmrs_graph.nodes)
+
+    # Patterns match the first suitable node of a cycle, so cycle nodes are always iterated in the order of the graph's
+    # node set, which is the order of cycles found on the whole graph
+    node_order = dict((node.node_id, index) for index, node in enumerate(set(dmrs_graph.nodes)))
 
     sentence_cycles = []
 
-    while True:
-        cycle = dmrs_graph.contains_cycle()
+    for find_cycle, peel_cycle in ((dmrs_graph.contains_directed_cycle, dmrs_graph.peel_directed_cycle),
+                                   (dmrs_graph.contains_undirected_cycle, dmrs_graph.peel_undirected_cycle)):
+        # Patterns only look at edges within a cycle and cut one of them. Cutting an edge therefore never changes
+        # how the other connected components of the remaining cycles are matched and cut.
+        components = [set(node.node_id for node in component)
+                      for component in dmrs_graph.get_connected_components(find_cycle())]
+        unbroken = False
 
-        if not cycle:
-            break
+        while components:
+            start = time.time()
+            component = components.pop()
+            cycle = Cycle([nodes_by_id[node_id] for node_id in component], node_order)
+            matcher = CycleMatcher(dmrs_graph, cycle, realization=realization)
+            pattern = break_cycle(matcher)
 
-        if process_conjunction_index(dmrs_graph, cycle):
-            sentence_cycles.append('conj_index')
+            if pattern is None:
+                unbroken = True
 
-            if debug:
-                reent_debug(dmrs_graph, cycle, 'CONJ_INDEX')
+                if stats is not None:
+                    stats.append(('none_detected', time.time() - start))
 
-            continue
-
-        if process_eq(dmrs_graph, cycle):
-            sentence_cycles.append('eq')
-
-            if debug:
-                reent_debug(dmrs_graph, cycle, 'EQ_')
+                if debug:
+                    reent_debug(dmrs_graph, cycle, 'NONE_DETECTED')
 
-            continue
+                continue
 
-        if process_control(dmrs_graph, cycle):
-            sentence_cycles.append('control')
+            sentence_cycles.append(pattern)
 
             if debug:
-                reent_debug(dmrs_graph, cycle, 'CONTROL_')
+                reent_debug(dmrs_graph, cycle, DEBUG_NAMES[pattern])
 
-            continue
+            # Only nodes around the cut edges can leave the cycle, and every part split off from the component contains
+            # a node adjacent to a cut edge or to a node that left, so the rest of the component is not checked again
+            cut_ids = set()
+            for edge in matcher.cut_edges:
+                cut_ids.update((edge.from_node.node_id, edge.to_node.node_id))
 
-        if process_small_clause(dmrs_graph, cycle):
-            sentence_cycles.append('small_clause')
+            removed_ids = peel_cycle(component, cut_ids)
+            component.difference_update(removed_ids)
 
-            if debug:
-                reent_debug(dmrs_graph, cycle, 'SMALL_CLAUSE')
+            boundary_ids = set(cut_ids)
+            for node_id in removed_ids:
+                boundary_ids.update(node.node_id for node in dmrs_graph.get_adjacent_nodes(nodes_by_id[node_id]))
 
-            continue
+            for part in dmrs_graph.split_connected_component(component, boundary_ids):
+                component.difference_update(part)
+                components.append(part)
 
-        if process_conjunction_verb_or_adj(dmrs_graph, cycle, realization=realization):
-            sentence_cycles.append('conj_verb_or_adj')
+            if component:
+                components.append(component)
 
-            if debug:
-                reent_debug(dmrs_graph, cycle, 'CONJ_VERB_OR_ADJ')
+            if stats is not None:
+                stats.append((pattern, time.time() - start))
 
-            continue
-
-        if process_default(dmrs_graph, cycle, realization=realization):
-            sentence_cycles.append('default')
-
-            if debug:
-                reent_debug(dmrs_graph, cycle, 'DEFAULT_')
-
-            continue
-
-        # Cycle could not be broken
-        sentence_cycles.append('none_detected')
-        if debug:
-            reent_debug(dmrs_graph, cycle, 'NONE_DETECTED')
-
-        break
+        # Cycle could not be broken. Undirected cycles are not removed while directed cycles remain.
+        if unbroken:
+            sentence_cycles.append('none_detected')
+            break
 
     if cnt is not None:
         for key, count in Counter(sentence_cycles).most_common():
@@ -94,87 +103,257 @@ def cycle_remove(dmrs_xml, debug=False, cnt=None, realization=False):
     return dump_xml(dmrs_graph)
 
 
-def process_eq(graph, cycle, cut=True):
+class Cycle(Set):
+    """
+    Set of Node objects in a cycle, iterated in a fixed node order.
+    """
+
+    def __init__(self, nodes, node_order):
+        """
+        :param nodes: Node objects in the cycle
+        :param node_order: Dictionary of iteration positions by node ID
+        """
+
+        self.nodes = sorted(nodes, key=lambda node: node_order[node.node_id])
+        self.node_ids = set(node.node_id for node in self.nodes)
+
+    def __contains__(self, node):
+        return node.node_id in self.node_ids
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+class CycleNode(object):
+    """
+    Features of a node in a cycle that are shared by the cycle patterns. Edges are restricted to the cycle and listed
+    in the order of the graph's edge index. Edge features are computed on first use, since most patterns only look at
+    a few nodes or labels.
+    """
+
+    def __init__(self, node, graph, node_ids):
+        """
+        :param node: Node object
+        :param graph: DmrsGraph object
+        :param node_ids: Set of IDs of the nodes in the cycle
+        """
+
+        self.node = node
+        self.pos = node.pos
+        self.gpred = node.gpred
+
+        self.graph = graph
+        self.node_ids = node_ids
+
+        self._outgoing = None
+        self._incoming = None
+        self._outgoing_labels = None
+        self._incoming_labels = None
+
+    @property
+    def conj(self):
+        return is_conj(self.node)
+
+    @property
+    def outgoing(self):
+        if self._outgoing is None:
+            self._outgoing = [edge for edge in self.graph.get_outgoing_node_edges(self.node)
+                              if edge.to_node.node_id in self.node_ids]
+
+        return self._outgoing
+
+    @property
+    def incoming(self):
+        if self._incoming is None:
+            self._incoming = [edge for edge in self.graph.get_incoming_node_edges(self.node)
+                              if edge.from_node.node_id in self.node_ids]
+
+        return self._incoming
+
+    @property
+    def outgoing_labels(self):
+        if self._outgoing_labels is None:
+            self._outgoing_labels = group_by_label(self.outgoing)
+
+        return self._outgoing_labels
+
+    @property
+    def incoming_labels(self):
+        if self._incoming_labels is None:
+            self._incoming_labels = group_by_label(self.incoming)
+
+        return self._incoming_labels
+
+    @property
+    def arg23_h_incoming(self):
+        """
+        :return: True if the node has an incoming ARG2/H or ARG3/H edge (including HEQ), otherwise False
+        """
+        return any(label.startswith(('ARG2_H', 'ARG3_H')) for label in self.incoming_labels)
+
+    def get_outgoing(self, label):
+        """
+        :param label: Edge label
+        :return: List of outgoing edges within the cycle with the label
+        """
+
+        if self._outgoing_labels is not None:
+            return self._outgoing_labels.get(label, [])
+
+        # The graph's label index lists edges in the same order as its node index
+        return [edge for edge in self.graph.get_outgoing_node_edges(self.node, label)
+                if edge.to_node.node_id in self.node_ids]
+
+    def get_incoming(self, label):
+        """
+        :param label: Edge label
+        :return: List of incoming edges within the cycle with the label
+        """
+
+        if self._incoming_labels is not None:
+            return self._incoming_labels.get(label, [])
+
+        return [edge for edge in self.graph.get_incoming_node_edges(self.node, label)
+                if edge.from_node.node_id in self.node_ids]
+
+
+class CycleMatcher(object):
+    """
+    Cycle with the features of its nodes, computed once and shared by all cycle patterns.
+    """
+
+    def __init__(self, graph, cycle, realization=False):
+        """
+        :param graph: DmrsGraph object
+        :param cycle: Set of Node objects in the cycle
+        :param realization: If True, tokalign cannot be used to decide which edge to cut. A simplified method is used instead.
+        """
+
+        self.graph = graph
+        self.realization = realization
+
+        node_ids = set(node.node_id for node in cycle)
+
+        self.nodes = [CycleNode(node, graph, node_ids) for node in cycle]
+        self.features = dict((cycle_node.node.node_id, cycle_node) for cycle_node in self.nodes)
+
+        self.verb_nodes = [cycle_node for cycle_node in self.nodes if cycle_node.pos == 'v']
+        self.conj_nodes = [cycle_node for cycle_node in self.nodes if cycle_node.conj]
+
+        # Edges removed from the graph to break the cycle
+        self.cut_edges = []
+
+    def __getitem__(self, node):
+        return self.features[node.node_id]
+
+    def cut(self, edge):
+        """
+        Remove an edge of the cycle from the graph.
+        :param edge: Edge object
+        """
+
+        self.graph.edges.remove(edge)
+        self.cut_edges.append(edge)
+
+
+def group_by_label(edges):
+    """
+    :param edges: List of Edge objects
+    :return: Dictionary of edge lists by edge label, each in the order of the input list
+    """
+
+    edges_by_label = {}
+
+    for edge in edges:
+        edges_by_label.setdefault(edge.label, []).append(edge)
+
+    return edges_by_label
+
+
+def break_cycle(matcher):
+    """
+    Break a cycle by cutting the edge specified by the first pattern in CYCLE_PATTERNS that matches it.
+    :param matcher: CycleMatcher object of the cycle, which records the cut edges
+    :return: Name of the matched pattern or None if the cycle could not be broken
+    """
+
+    for name, _, process_pattern in CYCLE_PATTERNS:
+        if process_pattern(matcher):
+            return name
+
+    return None
+
+
+def process_eq(matcher, cut=True):
     """
     Match a cycle if there is an EQ edge that connects two nodes in the cycle. EQ edge is removed if cut is set to True.
-    :param graph: DmrsGraph object
-    :param cycle: Set of Node objects in the cycle
+    :param matcher: CycleMatcher object
     :param cut: If True and cycle is matched, the cycle is broken by removing a target edge
     :return: True if cycle is matched, otherwise False
     """
 
-    for node in cycle:
-        outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(node) if edge.to_node in cycle]
-        outgoing_labels = dict((edge.label, edge) for edge in outgoing_edges)
+    for cycle_node in matcher.nodes:
+        eq_edges = cycle_node.get_outgoing('EQ')
 
-        if 'EQ' not in outgoing_labels:
+        if not eq_edges:
             continue
 
         if cut:
-            graph.edges.remove(outgoing_labels['EQ'])
+            matcher.cut(eq_edges[-1])
 
         return True
 
     return False
 
 
-def process_control(graph, cycle, cut=True):
+def process_control(matcher, cut=True):
     """
     Match a cycle if there is a control relationship: verb with an incoming edge of ARG N / H, where N != 1,
     and an outgoing edge ARG1/NEQ; or if there is an ARG1_H incoming edge from neg_rel node, and neg_rel node has
     an incoming edge of ARG N / H, where N != 1. ARG1/NEQ edge is removed if cut is set to True.
-    :param graph: DmrsGraph object
-    :param cycle: Set of Node objects in the cycle
+    :param matcher: CycleMatcher object
     :param cut: If True and cycle is matched, the cycle is broken by removing a target edge
     :return: True if cycle is matched, otherwise False
     """
 
-    verb_nodes = [node for node in cycle if node.pos == 'v']
+    for verb_node in matcher.verb_nodes:
 
-    if len(verb_nodes) == 0:
-        return False
+        if not verb_node.arg23_h_incoming:
 
-    for verb_node in verb_nodes:
-        incoming_edges = [edge for edge in graph.get_incoming_node_edges(verb_node) if edge.from_node in cycle]
-        incoming_labels = dict((edge.label, edge.from_node) for edge in incoming_edges)
-        outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(verb_node) if edge.to_node in cycle]
+            arg1_h_edges = verb_node.get_incoming('ARG1_H')
 
-        if not any([re.match(r'ARG[23]_H', edge_label) for edge_label in incoming_labels]):
-
-            if 'ARG1_H' not in incoming_labels:
+            if not arg1_h_edges:
                 continue
 
-            if not incoming_labels['ARG1_H'].gpred == 'neg_rel':
-                continue
+            neg_node = matcher[arg1_h_edges[-1].from_node]
 
-            neg_incoming_edges = [edge for edge in graph.get_incoming_node_edges(incoming_labels['ARG1_H']) if edge.from_node in cycle]
+            if not neg_node.gpred == 'neg_rel':
+                continue
 
-            if not any([re.match(r'ARG[23]_H', edge.label) for edge in neg_incoming_edges]):
+            if not neg_node.arg23_h_incoming:
                 continue
 
-        if not any([edge.label == 'ARG1_NEQ' for edge in outgoing_edges]):
+        arg1_neq_edges = verb_node.get_outgoing('ARG1_NEQ')
+
+        if not arg1_neq_edges:
             continue
 
         if cut:
-            arg1_neq_edge = [edge for edge in outgoing_edges if edge.label == 'ARG1_NEQ'][0]
-            graph.edges.remove(arg1_neq_edge)
+            matcher.cut(arg1_neq_edges[0])
 
         return True
 
     return False
 
 
-def process_object_control(graph, cycle, cut=True):
-
-    verb_nodes = [node for node in cycle if node.pos == 'v']
+def process_object_control(matcher, cut=True):
 
-    if len(verb_nodes) == 0:
-        return False
+    for verb_node in matcher.verb_nodes:
 
-    for verb_node in verb_nodes:
-
-        outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(verb_node) if edge.to_node in cycle]
-        outgoing_labels = dict((edge.label, edge.to_node) for edge in outgoing_edges)
+        outgoing_labels = dict((edge.label, edge.to_node) for edge in verb_node.outgoing)
 
         arg2_nodes = [edge_to_node for edge_label, edge_to_node in outgoing_labels.items() if edge_label.startswith('ARG2')]
 
@@ -187,7 +366,7 @@ def process_object_control(graph, cycle, cut=True):
         arg2_node = arg2_nodes[0]
         arg3_node = outgoing_labels['ARG3_H']
 
-        arg3_node_outgoing_edges = graph.get_outgoing_node_edges(arg3_node)
+        arg3_node_outgoing_edges = matcher.graph.get_outgoing_node_edges(arg3_node)
 
         if not any([True for edge in arg3_node_outgoing_edges if edge.label.startswith('ARG2') and edge.to_node == arg2_node]):
             continue
@@ -197,54 +376,47 @@ def process_object_control(graph, cycle, cut=True):
     return False
 
 
-def process_small_clause(graph, cycle, cut=True):
+def process_small_clause(matcher, cut=True):
     """
     Match a cycle if there is a small clause relationship: verb with outgoing edge ARG3/H to a preposition node, the
     preposition node has an outgoing edge ARG1/NEQ, and
     1) an outgoing edge ARG2/NEQ, or
     2) an outgoing edge ARG2/EQ to a noun;
     ARG2/NEQ or ARG2/EQ edge is removed if cut is set to True.
-    :param graph: DmrsGraph object
-    :param cycle: Set of Node objects in the cycle
+    :param matcher: CycleMatcher object
     :param cut: If True and cycle is matched, the cycle is broken by removing a target edge
     :return: True if cycle is matched, otherwise False
     """
 
-    verb_nodes = [node for node in cycle if node.pos == 'v']
-
-    if len(verb_nodes) == 0:
-        return False
-
-    for verb_node in verb_nodes:
-        outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(verb_node) if edge.to_node in cycle]
-        outgoing_labels = dict((edge.label, edge.to_node) for edge in outgoing_edges)
+    for verb_node in matcher.verb_nodes:
+        arg3_h_edges = verb_node.get_outgoing('ARG3_H')
 
-        if 'ARG3_H' not in outgoing_labels:
+        if not arg3_h_edges:
             continue
 
-        prep_node = outgoing_labels['ARG3_H']
+        prep_node = matcher[arg3_h_edges[-1].to_node]
 
         if prep_node.pos != 'p':
             continue
 
-        prep_outgoing_labels = [edge.label for edge in graph.get_outgoing_node_edges(prep_node) if edge.to_node in cycle]
-
-        if 'ARG1_NEQ' not in prep_outgoing_labels:
+        if not prep_node.get_outgoing('ARG1_NEQ'):
             continue
 
-        if 'ARG2_NEQ' in outgoing_labels:
+        arg2_neq_edges = verb_node.get_outgoing('ARG2_NEQ')
+
+        if arg2_neq_edges:
 
             if cut:
-                arg2_neq_edge = [edge for edge in outgoing_edges if edge.label == 'ARG2_NEQ'][0]
-                graph.edges.remove(arg2_neq_edge)
+                matcher.cut(arg2_neq_edges[0])
 
             return True
 
-        if 'ARG2_EQ' in outgoing_labels and outgoing_labels['ARG2_EQ'].pos == 'n':
+        arg2_eq_edges = verb_node.get_outgoing('ARG2_EQ')
+
+        if arg2_eq_edges and arg2_eq_edges[-1].to_node.pos == 'n':
 
             if cut:
-                arg2_eq_edge = [edge for edge in outgoing_edges if edge.label == 'ARG2_EQ'][0]
-                graph.edges.remove(arg2_eq_edge)
+                matcher.cut(arg2_eq_edges[0])
 
             return True
 
@@ -255,36 +427,27 @@ def is_conj(node):
     return node.pos == 'c' or node.gpred is not None and node.gpred.startswith('implicit_conj')
 
 
-def process_conjunction_verb_or_adj(graph, cycle, cut=True, realization=False):
+def process_conjunction_verb_or_adj(matcher, cut=True):
     """
     Match a cycle if there is a conjunction of verbs or adjectives: conjunction of two verbs or two adjectives and those
     two verbs or two adjectives in turn connect to at least one shared node. Edges from two verbs or adjectives to shared
     nodes are removed if cut is set to True and replaced by an edge going to the same shared node but originating from the
     conjunction node.
-    :param graph: DmrsGraph object
-    :param cycle: Set of Node objects in the cycle
+    :param matcher: CycleMatcher object
     :param cut: If True and cycle is matched, the cycle is broken by removing a target edge
-    :param realization: If True, tokalign cannot be used to decide which edge to cut. A simplified method is used instead.
     :return: True if cycle is matched, otherwise False
     """
 
-    conj_nodes = [node for node in cycle if is_conj(node)]
+    graph = matcher.graph
 
-    if len(conj_nodes) == 0:
-        return False
-
-    for conj_node in conj_nodes:
-        outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(conj_node) if edge.to_node in cycle]
-        verb_or_adj_nodes = list(set([edge.to_node for edge in outgoing_edges if edge.to_node.pos == 'v' or edge.to_node.pos == 'a']))
+    for conj_node in matcher.conj_nodes:
+        verb_or_adj_nodes = list(set([edge.to_node for edge in conj_node.outgoing if edge.to_node.pos == 'v' or edge.to_node.pos == 'a']))
 
         if len(verb_or_adj_nodes) != 2:
             continue
 
-        verb_or_adj_0_outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(verb_or_adj_nodes[0]) if edge.to_node in cycle]
-        verb_or_adj_1_outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(verb_or_adj_nodes[1]) if edge.to_node in cycle]
-
-        verb_or_adj_0_outgoing_adjacent_nodes = set(edge.to_node for edge in verb_or_adj_0_outgoing_edges)
-        verb_or_adj_1_outgoing_adjacent_nodes = set(edge.to_node for edge in verb_or_adj_1_outgoing_edges)
+        verb_or_adj_0_outgoing_adjacent_nodes = set(edge.to_node for edge in matcher[verb_or_adj_nodes[0]].outgoing)
+        verb_or_adj_1_outgoing_adjacent_nodes = set(edge.to_node for edge in matcher[verb_or_adj_nodes[1]].outgoing)
 
         common_outgoing_nodes = verb_or_adj_0_outgoing_adjacent_nodes & verb_or_adj_1_outgoing_adjacent_nodes
 
@@ -294,11 +457,11 @@ def process_conjunction_verb_or_adj(graph, cycle, cut=True, realization=False):
         if cut:
             edge_scores = []
             for node in common_outgoing_nodes:
-                for edge in graph.get_incoming_node_edges(node):
+                for edge in matcher[node].incoming:
                     if edge.from_node not in verb_or_adj_nodes:
                         continue
 
-                    if not realization:
+                    if not matcher.realization:
                         if not edge.from_node.tokalign or not edge.to_node.tokalign:
                             edge_score = 25
                         else:
@@ -313,31 +476,25 @@ def process_conjunction_verb_or_adj(graph, cycle, cut=True, realization=False):
             edge_distances = sorted(edge_scores, key=lambda x: x[0])
 
             for _, edge in edge_distances[1:]:
-                graph.edges.remove(edge)
+                matcher.cut(edge)
 
         return True
 
     return False
 
 
-def process_conjunction_index(graph, cycle, cut=True):
+def process_conjunction_index(matcher, cut=True):
     """
     Match a cycle if edges (HNDL and INDEX) of either side of a conjunction (right or left) connect to different nodes.
     INDEX edge is removed if cut is set to True.
-    :param graph: DmrsGraph object
-    :param cycle: Set of Node objects in the cycle
+    :param matcher: CycleMatcher object
     :param cut: If True and cycle is matched, the cycle is broken by removing a target edge
     :return: True if cycle is matched, otherwise False
     """
 
-    conj_nodes = [node for node in cycle if is_conj(node)]
-
-    if len(conj_nodes) == 0:
-        return False
-
     # Find conjunction nodes that have index and handel pointing to different nodes
-    for conj_node in conj_nodes:
-        outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(conj_node) if edge.to_node in cycle]
+    for conj_node in matcher.conj_nodes:
+        outgoing_edges = conj_node.outgoing
         outgoing_labels = dict((edge.label.split('_')[0], edge.to_node) for edge in outgoing_edges)
 
         detected = False
@@ -347,14 +504,14 @@ def process_conjunction_index(graph, cycle, cut=True):
 
             if cut:
                 r_index_edge = [edge for edge in outgoing_edges if edge.label.startswith('R-INDEX')][0]
-                graph.edges.remove(r_index_edge)
+                matcher.cut(r_index_edge)
 
         if 'L-INDEX' in outgoing_labels and 'L-HNDL' in outgoing_labels and outgoing_labels['L-INDEX'] != outgoing_labels['L-HNDL']:
             detected = True
 
             if cut:
                 l_index_edge = [edge for edge in outgoing_edges if edge.label.startswith('L-INDEX')][0]
-                graph.edges.remove(l_index_edge)
+                matcher.cut(l_index_edge)
 
         if detected:
             return True
@@ -362,45 +519,51 @@ def process_conjunction_index(graph, cycle, cut=True):
     return False
 
 
-def process_default(graph, cycle, cut=True, realization=False):
+def process_default(matcher, cut=True):
     """
     Match any cycle and remove the edge which spans the longest distance between tokens associated with the nodes it connects.
-    :param graph: DmrsGraph object
-    :param cycle: Set of Node objects in the cycle
+    :param matcher: CycleMatcher object
     :param cut: If True and cycle is matched, the cycle is broken by removing a target edge
-    :param realization: If True, tokalign cannot be used to decide which edge to cut. A simplified method is used instead.
     :return: True if cycle is matched, otherwise False
     """
 
-    cycle_edges = []
-    for node in cycle:
-        outgoing_edges = [edge for edge in graph.get_outgoing_node_edges(node) if edge.to_node in cycle]
-        cycle_edges.extend(outgoing_edges)
-
     edge_scores = []
-    for edge in cycle_edges:
+    for cycle_node in matcher.nodes:
+        for edge in cycle_node.outgoing:
 
-        if not realization:
-            if not edge.from_node.tokalign or not edge.to_node.tokalign:
-                continue
+            if not matcher.realization:
+                if not edge.from_node.tokalign or not edge.to_node.tokalign:
+                    continue
 
-            edge_score = token_distance(edge)
-            edge_scores.append((edge_score, edge))
+                edge_score = token_distance(edge)
+                edge_scores.append((edge_score, edge))
 
-        else:
-            edge_score = modifier_count(edge, graph)
-            edge_scores.append((edge_score, edge))
+            else:
+                edge_score = modifier_count(edge, matcher.graph)
+                edge_scores.append((edge_score, edge))
 
     if len(edge_scores) > 0:
         if cut:
             max_distance_edge = max(edge_scores)[1]
-            graph.edges.remove(max_distance_edge)
+            matcher.cut(max_distance_edge)
 
         return True
 
     return False
 
 
+# Cycle patterns as (name, debug name, function) tuples in the order they are tried. Pattern functions take a
+# CycleMatcher object and cut the cycle if they match it, so new patterns only need to be added here.
+CYCLE_PATTERNS = [('conj_index', 'CONJ_INDEX', process_conjunction_index),
+                  ('eq', 'EQ_', process_eq),
+                  ('control', 'CONTROL_', process_control),
+                  ('small_clause', 'SMALL_CLAUSE', process_small_clause),
+                  ('conj_verb_or_adj', 'CONJ_VERB_OR_ADJ', process_conjunction_verb_or_adj),
+                  ('default', 'DEFAULT_', process_default)]
+
+DEBUG_NAMES = dict((name, debug_name) for name, debug_name, _ in CYCLE_PATTERNS)
+
+
 def token_distance(edge):
     """
     Compute the (minimum) token distance that the edge spans. Consequence is cutting the longest edge.
@@ -3,20 +3,24 @@
 import os
 import errno
 import sys
+import random
 import argparse
-import xml.etree.ElementTree as xml
-from xml.etree.ElementTree import ParseError
+import multiprocessing
+from functools import partial
+from itertools import izip, repeat, islice
+from collections import Counter
 
-import token_align
-import unaligned_tokens_align
-import label
 import filter_gpred
-import handle_ltop
-import handle_unknown
-import cycle_remove
-import map_tokens
-import jaen_transfer_mt_prep
-from utility import empty, load_wmap, strip_source_information
+import xml_backend
+from binary_format import BinaryReader, BinaryWriter, is_binary_filename, write_record
+from cache import ConversionCache
+from checkpoint import CheckpointError, is_seekable_output, save_checkpoint, load_checkpoint
+from parallel import imap_ordered
+from pipeline import Pipeline, PipelineError, STAGES, preset_pipeline
+from profiling import CycleStatistics, PipelineProfiler
+from shard import parse_shard, select_shard, sentence_index, write_manifest
+from work_queue import QueueError, WorkQueue, run_worker
+from utility import load_wmap, open_file, iter_split
 
 
 def split_dmrs_file(content):
@@ -27,7 +31,7 @@ def split_dmrs_file(content):
 
 
 def read_file(filename, format='dmrs'):
-    with open(filename, 'rb') as f:
+    with open_file(filename, 'rb') as f:
         content = f.read().decode('utf-8').strip()
 
         if format == 'dmrs':
@@ -40,8 +44,44 @@ def read_file(filename, format='dmrs'):
             raise NotImplementedError('Format %s not supported.' % format)
 
 
+def iter_file(filename, format='dmrs'):
+    """
+    Read a DMRS, untokenized or tokenized file one sentence at a time, yielding the same items as read_file.
+    Only the current sentence is held in memory.
+    :param filename: Input file. DMRS files with the binary extension are read as binary DMRS.
+    :param format: File format (dmrs, untok or tok)
+    :return: Generator of DMRS strings or BinaryRecord objects, untokenized sentence strings or token lists
+    """
+
+    if format not in ('dmrs', 'untok', 'tok'):
+        raise NotImplementedError('Format %s not supported.' % format)
+
+    if format == 'dmrs' and is_binary_filename(filename):
+        with open_file(filename, 'rb') as f:
+            for record in BinaryReader(f).iter_records():
+                yield record
+
+        return
+
+    with open_file(filename, 'rb') as f:
+        lines = (line.decode('utf-8') for line in f)
+
+        if format == 'dmrs':
+            for dmrs in iter_split(lines, '<dmrs'):
+                if dmrs.strip() != '':
+                    yield ('<dmrs' + dmrs).strip()
+
+        elif format == 'untok':
+            for sent in iter_split(lines, '\n'):
+                yield sent.strip()
+
+        elif format == 'tok':
+            for sent in iter_split(lines, '\n'):
+                yield sent.strip().split(' ')
+
+
 def write_file(filename, dmrs_list):
-    with open(filename, 'wb') as f:
+    with open_file(filename, 'wb') as f:
         f.write('\n\n'.join(dmrs_list))
 
 
@@ -68,66 +108,125 @@ def process(dmrs, untok, tok,
             unknown_handle_lemmatizer=None,
             realization=False,
             realization_sanity_check=False,
-            transfer_mt_prep=False):
+            transfer_mt_prep=False,
+            pipeline=None):
+    """
+    Preprocess a single DMRS with the stages selected by the options.
+    :param pipeline: Pipeline created by preset_pipeline, used instead of the options. Create it once when
+     preprocessing many sentences, so that it is not created again for every sentence.
+    :return: Processed DMRS XML string
+    """
+
+    if pipeline is None:
+        pipeline = preset_pipeline(token_align_opt=token_align_opt,
+                                   unaligned_align_opt=unaligned_align_opt,
+                                   label_opt=label_opt,
+                                   handle_ltop_opt=handle_ltop_opt,
+                                   gpred_filter=gpred_filter,
+                                   gpred_curb_opt=gpred_curb_opt,
+                                   cycle_remove_opt=cycle_remove_opt,
+                                   map_node_tokens=map_node_tokens,
+                                   attach_untok=attach_untok,
+                                   attach_tok=attach_tok,
+                                   unknown_handle_lemmatizer=unknown_handle_lemmatizer,
+                                   realization=realization,
+                                   realization_sanity_check=realization_sanity_check,
+                                   transfer_mt_prep=transfer_mt_prep)
+
+        for warning in pipeline.warnings:
+            sys.stderr.write(warning + '\n')
+
+    return pipeline.run(dmrs, untok, tok)
+
+
+def build_pipeline(args):
+    """
+    Load stage resources (gpred filter, lemmatizer, word map) and create the pipeline selected by command line arguments.
+    :param args: Parsed command line arguments
+    :return: Pipeline object
+    """
 
-    parser = xml.XMLParser(encoding='utf-8')
+    if args.filter_gpred is not None:
+        gpred_filter = filter_gpred.parse_gpred_filter_file(args.filter_gpred)
+    else:
+        gpred_filter = None
 
-    try:
-        dmrs_xml = xml.fromstring(dmrs.encode('utf-8'), parser=parser)
+    if args.handle_unknown:
+        import spacy
+        lemmatizer = spacy.lemmatizer.Lemmatizer.from_package(spacy.util.get_package_by_name('en'))
+
+    else:
+        lemmatizer = None
 
-    except ParseError:
-        sys.stderr.write(dmrs + "\n")
-        raise
+    if args.map_node_tokens is not None:
+        wmap = load_wmap(args.map_node_tokens)
+    else:
+        wmap = None
 
-    if empty(dmrs_xml):
-        return dmrs
+    if args.stages is not None:
+        return Pipeline.from_names(args.stages.split(','), {'gpred_filter': gpred_filter,
+                                                             'handle_ltop': args.handle_ltop,
+                                                             'lemmatizer': lemmatizer,
+                                                             'realization': args.realization,
+                                                             'wmap': wmap})
+    else:
+        return preset_pipeline(token_align_opt=args.token_align,
+                               unaligned_align_opt=args.unaligned_align,
+                               label_opt=args.label,
+                               handle_ltop_opt=args.handle_ltop,
+                               gpred_filter=gpred_filter,
+                               unknown_handle_lemmatizer=lemmatizer,
+                               cycle_remove_opt=args.cycle_remove,
+                               gpred_curb_opt=args.gpred_curb,
+                               map_node_tokens=wmap,
+                               attach_untok=args.attach_untok,
+                               attach_tok=args.attach_tok,
+                               realization=args.realization,
+                               realization_sanity_check=args.realization_sanity_check,
+                               transfer_mt_prep=args.transfer_mt_prep)
 
-    if transfer_mt_prep:
-        dmrs_xml = jaen_transfer_mt_prep.preprocess(dmrs_xml)
 
-    if handle_ltop_opt:
-        dmrs_xml = handle_ltop.handle_ltop_links(dmrs_xml)
+def stage_cache_report(cache, pipeline, resumed):
+    """
+    :param cache: ConversionCache object used as stage cache
+    :param pipeline: Pipeline object
+    :param resumed: Counter of the number of stages restored from cache per sentence
+    :return: Report string
+    """
 
-    if gpred_filter is not None:
-        dmrs_xml = filter_gpred.filter_gpred(dmrs_xml, gpred_filter, handle_ltop=handle_ltop_opt)
+    report = ['Stage cache %s: %d entries' % (cache.filename, cache.size)]
 
-    if token_align_opt and not realization_sanity_check and not transfer_mt_prep:
-        dmrs_xml = token_align.align(dmrs_xml, untok, tok)
+    for count in xrange(len(pipeline.stages), 0, -1):
+        if resumed[count] > 0:
+            report.append('%d sentences resumed after %s' % (resumed[count], pipeline.names[count - 1]))
 
-    if unaligned_align_opt and not realization_sanity_check and not transfer_mt_prep:
-        if not token_align_opt:
-            sys.stderr.write('Warning: Token alignment needed before attempting to align unaligned tokens.')
+    report.append('%d sentences processed from the start' % resumed[0])
 
-        dmrs_xml = unaligned_tokens_align.align(dmrs_xml, tok)
+    if resumed[None] > 0:
+        report.append('%d empty' % resumed[None])
 
-    if gpred_curb_opt and not realization_sanity_check and not transfer_mt_prep:
-        dmrs_xml = filter_gpred.curb_gpred_spans(dmrs_xml)
+    return ', '.join(report)
 
-    if unknown_handle_lemmatizer is not None:
-        dmrs_xml = handle_unknown.handle_unknown_nodes(dmrs_xml, unknown_handle_lemmatizer)
 
-    if label_opt:
-        dmrs_xml = label.create_label(dmrs_xml, carg_clean=True)
+worker_pipeline = None
 
-    if cycle_remove_opt:
-        dmrs_xml = cycle_remove.cycle_remove(dmrs_xml, realization=realization)
 
-    if map_node_tokens is not None and not realization_sanity_check and not transfer_mt_prep:
-        wmap = map_node_tokens
-        dmrs_xml = map_tokens.map_tokens(dmrs_xml, tok, wmap)
+def init_worker(args, binary_output=False, stage_cache=False):
+    global worker_pipeline
+    worker_pipeline = build_pipeline(args)
+    worker_pipeline.binary_output = binary_output
 
-    if attach_untok and not realization_sanity_check and not transfer_mt_prep:
-        dmrs_xml.attrib['untok'] = untok
+    if stage_cache:
+        # Workers write to the cache file directly, so every write is committed immediately
+        worker_pipeline.cache = ConversionCache(args.stage_cache, max_entries=args.stage_cache_size, autocommit=True)
 
-    if attach_tok and not realization_sanity_check and not transfer_mt_prep:
-        dmrs_xml.attrib['tok'] = ' '.join(tok)
 
-    if realization_sanity_check:
-        dmrs_xml = strip_source_information(dmrs_xml)
+def process_chunk(chunk):
+    return [worker_pipeline.run(dmrs, untok, tok) for dmrs, untok, tok in chunk]
 
-    dmrs_string = xml.tostring(dmrs_xml, encoding='utf-8')
 
-    return dmrs_string
+def process_chunk_recorded(chunk, profile=False, cycle_stats=False):
+    return [worker_pipeline.run_recorded(dmrs, untok, tok, profile, cycle_stats) for dmrs, untok, tok in chunk]
 
 
 if __name__ == '__main__':
@@ -159,64 +258,304 @@ if __name__ == '__main__':
                         help='Preprocess DMRS obtained from transfer MT system.')
     parser.add_argument('-au', '--attach_untok', action='store_true', help='Attach the untokenized sentence to DMRS.')
     parser.add_argument('-at', '--attach_tok', action='store_true', help='Attach the tokenized sentence to DMRS.')
-    parser.add_argument('input_dmrs', help='Specify input dmrs file')
+    parser.add_argument('--stages', default=None,
+                        help='Comma separated list of stages to run in the given order instead of the stages selected '
+                             'by flags. Stage options are taken from the other flags. Available stages: %s.' %
+                             ', '.join(STAGES))
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+                        help='Number of worker processes. Each worker loads the gpred filter, lemmatizer and word map once.')
+    parser.add_argument('--chunksize', default=50, type=int, help='Number of sentences sent to a worker process at once.')
+    parser.add_argument('--xml_backend', default='auto', choices=xml_backend.BACKENDS,
+                        help='XML parser and serializer. auto uses lxml if it is installed and ElementTree otherwise. '
+                             'Output is the same with every backend.')
+    parser.add_argument('--profile', default=None,
+                        help='Record wall time of every stage and sentence and write a JSON report to the specified file.')
+    parser.add_argument('--profile_slowest', default=10, type=int,
+                        help='Number of slowest sentences listed in the profile report.')
+    parser.add_argument('--cycle_stats', default=None,
+                        help='Record the cycles broken by cycle removal and write a JSON report to the specified file, '
+                             'with the number and time of cycles per pattern, iterations per sentence, the sentences '
+                             'with the most iterations and the sentences with cycles that could not be broken.')
+    parser.add_argument('--cycle_stats_top', default=10, type=int,
+                        help='Number of sentences with the most cycle removal iterations listed in the cycle report.')
+    parser.add_argument('--shard', default=None, type=parse_shard,
+                        help='Only process shard i/N, i.e. sentences i, i + N, i + 2N, ... Shard outputs are combined '
+                             'with merge_shards.py.')
+    parser.add_argument('--queue', default=None,
+                        help='Work queue directory on a shared filesystem. Any number of workers started with the same '
+                             'queue directory and inputs claim chunks of sentences until all are done, and the last '
+                             'one writes the merged output.')
+    parser.add_argument('--queue_chunksize', default=1000, type=int,
+                        help='Number of sentences in a work queue chunk.')
+    parser.add_argument('--lease_timeout', default=600, type=int,
+                        help='Number of seconds after which a chunk claimed by an unresponsive worker is reclaimed.')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Periodically record the number of written sentences and the output size in the specified '
+                             'checkpoint file.')
+    parser.add_argument('--checkpoint_interval', default=1000, type=int,
+                        help='Number of sentences between checkpoints.')
+    parser.add_argument('--stage_cache', default=None,
+                        help='Persistent cache file storing the DMRS after every stage. Sentences processed before '
+                             'resume from the longest prefix of stages run with the same options, e.g. when only a '
+                             'late stage was added or changed.')
+    parser.add_argument('--stage_cache_size', default=1000000, type=int,
+                        help='Maximum number of DMRS in the stage cache. Least recently used entries are evicted '
+                             'first.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume an interrupted run from the checkpoint file, skipping sentences already written to '
+                             'output. Starts from the beginning if the checkpoint file does not exist.')
+    parser.add_argument('input_dmrs', help='Specify input dmrs file. Files ending in .dmrsb are read as binary DMRS.')
     parser.add_argument('input_untok', help='Specify input untokenized file')
     parser.add_argument('input_tok', help='Specify input tokenized file')
-    parser.add_argument('output_dmrs', help='Specify output dmrs file. Set "-" to output to standard output.')
+    parser.add_argument('output_dmrs', help='Specify output dmrs file. Set "-" to output to standard output. Files '
+                                            'ending in .dmrsb are written as binary DMRS.')
 
     args = parser.parse_args()
 
-    dmrs_list = read_file(args.input_dmrs, format='dmrs')
+    try:
+        xml_backend.use_backend(args.xml_backend)
+
+    except ImportError as e:
+        parser.error(str(e))
 
-    if not args.transfer_mt_prep:
-        untok_list = read_file(args.input_untok, format='untok')
-        tok_list = read_file(args.input_tok, format='tok')
-    else:
-        untok_list = [''] * len(dmrs_list)
-        tok_list = [''] * len(dmrs_list)
+    binary_output = is_binary_filename(args.output_dmrs)
 
-    if args.filter_gpred is not None:
-        gpred_filter = filter_gpred.parse_gpred_filter_file(args.filter_gpred)
+    if args.resume and args.checkpoint is None:
+        parser.error('--resume requires --checkpoint.')
+
+    # Finished chunks stay in the queue directory, so restarted workers already continue where they left off
+    if args.queue is not None and (args.checkpoint is not None or args.shard is not None):
+        parser.error('--queue cannot be combined with --checkpoint or --shard, since the queue already keeps finished '
+                     'chunks and splits the input between workers.')
+
+    if args.checkpoint is not None and not is_seekable_output(args.output_dmrs):
+        parser.error('--checkpoint requires an uncompressed XML output file.')
+
+    checkpoint_files = [os.path.abspath(filename) for filename in
+                        (args.input_dmrs, args.input_untok, args.input_tok, args.output_dmrs)]
+
+    def open_sentences():
+        dmrs_iter = iter_file(args.input_dmrs, format='dmrs')
+
+        if not args.transfer_mt_prep:
+            untok_iter = iter_file(args.input_untok, format='untok')
+            tok_iter = iter_file(args.input_tok, format='tok')
+        else:
+            untok_iter = repeat('')
+            tok_iter = repeat('')
+
+        return izip(dmrs_iter, untok_iter, tok_iter)
+
+    try:
+        pipeline = build_pipeline(args)
+
+    except PipelineError as e:
+        sys.stderr.write('%s\n' % e)
+        sys.exit(1)
+
+    for warning in pipeline.warnings:
+        sys.stderr.write(warning + '\n')
+
+    # Source information is shuffled with the RNG seeded once per process, as in serial runs before, so sentences have
+    # to be processed in order by a single process for the output to stay the same
+    if pipeline.order_dependent and (args.jobs > 1 or args.shard is not None or args.queue is not None or
+                                     args.stage_cache is not None):
+        parser.error('--realization_sanity_check and the strip_source stage cannot be combined with --jobs, --shard, '
+                     '--queue or --stage_cache.')
+
+    if args.queue is not None:
+        try:
+            queue = WorkQueue(args.queue, checkpoint_files[:3], chunk_size=args.queue_chunksize,
+                              lease_timeout=args.lease_timeout)
+
+        except QueueError as e:
+            sys.stderr.write('%s\n' % e)
+            sys.exit(1)
+
+    # Queue chunks are written as XML and only converted to binary DMRS when they are merged
+    binary_records = binary_output and args.queue is None
+    pipeline.binary_output = binary_records
+
+    if args.cycle_stats is not None and not pipeline.records_cycles:
+        sys.stderr.write('Warning: --cycle_stats is set, but the pipeline does not remove cycles.\n')
+
+    if args.stage_cache is not None:
+        cache = ConversionCache(args.stage_cache, max_entries=args.stage_cache_size)
+        pipeline.cache = cache
+        resumed = Counter()
     else:
-        gpred_filter = None
+        cache = None
 
-    if args.handle_unknown:
-        import spacy
-        lemmatizer = spacy.lemmatizer.Lemmatizer.from_package(spacy.util.get_package_by_name('en'))
+    profiler = PipelineProfiler(slowest=args.profile_slowest) if args.profile is not None else None
+    cycle_stats = CycleStatistics(top=args.cycle_stats_top) if args.cycle_stats is not None else None
 
+    # Profiled, cached and cycle recording runs return timing, cache and cycle information along with every processed
+    # sentence, so that it is collected in this process when sentences are processed by workers
+    recording = profiler is not None or cache is not None or cycle_stats is not None
+
+    if recording:
+        chunk_func = partial(process_chunk_recorded, profile=profiler is not None, cycle_stats=cycle_stats is not None)
+        run = partial(pipeline.run_recorded, profile=profiler is not None, cycle_stats=cycle_stats is not None)
     else:
-        lemmatizer = None
+        chunk_func = process_chunk
+        run = pipeline.run
+
+    def collect(index, result):
+        """
+        Record the information returned along with a processed sentence.
+        :param index: Sentence index in the input
+        :param result: Result of run or chunk_func for the sentence
+        :return: Processed DMRS
+        """
+
+        if not recording:
+            return result
+
+        dmrs_processed, stages_resumed, stage_times, nodes, edges, cycles = result
+
+        if profiler is not None:
+            profiler.record(index, stage_times, nodes, edges)
+
+        if cache is not None:
+            resumed[stages_resumed] += 1
+
+        if cycle_stats is not None:
+            # Cycles are None for empty DMRS and for sentences whose cycle removal was restored from the cache
+            cycle_stats.record(index, cycles, cached=cycles is None and bool(stages_resumed))
+
+        return dmrs_processed
+
+    def finish():
+        if profiler is not None:
+            profiler.write(args.profile)
+
+        if cycle_stats is not None:
+            cycle_stats.write(args.cycle_stats)
+
+        if cache is not None:
+            if args.jobs > 1:
+                cache.sync()
+
+            cache.close()
+            sys.stderr.write('%s\n' % stage_cache_report(cache, pipeline, resumed))
+
+    if args.jobs > 1 and cache is not None:
+        cache.connection.commit()
+
+    if args.queue is not None:
+        # Workers are started once and process every claimed chunk
+        pool = None
+
+        if args.jobs > 1:
+            pool = multiprocessing.Pool(args.jobs, init_worker, (args, binary_records, cache is not None))
+
+        def process_queue_chunk(first_index, chunk):
+            if pool is not None:
+                results = imap_ordered(chunk_func, chunk, args.jobs, chunksize=args.chunksize, pool=pool)
+            else:
+                results = (run(dmrs, untok, tok) for dmrs, untok, tok in chunk)
+
+            chunk_results = []
+
+            for result in results:
+                if recording:
+                    chunk_results.append(result)
+                    result = result[0]
+
+                yield result
+
+            # Only chunks processed to the end are collected, since a chunk whose lease was lost is left to another
+            # worker
+            for index, result in enumerate(chunk_results, first_index):
+                collect(index, result)
+
+        try:
+            chunks = run_worker(queue, open_sentences, process_queue_chunk, args.output_dmrs,
+                                poll_interval=min(10, args.lease_timeout / 4.0))
+
+            if pool is not None:
+                pool.close()
+
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        finish()
+        sys.stderr.write('Processed %d chunks.\n' % chunks)
+        sys.exit(0)
+
+    # Stage keys identify the stages and their options, so that a run is only resumed with the same pipeline
+    stage_keys = pipeline.prefix_keys if args.checkpoint is not None else []
+
+    if args.resume:
+        try:
+            start, output_offset, random_state = load_checkpoint(args.checkpoint, checkpoint_files, args.shard,
+                                                                 stage_keys)
+
+        except CheckpointError as e:
+            sys.stderr.write('%s\n' % e)
+            sys.exit(1)
+
+        # Continue the shuffles of strip_source where the interrupted run left off
+        if random_state is not None:
+            random.setstate(random_state)
 
-    if args.map_node_tokens is not None:
-        wmap = load_wmap(args.map_node_tokens)
     else:
-        wmap = None
+        start, output_offset = 0, 0
 
     if args.output_dmrs == '-':
         out = sys.stdout
+
+    elif start > 0:
+        # Drop anything written after the last checkpoint
+        out = open(args.output_dmrs, 'r+b')
+        out.seek(0, os.SEEK_END)
+
+        if out.tell() < output_offset:
+            sys.stderr.write('Output file %s is shorter than recorded in checkpoint %s.\n' %
+                             (args.output_dmrs, args.checkpoint))
+            sys.exit(1)
+
+        out.seek(output_offset)
+        out.truncate()
+
+    elif binary_output:
+        out = BinaryWriter(open_file(args.output_dmrs, 'wb'))
+
+    else:
+        out = open_file(args.output_dmrs, 'wb')
+
+    # Inputs are read sequentially, so sentences written before the checkpoint are skipped without processing
+    sentences = islice(select_shard(open_sentences(), args.shard), start, None)
+
+    if args.jobs > 1:
+        results = imap_ordered(chunk_func, sentences, args.jobs, chunksize=args.chunksize,
+                               initializer=init_worker, initargs=(args, binary_records, cache is not None))
     else:
-        out = open(args.output_dmrs, 'wb')
-
-    dmrs_processed_list = list()
-    for dmrs, untok, tok in zip(dmrs_list, untok_list, tok_list):
-
-        dmrs_processed = process(dmrs, untok, tok,
-                                 token_align_opt=args.token_align,
-                                 unaligned_align_opt=args.unaligned_align,
-                                 label_opt=args.label,
-                                 handle_ltop_opt=args.handle_ltop,
-                                 gpred_filter=gpred_filter,
-                                 unknown_handle_lemmatizer=lemmatizer,
-                                 cycle_remove_opt=args.cycle_remove,
-                                 gpred_curb_opt=args.gpred_curb,
-                                 map_node_tokens=wmap,
-                                 attach_untok=args.attach_untok,
-                                 attach_tok=args.attach_tok,
-                                 realization=args.realization,
-                                 realization_sanity_check=args.realization_sanity_check,
-                                 transfer_mt_prep=args.transfer_mt_prep)
-
-        out.write('%s\n\n' % dmrs_processed)
+        results = (run(dmrs, untok, tok) for dmrs, untok, tok in sentences)
+
+    written = start
+    for index, result in enumerate(results, start):
+        dmrs_processed = collect(sentence_index(index, args.shard), result)
+
+        write_record(out, dmrs_processed)
+        written = index + 1
+
+        if args.checkpoint is not None and written % args.checkpoint_interval == 0:
+            out.flush()
+            os.fsync(out.fileno())
+            save_checkpoint(args.checkpoint, written, out.tell(), checkpoint_files, args.shard, stage_keys,
+                            random.getstate())
 
     if args.output_dmrs != '-':
         out.close()
+
+    if args.checkpoint is not None:
+        save_checkpoint(args.checkpoint, written, os.path.getsize(args.output_dmrs), checkpoint_files, args.shard,
+                        stage_keys, random.getstate())
+
+    if args.shard is not None and args.output_dmrs != '-':
+        write_manifest(args.output_dmrs, args.shard, written)
+
+    finish()
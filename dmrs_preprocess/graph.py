@@ -1,18 +1,40 @@
-import xml.etree.ElementTree as xml
+from collections import MutableSet
+
+import xml_backend as xml
 
 
 class DmrsGraph(object):
 
     def __init__(self, nodes, edges, attrib):
         self.nodes = set(nodes)
-        self.edges = set(edges)
+        self.edges = edges
         self.attrib = attrib
 
-    def get_outgoing_node_edges(self, node):
-        return [edge for edge in self.edges if edge.from_node.node_id == node.node_id]
+    @property
+    def edges(self):
+        return self._edges
+
+    @edges.setter
+    def edges(self, edges):
+        self._edges = EdgeSet(edges)
+
+    def get_outgoing_node_edges(self, node, label=None):
+        """
+        :param node: Node object
+        :param label: If given, only return edges with this label
+        :return: List of edges originating from the node
+        """
 
-    def get_incoming_node_edges(self, node):
-        return [edge for edge in self.edges if edge.to_node.node_id == node.node_id]
+        return self._edges.get_outgoing(node.node_id, label)
+
+    def get_incoming_node_edges(self, node, label=None):
+        """
+        :param node: Node object
+        :param label: If given, only return edges with this label
+        :return: List of edges pointing to the node
+        """
+
+        return self._edges.get_incoming(node.node_id, label)
 
     def get_incident_edges(self, node):
         return self.get_outgoing_node_edges(node) + self.get_incoming_node_edges(node)
@@ -26,61 +48,283 @@ class DmrsGraph(object):
     def get_adjacent_nodes(self, node):
         return self.get_child_nodes(node) + self.get_parent_nodes(node)
 
-    def contains_directed_cycle(self):
+    def contains_directed_cycle(self, nodes=None):
         """
         Check whether the graph contains a directed cycle by iteratively removing nodes that either have no parents or no children.
-         When no nodes can be removed from the remaining list, the graph has a cycle.
+         When no nodes can be removed from the remaining list, the graph has a cycle. Nodes are queued for removal as soon
+         as their last remaining child or parent is queued, so every node and edge is visited once. The remaining nodes
+         do not depend on the removal order.
+        :param nodes: If given, only check the subgraph of these nodes
         :return: Set of Node objects in the cycle or empty set if no cycle exists.
         """
 
-        nodes_from = dict((node, set(self.get_child_nodes(node))) for node in self.nodes)
-        nodes_to = dict((node, set(self.get_parent_nodes(node))) for node in self.nodes)
+        nodes = self.nodes if nodes is None else nodes
+        node_ids = dict((node.node_id, node) for node in nodes)
 
-        remaining_nodes = set(self.nodes)
-        has_node_been_removed = True
+        nodes_from = dict((node_id, set(edge.to_node.node_id for edge in self._edges.outgoing.get(node_id, ())
+                                        if edge.to_node.node_id in node_ids))
+                          for node_id in node_ids)
+        nodes_to = dict((node_id, set(edge.from_node.node_id for edge in self._edges.incoming.get(node_id, ())
+                                      if edge.from_node.node_id in node_ids))
+                        for node_id in node_ids)
 
-        while has_node_been_removed:
-            has_node_been_removed = False
+        child_counts = dict((node_id, len(children)) for node_id, children in nodes_from.iteritems())
+        parent_counts = dict((node_id, len(parents)) for node_id, parents in nodes_to.iteritems())
 
-            for node in remaining_nodes:
-                # If node has no children, remove it
-                if len(nodes_from[node] & remaining_nodes) == 0:
-                    remaining_nodes.remove(node)
-                    has_node_been_removed = True
-                    break
+        queue = [node_id for node_id in node_ids if child_counts[node_id] == 0 or parent_counts[node_id] == 0]
+        queued = set(queue)
 
-                # If node has no parents, remove it
-                elif len(nodes_to[node] & remaining_nodes) == 0:
-                    remaining_nodes.remove(node)
-                    has_node_been_removed = True
-                    break
+        while queue:
+            node_id = queue.pop()
 
-        return remaining_nodes
+            for parent_id in nodes_to[node_id]:
+                if parent_id not in queued:
+                    child_counts[parent_id] -= 1
+
+                    # If node was the last child of parent, remove parent
+                    if child_counts[parent_id] == 0:
+                        queue.append(parent_id)
+                        queued.add(parent_id)
 
-    def contains_undirected_cycle(self):
+            for child_id in nodes_from[node_id]:
+                if child_id not in queued:
+                    parent_counts[child_id] -= 1
+
+                    # If node was the last parent of child, remove child
+                    if parent_counts[child_id] == 0:
+                        queue.append(child_id)
+                        queued.add(child_id)
+
+        return self._remaining_nodes(nodes, node_ids, queued)
+
+    def contains_undirected_cycle(self, nodes=None):
         """
         Check whether the graph contains an undirected cycle by iteratively removing nodes that have a single adjacent node.
-         When no nodes can be removed from the remaining list, the graph has a cycle.
+         When no nodes can be removed from the remaining list, the graph has a cycle. Nodes are queued for removal as soon
+         as they are left with a single adjacent node, so every node and edge is visited once. The remaining nodes do not
+         depend on the removal order.
+        :param nodes: If given, only check the subgraph of these nodes
         :return: Set of Node objects in the cycle or empty set if no cycle exists.
         """
 
-        adjacent_nodes = dict((node, set(self.get_adjacent_nodes(node))) for node in self.nodes)
+        nodes = self.nodes if nodes is None else nodes
+        node_ids = dict((node.node_id, node) for node in nodes)
+
+        adjacent_nodes = {}
+        for node_id in node_ids:
+            adjacent = set(edge.to_node.node_id for edge in self._edges.outgoing.get(node_id, ()))
+            adjacent.update(edge.from_node.node_id for edge in self._edges.incoming.get(node_id, ()))
+            adjacent_nodes[node_id] = set(adjacent_id for adjacent_id in adjacent if adjacent_id in node_ids)
+
+        adjacent_counts = dict((node_id, len(adjacent)) for node_id, adjacent in adjacent_nodes.iteritems())
+
+        queue = [node_id for node_id in node_ids if adjacent_counts[node_id] <= 1]
+        queued = set(queue)
 
-        remaining_nodes = set(self.nodes)
-        has_node_been_removed = True
+        while queue:
+            node_id = queue.pop()
+
+            for adjacent_id in adjacent_nodes[node_id]:
+                if adjacent_id not in queued:
+                    adjacent_counts[adjacent_id] -= 1
+
+                    # If adjacent node is left with a single adjacent node, remove it
+                    if adjacent_counts[adjacent_id] <= 1:
+                        queue.append(adjacent_id)
+                        queued.add(adjacent_id)
+
+        return self._remaining_nodes(nodes, node_ids, queued)
+
+    @staticmethod
+    def _remaining_nodes(nodes, node_ids, removed_ids):
+        """
+        Remove nodes from a copy of the node set, which keeps the iteration order of the remaining nodes the same as
+        removing them one at a time during peeling would.
+        :param nodes: Set of checked Node objects
+        :param node_ids: Dictionary of Node objects by node ID
+        :param removed_ids: Set of removed node IDs
+        :return: Set of remaining Node objects
+        """
 
-        while has_node_been_removed:
-            has_node_been_removed = False
+        remaining_nodes = set(nodes)
 
-            for node in remaining_nodes:
-                # If node has a single adjacent node, remove it
-                if len(adjacent_nodes[node] & remaining_nodes) <= 1:
-                    remaining_nodes.remove(node)
-                    has_node_been_removed = True
-                    break
+        for node_id in removed_ids:
+            remaining_nodes.remove(node_ids[node_id])
 
         return remaining_nodes
 
+    def get_connected_components(self, nodes):
+        """
+        Split nodes into the connected components of the subgraph they induce, ignoring edge direction.
+        :param nodes: Set of Node objects
+        :return: List of sets of Node objects
+        """
+
+        node_ids = dict((node.node_id, node) for node in nodes)
+        visited = set()
+        components = []
+
+        for start_id in node_ids:
+            if start_id in visited:
+                continue
+
+            visited.add(start_id)
+            stack = [start_id]
+            component = []
+
+            while stack:
+                node_id = stack.pop()
+                component.append(node_ids[node_id])
+
+                adjacent_ids = [edge.to_node.node_id for edge in self._edges.outgoing.get(node_id, ())]
+                adjacent_ids.extend(edge.from_node.node_id for edge in self._edges.incoming.get(node_id, ()))
+
+                for adjacent_id in adjacent_ids:
+                    if adjacent_id in node_ids and adjacent_id not in visited:
+                        visited.add(adjacent_id)
+                        stack.append(adjacent_id)
+
+            components.append(set(component))
+
+        return components
+
+    def peel_directed_cycle(self, node_ids, start_ids):
+        """
+        Update the nodes remaining after contains_directed_cycle when edges between them were removed. Starting from the
+        nodes of the removed edges, nodes left without children or parents are removed iteratively, so only the nodes
+        around the removed edges are visited. The remaining nodes are the same as those found by checking again.
+        :param node_ids: Set of IDs of nodes remaining after contains_directed_cycle
+        :param start_ids: IDs of the nodes of the removed edges
+        :return: Set of IDs of the nodes that are no longer in a cycle
+        """
+
+        removed_ids = set()
+        stack = [node_id for node_id in start_ids if node_id in node_ids]
+
+        while stack:
+            node_id = stack.pop()
+
+            if node_id in removed_ids:
+                continue
+
+            child_ids = set(edge.to_node.node_id for edge in self._edges.outgoing.get(node_id, ())
+                            if edge.to_node.node_id in node_ids and edge.to_node.node_id not in removed_ids)
+            parent_ids = set(edge.from_node.node_id for edge in self._edges.incoming.get(node_id, ())
+                             if edge.from_node.node_id in node_ids and edge.from_node.node_id not in removed_ids)
+
+            # If node has no children or no parents left, remove it and check its neighbours again
+            if not child_ids or not parent_ids:
+                removed_ids.add(node_id)
+                stack.extend(child_ids)
+                stack.extend(parent_ids)
+
+        return removed_ids
+
+    def peel_undirected_cycle(self, node_ids, start_ids):
+        """
+        Update the nodes remaining after contains_undirected_cycle when edges between them were removed. Starting from
+        the nodes of the removed edges, nodes left with a single adjacent node are removed iteratively, so only the nodes
+        around the removed edges are visited. The remaining nodes are the same as those found by checking again.
+        :param node_ids: Set of IDs of nodes remaining after contains_undirected_cycle
+        :param start_ids: IDs of the nodes of the removed edges
+        :return: Set of IDs of the nodes that are no longer in a cycle
+        """
+
+        removed_ids = set()
+        stack = [node_id for node_id in start_ids if node_id in node_ids]
+
+        while stack:
+            node_id = stack.pop()
+
+            if node_id in removed_ids:
+                continue
+
+            adjacent_ids = set(edge.to_node.node_id for edge in self._edges.outgoing.get(node_id, ()))
+            adjacent_ids.update(edge.from_node.node_id for edge in self._edges.incoming.get(node_id, ()))
+            adjacent_ids = set(adjacent_id for adjacent_id in adjacent_ids
+                               if adjacent_id in node_ids and adjacent_id not in removed_ids)
+
+            # If node is left with a single adjacent node, remove it and check its neighbours again
+            if len(adjacent_ids) <= 1:
+                removed_ids.add(node_id)
+                stack.extend(adjacent_ids)
+
+        return removed_ids
+
+    def split_connected_component(self, node_ids, start_ids):
+        """
+        Find the parts split off from a connected component after nodes or edges were removed from it, ignoring edge
+        direction. Every part contains a node that was adjacent to a removed node or edge. Searches from these nodes
+        are advanced alternately by one node and merged when they meet, until at most one of them has not ended. Each
+        ended search has visited a whole part, so parts are found in time proportional to their size, and the nodes
+        not visited by ended searches form the remaining part without being traversed.
+        :param node_ids: Set of IDs of the remaining nodes of the component
+        :param start_ids: IDs of the nodes that were adjacent to removed nodes or edges
+        :return: List of sets of node IDs of the parts found by ended searches
+        """
+
+        owners = {}
+        frontiers = []
+
+        for start_id in start_ids:
+            if start_id in node_ids and start_id not in owners:
+                owners[start_id] = len(frontiers)
+                frontiers.append([start_id])
+
+        # Searches merged into another search, by search index
+        merged = {}
+
+        active = range(len(frontiers))
+        ended = []
+
+        while len(active) > 1:
+            for search in active:
+                if search in merged:
+                    continue
+
+                frontier = frontiers[search]
+
+                if not frontier:
+                    ended.append(search)
+                    continue
+
+                node_id = frontier.pop()
+
+                adjacent_ids = [edge.to_node.node_id for edge in self._edges.outgoing.get(node_id, ())]
+                adjacent_ids.extend(edge.from_node.node_id for edge in self._edges.incoming.get(node_id, ()))
+
+                for adjacent_id in adjacent_ids:
+                    if adjacent_id not in node_ids:
+                        continue
+
+                    if adjacent_id not in owners:
+                        owners[adjacent_id] = search
+                        frontier.append(adjacent_id)
+                        continue
+
+                    owner = owners[adjacent_id]
+                    while owner in merged:
+                        owner = merged[owner]
+
+                    # Searches meeting in the same part continue as one
+                    if owner != search:
+                        frontier.extend(frontiers[owner])
+                        frontiers[owner] = None
+                        merged[owner] = search
+
+            active = [search for search in active if search not in merged and search not in ended]
+
+        parts = dict((search, set()) for search in ended)
+
+        for node_id, owner in owners.iteritems():
+            while owner in merged:
+                owner = merged[owner]
+
+            if owner in parts:
+                parts[owner].add(node_id)
+
+        return [parts[search] for search in ended]
+
     def contains_cycle(self):
         """
         Checks whether the graph contains any cycle, directed or undirected.
@@ -99,6 +343,78 @@ class DmrsGraph(object):
         return set()
 
 
+class EdgeSet(MutableSet):
+    """
+    Set of Edge objects with outgoing and incoming adjacency indexes by node ID and by node ID and edge label. The
+    indexes are updated by every change to the set, e.g. graph.edges.remove(edge), so neighbour queries take time
+    proportional to the node degree. Adjacency lists are in set iteration order, so queries return edges in the same
+    order as filtering the whole set would.
+    """
+
+    def __init__(self, edges=()):
+        self.edges = set(edges)
+
+        self.outgoing = {}
+        self.incoming = {}
+        self.outgoing_labels = {}
+        self.incoming_labels = {}
+
+        for edge in self.edges:
+            self._index(edge)
+
+    def __repr__(self):
+        return "EdgeSet(%r)" % list(self.edges)
+
+    def __contains__(self, edge):
+        return edge in self.edges
+
+    def __iter__(self):
+        return iter(self.edges)
+
+    def __len__(self):
+        return len(self.edges)
+
+    def add(self, edge):
+        if edge not in self.edges:
+            self.edges.add(edge)
+            self._index(edge)
+
+    def discard(self, edge):
+        if edge in self.edges:
+            self.edges.remove(edge)
+            self._unindex(edge)
+
+    def get_outgoing(self, node_id, label=None):
+        if label is None:
+            return list(self.outgoing.get(node_id, ()))
+
+        return list(self.outgoing_labels.get((node_id, label), ()))
+
+    def get_incoming(self, node_id, label=None):
+        if label is None:
+            return list(self.incoming.get(node_id, ()))
+
+        return list(self.incoming_labels.get((node_id, label), ()))
+
+    def _index(self, edge):
+        from_id = edge.from_node.node_id
+        to_id = edge.to_node.node_id
+
+        self.outgoing.setdefault(from_id, []).append(edge)
+        self.incoming.setdefault(to_id, []).append(edge)
+        self.outgoing_labels.setdefault((from_id, edge.label), []).append(edge)
+        self.incoming_labels.setdefault((to_id, edge.label), []).append(edge)
+
+    def _unindex(self, edge):
+        from_id = edge.from_node.node_id
+        to_id = edge.to_node.node_id
+
+        self.outgoing[from_id].remove(edge)
+        self.incoming[to_id].remove(edge)
+        self.outgoing_labels[(from_id, edge.label)].remove(edge)
+        self.incoming_labels[(to_id, edge.label)].remove(edge)
+
+
 class Node(object):
 
     def __init__(self, node_id, label, tokalign, xml_entity, lemma=None, sense=None, pos=None, gpred=None):
@@ -185,9 +501,14 @@ class Edge(object):
             return 0
 
 
-def load_xml(dmrs_xml):
+def load_xml(dmrs_xml, unicode_labels=False):
     """
     Load a DMRS XML graph representation into DmrsGraph object consisting of Nodes and Edges.
+    :param dmrs_xml: DMRS XML object
+    :param unicode_labels: If True, node labels are read as unicode. ElementTree returns labels created by the label
+     stage earlier in the same run as unicode, but lxml returns ASCII values as str. Node hashes depend on the label
+     type, so the label type determines the order of node sets.
+    :return: DmrsGraph object
     """
 
     nodes = {}
@@ -200,6 +521,9 @@ def load_xml(dmrs_xml):
 
             label = element.attrib.get('label')
 
+            if unicode_labels and isinstance(label, str):
+                label = label.decode('utf-8')
+
             tokalign = element.attrib.get('tokalign')
 
             if tokalign == '-1' or tokalign is None:
@@ -241,8 +565,7 @@ def load_xml(dmrs_xml):
 
 
 def dump_xml(dmrs_graph):
-    dmrs_xml = xml.Element('dmrs')
-    dmrs_xml.attrib = dmrs_graph.attrib
+    dmrs_xml = xml.Element('dmrs', dmrs_graph.attrib)
     dmrs_xml.text = '\n'
     dmrs_xml.tail = '\n'
 
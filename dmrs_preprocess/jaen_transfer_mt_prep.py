@@ -1,4 +1,4 @@
-import xml.etree.ElementTree as xml
+import xml_backend as xml
 
 from label import collect_node_attribs
 
@@ -122,17 +122,11 @@ def create_realpred_replacement_node(old_node_xml, realpred_attrib=None, sortinf
     if carg is not None:
         node.attrib['carg'] = u'"{}"'.format(carg)
 
-    realpred = xml.Element('realpred')
-    sortinfo = xml.Element('sortinfo')
+    realpred = xml.Element('realpred', realpred_attrib if realpred_attrib is not None else {})
+    sortinfo = xml.Element('sortinfo', sortinfo_attrib if sortinfo_attrib is not None else {})
     node.append(realpred)
     node.append(sortinfo)
 
-    if realpred_attrib is not None:
-        realpred.attrib = realpred_attrib
-
-    if sortinfo_attrib is not None:
-        sortinfo.attrib = sortinfo_attrib
-
     return node
 
 
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+
+from binary_format import BinaryReader, BinaryRecord, BinaryWriter, is_binary_filename, write_record
+from shard import ShardError, read_manifest
+from utility import open_file
+
+
+def iter_records(f, format='dmrs'):
+    """
+    Read output records with their exact bytes, including trailing separators, so that concatenating the records
+    reproduces the file.
+    :param f: File object
+    :param format: Record format. dmrs records start with a line beginning with <dmrs, line records are single lines.
+    :return: Generator of record strings
+    """
+
+    if format == 'line':
+        for line in f:
+            yield line
+
+        return
+
+    record = []
+
+    for line in f:
+        if line.startswith('<dmrs') and record:
+            yield ''.join(record)
+            record = []
+
+        record.append(line)
+
+    if record:
+        yield ''.join(record)
+
+
+def open_records(f, filename, format='dmrs'):
+    """
+    Read records of a text file with iter_records or of a binary DMRS file as BinaryRecord objects.
+    :param f: File object
+    :param filename: File name deciding between text and binary records
+    :param format: Text record format
+    :return: Generator of records
+    """
+
+    if is_binary_filename(filename):
+        return BinaryReader(f).iter_records()
+
+    return iter_records(f, format)
+
+
+def copy_record(out, record):
+    """
+    Write a record read with open_records to a text file or BinaryWriter. Text records copied to text files keep their
+    exact bytes.
+    :param out: File object or BinaryWriter object
+    :param record: Record string including its trailing separator, or BinaryRecord object
+    """
+
+    if isinstance(record, BinaryRecord):
+        write_record(out, record)
+
+    elif isinstance(out, BinaryWriter):
+        out.write(record[:-2] if record.endswith('\n\n') else record)
+
+    else:
+        out.write(record)
+
+
+def check_manifests(shard_filenames):
+    """
+    Check that the shard files hold every shard of the same split exactly once and that the sentence counts add up.
+    :param shard_filenames: List of shard output files
+    :return: List of (shard file, sentence count) tuples ordered by shard index
+    """
+
+    shards = {}
+    shard_count = None
+
+    for filename in shard_filenames:
+        index, count, sentences = read_manifest(filename)
+
+        if shard_count is None:
+            shard_count = count
+
+        elif count != shard_count:
+            raise ShardError('Shard %s is shard %d/%d, but other shards are split %d ways.' %
+                             (filename, index, count, shard_count))
+
+        if index in shards:
+            raise ShardError('Shard %d/%d given more than once: %s and %s.' %
+                             (index, count, shards[index][0], filename))
+
+        shards[index] = (filename, sentences)
+
+    missing = [str(shard_index) for shard_index in xrange(shard_count) if shard_index not in shards]
+
+    if missing:
+        raise ShardError('Missing shards %s of %d.' % (', '.join(missing), shard_count))
+
+    # Round-robin sharding gives the first (total % N) shards one sentence more than the rest
+    total = sum(sentences for _, sentences in shards.values())
+
+    for index in xrange(shard_count):
+        expected = (total - index + shard_count - 1) // shard_count
+
+        if shards[index][1] != expected:
+            raise ShardError('Shard %d/%d holds %d sentences, expected %d for %d sentences in total.' %
+                             (index, shard_count, shards[index][1], expected, total))
+
+    return [shards[index] for index in xrange(shard_count)]
+
+
+def merge_shards(shard_filenames, out, format='dmrs'):
+    """
+    Interleave shard outputs back into input order.
+    :param shard_filenames: List of shard output files, in any order
+    :param out: Output file object or BinaryWriter object
+    :param format: Record format of text shard files (dmrs or line)
+    :return: Number of merged sentences
+    """
+
+    shards = check_manifests(shard_filenames)
+
+    files = [open_file(filename, 'rb') for filename, _ in shards]
+    readers = [open_records(f, filename, format) for f, (filename, _) in zip(files, shards)]
+
+    try:
+        total = sum(sentences for _, sentences in shards)
+
+        for index in xrange(total):
+            shard_index = index % len(shards)
+            record = next(readers[shard_index], None)
+
+            if record is None:
+                raise ShardError('Shard file %s ends before sentence %d.' % (shards[shard_index][0], index))
+
+            copy_record(out, record)
+
+        for (filename, sentences), reader in zip(shards, readers):
+            if next(reader, None) is not None:
+                raise ShardError('Shard file %s holds more than the %d sentences in its manifest.' %
+                                 (filename, sentences))
+
+    finally:
+        for f in files:
+            f.close()
+
+    return total
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Merge outputs of runs with --shard i/N back into input order.')
+    parser.add_argument('-f', '--format', default='dmrs', choices=['dmrs', 'line'],
+                        help='Record format. Use line for MRS written by mrs_to_dmrs.py --reverse.')
+    parser.add_argument('-o', '--output', default='-',
+                        help='Specify output file. Set "-" to output to standard output. Files ending in .dmrsb are '
+                             'written as binary DMRS.')
+    parser.add_argument('shards', nargs='+',
+                        help='Shard output files, each with its .shard manifest. Shards ending in .dmrsb are read as '
+                             'binary DMRS.')
+
+    args = parser.parse_args()
+
+    if args.output == '-':
+        out = sys.stdout
+    elif is_binary_filename(args.output):
+        out = BinaryWriter(open_file(args.output, 'wb'))
+    else:
+        out = open_file(args.output, 'wb')
+
+    try:
+        sentences = merge_shards(args.shards, out, args.format)
+
+    except ShardError as e:
+        sys.stderr.write('%s\n' % e)
+        sys.exit(1)
+
+    if args.output != '-':
+        out.close()
+
+    sys.stderr.write('Merged %d sentences from %d shards.\n' % (sentences, len(args.shards)))
@@ -0,0 +1,70 @@
+import multiprocessing
+from collections import deque
+
+
+def chunked(iterable, chunksize):
+    chunk = []
+
+    for item in iterable:
+        chunk.append(item)
+
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def imap_ordered(func, iterable, jobs, chunksize=100, max_inflight=None, initializer=None, initargs=(), pool=None):
+    """
+    Apply func to chunks of iterable in a pool of worker processes and yield the results one at a time in input order.
+    Unlike Pool.imap, input is only consumed as results are yielded, so memory stays bounded on arbitrarily long input.
+    :param func: Module level function taking a list of items and returning a list of results
+    :param iterable: Input items
+    :param jobs: Number of worker processes
+    :param chunksize: Number of items sent to a worker in a single task
+    :param max_inflight: Maximum number of submitted chunks whose results have not been yielded yet (default 2 * jobs)
+    :param initializer: Function called once in each worker process on startup
+    :param initargs: Arguments for initializer
+    :param pool: Running pool of jobs worker processes to use instead of starting one, so that workers and the resources
+     they loaded are kept across calls. It is left running, while a pool started here is terminated at the end.
+    :return: Generator of results
+    """
+
+    if max_inflight is None:
+        max_inflight = 2 * jobs
+
+    if pool is not None:
+        return imap_pool(pool, func, iterable, chunksize, max_inflight)
+
+    return imap_new_pool(func, iterable, jobs, chunksize, max_inflight, initializer, initargs)
+
+
+def imap_new_pool(func, iterable, jobs, chunksize, max_inflight, initializer, initargs):
+    pool = multiprocessing.Pool(jobs, initializer, initargs)
+
+    try:
+        for result in imap_pool(pool, func, iterable, chunksize, max_inflight):
+            yield result
+
+        pool.close()
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def imap_pool(pool, func, iterable, chunksize, max_inflight):
+    inflight = deque()
+
+    for chunk in chunked(iterable, chunksize):
+        inflight.append(pool.apply_async(func, (chunk,)))
+
+        if len(inflight) >= max_inflight:
+            for result in inflight.popleft().get():
+                yield result
+
+    while inflight:
+        for result in inflight.popleft().get():
+            yield result
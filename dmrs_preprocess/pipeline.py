@@ -0,0 +1,550 @@
+import sys
+import time
+import hashlib
+import inspect
+from collections import OrderedDict
+
+import token_align
+import unaligned_tokens_align
+import label
+import filter_gpred
+import handle_ltop
+import handle_unknown
+import cycle_remove
+import map_tokens
+import jaen_transfer_mt_prep
+import xml_backend as xml
+from binary_format import BinaryRecord
+from utility import empty, strip_source_information
+
+
+# Increase when stage behaviour changes, so that stage cache entries of earlier versions are not used
+STAGE_CACHE_VERSION = 3
+
+
+class PipelineError(Exception):
+    pass
+
+
+class Stage(object):
+
+    def __init__(self, name, func, requires=()):
+        """
+        :param name: Stage name
+        :param func: Function taking (dmrs_xml, untok, tok, **options) and returning modified DMRS XML
+        :param requires: Names of stages that need to run before this stage
+        """
+
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.options = tuple(inspect.getargspec(func).args[3:])
+
+    def __repr__(self):
+        return "Stage(name=%r,requires=%r)" % (self.name, self.requires)
+
+    def __call__(self, dmrs_xml, untok, tok, **options):
+        return self.func(dmrs_xml, untok, tok, **options)
+
+    def key(self, options):
+        """
+        :param options: Stage options dictionary
+        :return: String identifying the stage and its option values
+        """
+
+        return '%s(%s)' % (self.name, option_fingerprint(options))
+
+
+def load_snapshot(snapshot):
+    """
+    Parse a DMRS stored in the stage cache, restoring the tail that follows the root element.
+    :param snapshot: Serialized DMRS XML string
+    :return: DMRS XML element
+    """
+
+    end = snapshot.rindex('>') + 1
+    dmrs_xml = xml.fromstring(snapshot[:end])
+    dmrs_xml.tail = snapshot[end:] or None
+
+    return dmrs_xml
+
+
+def option_fingerprint(value):
+    """
+    Create a string representation of a stage option value that is the same in every run. Sets and dictionaries are
+    sorted. Other objects, such as the lemmatizer, are represented by their type.
+    :param value: Option value
+    :return: Fingerprint string
+    """
+
+    if value is None or isinstance(value, (basestring, bool, int, long, float)):
+        return repr(value)
+
+    elif isinstance(value, dict):
+        return '{%s}' % ','.join(sorted('%s:%s' % (option_fingerprint(key), option_fingerprint(item))
+                                        for key, item in value.iteritems()))
+
+    elif isinstance(value, (set, frozenset)):
+        return '{%s}' % ','.join(sorted(option_fingerprint(item) for item in value))
+
+    elif isinstance(value, (list, tuple)):
+        return '[%s]' % ','.join(option_fingerprint(item) for item in value)
+
+    else:
+        return '<%s.%s>' % (type(value).__module__, type(value).__name__)
+
+
+STAGES = OrderedDict()
+
+
+def register_stage(name, requires=()):
+    """
+    Decorator registering a function as a preprocessing stage. Stage options are the function's arguments
+    following dmrs_xml, untok and tok.
+    :param name: Stage name
+    :param requires: Names of stages that need to run before this stage
+    """
+
+    def decorator(func):
+        STAGES[name] = Stage(name, func, requires=requires)
+        return func
+
+    return decorator
+
+
+def get_stage(name):
+    if name not in STAGES:
+        raise PipelineError('Unknown stage: %s. Available stages: %s' % (name, ', '.join(STAGES)))
+
+    return STAGES[name]
+
+
+class Pipeline(object):
+
+    def __init__(self, stages, binary_output=False, cache=None):
+        """
+        Create a pipeline of stages that are run in order on a single parsed DMRS XML object per sentence.
+        :param stages: List of (stage name, options dictionary) tuples
+        :param binary_output: If True, processed DMRS are returned as BinaryRecord objects instead of XML strings
+        :param cache: ConversionCache object storing the DMRS after every stage. Sentences resume from the longest
+         prefix of stages with the same options found in the cache.
+        """
+
+        self.stages = [(get_stage(name), dict(options)) for name, options in stages]
+
+        # ElementTree returns the unicode labels created by the label stage to the following stages as unicode, while
+        # lxml returns ASCII labels as str. Stages depending on the label type are told whether labels were created.
+        for index, (stage, options) in enumerate(self.stages):
+            if 'unicode_labels' in stage.options:
+                options['unicode_labels'] = 'label' in self.names[:index]
+        self.binary_output = binary_output
+        self.cache = cache
+        self.snapshot_time = 0.0
+        self.warnings = self.validate()
+        self._prefix_keys = None
+
+    def __repr__(self):
+        return "Pipeline(stages=%r)" % [stage.name for stage, _ in self.stages]
+
+    @classmethod
+    def from_names(cls, names, available_options):
+        """
+        Create a pipeline from stage names, picking each stage's options from a shared dictionary of option values.
+        :param names: List of stage names
+        :param available_options: Dictionary of option values
+        :return: Pipeline object
+        """
+
+        stages = []
+        for name in names:
+            stage = get_stage(name)
+            stages.append((name, dict((key, available_options[key]) for key in stage.options
+                                      if key in available_options)))
+
+        return cls(stages)
+
+    @property
+    def names(self):
+        return [stage.name for stage, _ in self.stages]
+
+    def validate(self):
+        """
+        Check that every stage's requirements are satisfied. A required stage placed after the stage requiring it is
+        an error. A required stage missing from the pipeline only produces a warning, since its output may come from
+        an earlier preprocessing pass.
+        :return: List of warning messages
+        """
+
+        warnings = []
+        names = self.names
+
+        for index, (stage, _) in enumerate(self.stages):
+            for required in stage.requires:
+                if required in names[index + 1:] and required not in names[:index]:
+                    raise PipelineError('Stage %s requires %s to run before it.' % (stage.name, required))
+
+                if required not in names:
+                    warnings.append('Warning: Stage %s requires %s, which is not in the pipeline.' %
+                                    (stage.name, required))
+
+        return warnings
+
+    def stage_prefix_keys(self):
+        """
+        :return: List of hashes identifying the stages and options of every prefix of the pipeline
+        """
+
+        prefix_keys = []
+        prefix_key = str(STAGE_CACHE_VERSION)
+
+        for stage, options in self.stages:
+            prefix_key = hashlib.sha1('%s\n%s' % (prefix_key, stage.key(options))).hexdigest()
+            prefix_keys.append(prefix_key)
+
+        return prefix_keys
+
+    @property
+    def prefix_keys(self):
+        """
+        :return: Stage prefix keys, computed on first use since fingerprinting large options such as the word map is
+         only needed with a stage cache
+        """
+
+        if self._prefix_keys is None:
+            self._prefix_keys = self.stage_prefix_keys()
+
+        return self._prefix_keys
+
+    def sentence_cache_keys(self, dmrs, untok, tok):
+        """
+        :return: List of stage cache keys of the sentence, one for every prefix of the pipeline
+        """
+
+        if isinstance(dmrs, BinaryRecord):
+            source = 'b' + dmrs.payload
+        else:
+            source = 't' + dmrs.encode('utf-8')
+
+        if isinstance(tok, list):
+            tok = ' '.join(tok)
+
+        sentence_key = hashlib.sha1('%s\x00%s\x00%s' % (source, untok.encode('utf-8'), tok.encode('utf-8')))
+        sentence_key = sentence_key.hexdigest()
+
+        return [hashlib.sha1(sentence_key + prefix_key).hexdigest() for prefix_key in self.prefix_keys]
+
+    def apply(self, dmrs_xml, untok, tok):
+        for stage, options in self.stages:
+            dmrs_xml = stage(dmrs_xml, untok, tok, **options)
+
+        return dmrs_xml
+
+    @staticmethod
+    def parse(dmrs):
+        if isinstance(dmrs, BinaryRecord):
+            dmrs_xml = dmrs.to_xml()
+
+            # Sentences read from XML files are stripped, so they never have a tail
+            dmrs_xml.tail = None
+            return dmrs_xml
+
+        try:
+            return xml.fromstring(dmrs.encode('utf-8'))
+
+        except xml.ParseError:
+            sys.stderr.write(dmrs + "\n")
+            raise
+
+    def run(self, dmrs, untok, tok):
+        """
+        Parse DMRS string, run all stages on it and serialize the result.
+        :param dmrs: DMRS XML string or BinaryRecord object
+        :param untok: Untokenized sentence string
+        :param tok: List of tokens
+        :return: Processed DMRS XML string, or BinaryRecord object if the pipeline has binary output. Empty DMRS are
+         returned unchanged.
+        """
+
+        if self.cache is not None:
+            return self.run_recorded(dmrs, untok, tok)[0]
+
+        dmrs_xml = self.parse(dmrs)
+
+        if empty(dmrs_xml):
+            return dmrs
+
+        dmrs_xml = self.apply(dmrs_xml, untok, tok)
+
+        return self.serialize(dmrs_xml)
+
+    def run_recorded(self, dmrs, untok, tok, profile=False, cycle_stats=False):
+        """
+        Same as run, but also return how the sentence was processed. With a stage cache, the sentence resumes from the
+        DMRS after the longest prefix of stages found in the cache and the DMRS is stored after the stages that are
+        run. It is stored after the last stage, and after earlier stages once the stages run since the DMRS was last
+        stored took longer than storing it, so that caching cheap stages never costs more than running them again.
+        Stages restored from the cache are neither timed nor have their cycles recorded.
+        :param dmrs: DMRS XML string or BinaryRecord object
+        :param untok: Untokenized sentence string
+        :param tok: List of tokens
+        :param profile: Measure wall time of parsing, every stage that is run, serialization and stage cache access
+        :param cycle_stats: Record the cycles broken by stages with a cycle_stats option
+        :return: Tuple of (processed DMRS, number of stages restored from cache, list of (step name, seconds) tuples,
+         node count, edge count, list of (pattern name, seconds) tuples). The number of stages is None for empty DMRS.
+         Times are None unless profiling, and time spent on the stage cache is listed as a step named cache. Node and
+         edge counts are those of the input DMRS and None if it was not parsed because the sentence was resumed from
+         the cache. Cycles are None unless recording cycles, for empty DMRS and when the cycle recording stages were
+         restored from the cache.
+        """
+
+        stage_times = [] if profile else None
+        cycles = [] if cycle_stats else None
+        nodes, edges = None, None
+        cache_time = 0.0
+
+        keys = self.sentence_cache_keys(dmrs, untok, tok) if self.cache is not None else []
+        resumed = 0
+        dmrs_xml = None
+
+        start = time.time()
+
+        for index in xrange(len(keys) - 1, -1, -1):
+            cached = self.cache.lookup(keys[index])
+
+            if cached is not None:
+                self.cache.record(keys[index], True)
+                resumed = index + 1
+
+                # Serialized output of the last stage is the processed DMRS
+                if resumed == len(keys) and not self.binary_output:
+                    if profile:
+                        stage_times.append(('cache', time.time() - start))
+
+                    return cached, resumed, stage_times, nodes, edges, None if self.records_cycles else cycles
+
+                dmrs_xml = load_snapshot(cached)
+                break
+
+        cache_time += time.time() - start
+
+        if dmrs_xml is None:
+            start = time.time()
+            dmrs_xml = self.parse(dmrs)
+
+            if profile:
+                stage_times.append(('parse', time.time() - start))
+
+            if empty(dmrs_xml):
+                return dmrs, None, stage_times, 0, 0, None
+
+            if keys:
+                self.cache.record(keys[-1], False)
+
+            if profile:
+                nodes = len(dmrs_xml.findall('node'))
+                edges = len(dmrs_xml.findall('link'))
+
+        if cycle_stats and any('cycle_stats' in stage.options for stage, _ in self.stages[:resumed]):
+            cycles = None
+
+        unsaved_time = 0.0
+
+        for index in xrange(resumed, len(self.stages)):
+            stage, options = self.stages[index]
+
+            if cycles is not None and 'cycle_stats' in stage.options:
+                options = dict(options, cycle_stats=cycles)
+
+            start = time.time()
+            dmrs_xml = stage(dmrs_xml, untok, tok, **options)
+            elapsed = time.time() - start
+            unsaved_time += elapsed
+
+            if profile:
+                stage_times.append((stage.name, elapsed))
+
+            if self.cache is not None and index < len(self.stages) - 1 and unsaved_time > self.snapshot_time:
+                start = time.time()
+                self.cache.put(keys[index], xml.tostring(dmrs_xml, encoding='utf-8'))
+                elapsed = time.time() - start
+
+                # Running average of the time to store the DMRS
+                self.snapshot_time = 0.9 * self.snapshot_time + 0.1 * elapsed
+                cache_time += elapsed
+                unsaved_time = 0.0
+
+        start = time.time()
+        dmrs_processed = self.serialize(dmrs_xml)
+
+        if profile:
+            stage_times.append(('serialize', time.time() - start))
+
+        if resumed < len(keys):
+            start = time.time()
+
+            if self.binary_output:
+                self.cache.put(keys[-1], xml.tostring(dmrs_xml, encoding='utf-8'))
+            else:
+                self.cache.put(keys[-1], dmrs_processed)
+
+            cache_time += time.time() - start
+
+        if profile and self.cache is not None:
+            stage_times.append(('cache', cache_time))
+
+        return dmrs_processed, resumed, stage_times, nodes, edges, cycles
+
+    def serialize(self, dmrs_xml):
+        if self.binary_output:
+            return BinaryRecord.from_xml(dmrs_xml)
+
+        return xml.tostring(dmrs_xml, encoding='utf-8')
+
+    @property
+    def records_cycles(self):
+        """
+        :return: True if a stage of the pipeline records cycle statistics, otherwise False
+        """
+        return any('cycle_stats' in stage.options for stage, _ in self.stages)
+
+    @property
+    def order_dependent(self):
+        """
+        :return: True if the output of a sentence depends on the sentences processed before it in the same process,
+         since the strip_source stage shuffles with the module RNG, otherwise False
+        """
+        return 'strip_source' in self.names
+
+
+@register_stage('transfer_mt_prep')
+def transfer_mt_prep_stage(dmrs_xml, untok, tok):
+    return jaen_transfer_mt_prep.preprocess(dmrs_xml)
+
+
+@register_stage('handle_ltop')
+def handle_ltop_stage(dmrs_xml, untok, tok):
+    return handle_ltop.handle_ltop_links(dmrs_xml)
+
+
+@register_stage('filter_gpred')
+def filter_gpred_stage(dmrs_xml, untok, tok, gpred_filter, handle_ltop=True):
+    return filter_gpred.filter_gpred(dmrs_xml, gpred_filter, handle_ltop=handle_ltop)
+
+
+@register_stage('token_align')
+def token_align_stage(dmrs_xml, untok, tok):
+    return token_align.align(dmrs_xml, untok, tok)
+
+
+@register_stage('unaligned_tokens_align', requires=['token_align'])
+def unaligned_tokens_align_stage(dmrs_xml, untok, tok):
+    return unaligned_tokens_align.align(dmrs_xml, tok)
+
+
+@register_stage('gpred_curb', requires=['token_align'])
+def gpred_curb_stage(dmrs_xml, untok, tok):
+    return filter_gpred.curb_gpred_spans(dmrs_xml)
+
+
+@register_stage('handle_unknown')
+def handle_unknown_stage(dmrs_xml, untok, tok, lemmatizer):
+    return handle_unknown.handle_unknown_nodes(dmrs_xml, lemmatizer)
+
+
+@register_stage('label')
+def label_stage(dmrs_xml, untok, tok):
+    return label.create_label(dmrs_xml, carg_clean=True)
+
+
+@register_stage('cycle_remove')
+def cycle_remove_stage(dmrs_xml, untok, tok, realization=False, cycle_stats=None, unicode_labels=False):
+    return cycle_remove.cycle_remove(dmrs_xml, realization=realization, stats=cycle_stats,
+                                     unicode_labels=unicode_labels)
+
+
+@register_stage('map_tokens', requires=['token_align'])
+def map_tokens_stage(dmrs_xml, untok, tok, wmap):
+    return map_tokens.map_tokens(dmrs_xml, tok, wmap)
+
+
+@register_stage('attach_untok')
+def attach_untok_stage(dmrs_xml, untok, tok):
+    dmrs_xml.attrib['untok'] = untok
+    return dmrs_xml
+
+
+@register_stage('attach_tok')
+def attach_tok_stage(dmrs_xml, untok, tok):
+    dmrs_xml.attrib['tok'] = ' '.join(tok)
+    return dmrs_xml
+
+
+@register_stage('strip_source')
+def strip_source_stage(dmrs_xml, untok, tok):
+    return strip_source_information(dmrs_xml)
+
+
+def preset_pipeline(token_align_opt=False,
+                    unaligned_align_opt=False,
+                    label_opt=False,
+                    handle_ltop_opt=False,
+                    gpred_filter=None,
+                    gpred_curb_opt=None,
+                    cycle_remove_opt=False,
+                    map_node_tokens=None,
+                    attach_untok=False,
+                    attach_tok=False,
+                    unknown_handle_lemmatizer=None,
+                    realization=False,
+                    realization_sanity_check=False,
+                    transfer_mt_prep=False):
+    """
+    Create the pipeline corresponding to the dmrs_preprocess command line flags.
+    :return: Pipeline object
+    """
+
+    # Stages that use source sentence information are disabled in realization sanity check and transfer MT modes
+    source_opt = not realization_sanity_check and not transfer_mt_prep
+
+    stages = []
+
+    if transfer_mt_prep:
+        stages.append(('transfer_mt_prep', {}))
+
+    if handle_ltop_opt:
+        stages.append(('handle_ltop', {}))
+
+    if gpred_filter is not None:
+        stages.append(('filter_gpred', {'gpred_filter': gpred_filter, 'handle_ltop': handle_ltop_opt}))
+
+    if token_align_opt and source_opt:
+        stages.append(('token_align', {}))
+
+    if unaligned_align_opt and source_opt:
+        stages.append(('unaligned_tokens_align', {}))
+
+    if gpred_curb_opt and source_opt:
+        stages.append(('gpred_curb', {}))
+
+    if unknown_handle_lemmatizer is not None:
+        stages.append(('handle_unknown', {'lemmatizer': unknown_handle_lemmatizer}))
+
+    if label_opt:
+        stages.append(('label', {}))
+
+    if cycle_remove_opt:
+        stages.append(('cycle_remove', {'realization': realization}))
+
+    if map_node_tokens is not None and source_opt:
+        stages.append(('map_tokens', {'wmap': map_node_tokens}))
+
+    if attach_untok and source_opt:
+        stages.append(('attach_untok', {}))
+
+    if attach_tok and source_opt:
+        stages.append(('attach_tok', {}))
+
+    if realization_sanity_check:
+        stages.append(('strip_source', {}))
+
+    return Pipeline(stages)
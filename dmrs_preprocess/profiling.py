@@ -0,0 +1,195 @@
+import json
+import math
+import heapq
+from array import array
+from collections import Counter, OrderedDict
+
+
+class PipelineProfiler(object):
+    """
+    Collect wall time and call counts per stage, the per sentence cost distribution and the slowest sentences of
+    a preprocessing run.
+    """
+
+    def __init__(self, slowest=10):
+        self.slowest_num = slowest
+
+        self.stage_time = OrderedDict()
+        self.stage_calls = Counter()
+        self.sentence_times = array('d')
+        self.slowest = []
+
+    def record(self, index, stage_times, nodes, edges):
+        """
+        Record the cost of a single sentence.
+        :param index: Sentence index in the input
+        :param stage_times: List of (stage name, seconds) tuples. Stage cache access is recorded as a stage named cache.
+        :param nodes: Number of nodes in the input DMRS, None if it was resumed from the stage cache without parsing
+        :param edges: Number of edges in the input DMRS, None if it was resumed from the stage cache without parsing
+        """
+
+        total = 0.0
+        for name, elapsed in stage_times:
+            self.stage_time[name] = self.stage_time.get(name, 0.0) + elapsed
+            self.stage_calls[name] += 1
+            total += elapsed
+
+        self.sentence_times.append(total)
+
+        # Keep the slowest sentences in a min-heap of fixed size
+        item = (total, index, nodes, edges)
+
+        if len(self.slowest) < self.slowest_num:
+            heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def report(self):
+        times = sorted(self.sentence_times)
+        total = sum(times)
+
+        stages = OrderedDict()
+        for name, stage_time in self.stage_time.items():
+            calls = self.stage_calls[name]
+            stages[name] = OrderedDict([('time', stage_time),
+                                        ('calls', calls),
+                                        ('mean', stage_time / calls),
+                                        ('share', stage_time / total if total > 0 else 0.0)])
+
+        sentence_time = OrderedDict([('mean', total / len(times) if times else 0.0),
+                                     ('p50', percentile(times, 50)),
+                                     ('p95', percentile(times, 95)),
+                                     ('p99', percentile(times, 99)),
+                                     ('max', times[-1] if times else 0.0)])
+
+        slowest = [OrderedDict([('index', index), ('time', elapsed), ('nodes', nodes), ('edges', edges)])
+                   for elapsed, index, nodes, edges in sorted(self.slowest, reverse=True)]
+
+        return OrderedDict([('sentences', len(times)),
+                            ('time', total),
+                            ('stages', stages),
+                            ('sentence_time', sentence_time),
+                            ('slowest', slowest)])
+
+    def write(self, filename):
+        with open(filename, 'wb') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+
+class CycleStatistics(object):
+    """
+    Collect the cycles broken by cycle removal: number and time of cycles per pattern, iterations per sentence, the
+    sentences with the most iterations and the sentences with cycles that could not be broken. Sentences whose cycle
+    removal was restored from the stage cache are only counted.
+    """
+
+    def __init__(self, top=10):
+        self.top_num = top
+
+        self.pattern_counts = Counter()
+        self.pattern_sentences = Counter()
+        self.pattern_time = Counter()
+        self.iterations = array('l')
+        self.empty = 0
+        self.cached = 0
+        self.top = []
+        self.unbroken = []
+
+    def record(self, index, cycles, cached=False):
+        """
+        Record the cycles of a single sentence.
+        :param index: Sentence index in the input
+        :param cycles: List of (pattern name, seconds) tuples, one for every cycle in the order they were processed.
+         None for empty DMRS.
+        :param cached: True if cycle removal was restored from the stage cache, so its cycles are unknown
+        """
+
+        if cached:
+            self.cached += 1
+            return
+
+        if cycles is None:
+            self.empty += 1
+            return
+
+        total = 0.0
+        for pattern, elapsed in cycles:
+            self.pattern_counts[pattern] += 1
+            self.pattern_time[pattern] += elapsed
+            total += elapsed
+
+        patterns = set(pattern for pattern, _ in cycles)
+
+        for pattern in patterns:
+            self.pattern_sentences[pattern] += 1
+
+        if 'none_detected' in patterns:
+            self.unbroken.append(index)
+
+        self.iterations.append(len(cycles))
+
+        if not cycles:
+            return
+
+        # Keep the sentences with the most iterations in a min-heap of fixed size
+        item = (len(cycles), total, index)
+
+        if len(self.top) < self.top_num:
+            heapq.heappush(self.top, item)
+        elif item > self.top[0]:
+            heapq.heapreplace(self.top, item)
+
+    def report(self):
+        iterations = sorted(self.iterations)
+        total = sum(iterations)
+
+        patterns = OrderedDict()
+        for pattern, count in self.pattern_counts.most_common():
+            pattern_time = self.pattern_time[pattern]
+            patterns[pattern] = OrderedDict([('cycles', count),
+                                             ('sentences', self.pattern_sentences[pattern]),
+                                             ('time', pattern_time),
+                                             ('mean', pattern_time / count)])
+
+        distribution = OrderedDict((str(count), sentences) for count, sentences in sorted(Counter(iterations).items()))
+
+        sentence_iterations = OrderedDict([('mean', float(total) / len(iterations) if iterations else 0.0),
+                                           ('p50', percentile(iterations, 50)),
+                                           ('p95', percentile(iterations, 95)),
+                                           ('p99', percentile(iterations, 99)),
+                                           ('max', iterations[-1] if iterations else 0),
+                                           ('distribution', distribution)])
+
+        most_iterations = [OrderedDict([('index', index), ('iterations', count), ('time', elapsed)])
+                           for count, elapsed, index in sorted(self.top, reverse=True)]
+
+        return OrderedDict([('sentences', len(iterations)),
+                            ('empty', self.empty),
+                            ('cached', self.cached),
+                            ('sentences_with_cycles', len(iterations) - iterations.count(0)),
+                            ('cycles', total),
+                            ('time', sum(self.pattern_time.values())),
+                            ('patterns', patterns),
+                            ('iterations', sentence_iterations),
+                            ('most_iterations', most_iterations),
+                            ('unbroken', sorted(self.unbroken))])
+
+    def write(self, filename):
+        with open(filename, 'wb') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest rank percentile of a sorted list, i.e. the smallest value that is greater than or equal to the given
+    percentage of the values.
+    """
+
+    if not sorted_values:
+        return 0.0
+
+    # Multiplying first keeps the rank exact when percent * len(sorted_values) is a multiple of 100
+    rank = int(math.ceil(percent * len(sorted_values) / 100.0)) - 1
+    return sorted_values[max(0, rank)]
@@ -1,4 +1,4 @@
-import xml.etree.ElementTree as xml
+import xml_backend as xml
 
 from unaligned_tokens_align import get_unaligned_tokens
 
@@ -0,0 +1,83 @@
+import os
+import json
+import argparse
+from itertools import islice
+
+
+class ShardError(Exception):
+    pass
+
+
+def parse_shard(spec):
+    """
+    Parse a shard specification i/N, where shards are numbered from 0 to N - 1.
+    :param spec: Shard specification string
+    :return: Tuple of (shard index, number of shards)
+    """
+
+    try:
+        index, count = [int(x) for x in spec.split('/')]
+
+    except ValueError:
+        raise argparse.ArgumentTypeError('Shard must be specified as i/N, got %s.' % spec)
+
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError('Shard index must be between 0 and N - 1, got %s.' % spec)
+
+    return index, count
+
+
+def select_shard(iterable, shard):
+    """
+    Select the items of a shard. Shard i/N holds items i, i + N, i + 2N, ... of the input.
+    :param iterable: Input items
+    :param shard: Tuple of (shard index, number of shards) or None for all items
+    :return: Iterator of selected items
+    """
+
+    if shard is None:
+        return iter(iterable)
+
+    index, count = shard
+    return islice(iterable, index, None, count)
+
+
+def sentence_index(shard_position, shard):
+    """
+    Map a position within shard output to the sentence index in the full input.
+    """
+
+    if shard is None:
+        return shard_position
+
+    index, count = shard
+    return index + shard_position * count
+
+
+def manifest_filename(output_filename):
+    return output_filename + '.shard'
+
+
+def write_manifest(output_filename, shard, sentences):
+    """
+    Record which shard an output file holds and how many sentences were written to it. The manifest is written once
+    the shard is complete, so merging refuses shards of interrupted runs.
+    """
+
+    index, count = shard
+
+    with open(manifest_filename(output_filename), 'wb') as f:
+        json.dump({'shard': index, 'shards': count, 'sentences': sentences}, f)
+
+
+def read_manifest(output_filename):
+    filename = manifest_filename(output_filename)
+
+    if not os.path.exists(filename):
+        raise ShardError('Shard manifest %s does not exist. The shard is incomplete or was not created with --shard.' %
+                         filename)
+
+    with open(filename, 'rb') as f:
+        manifest = json.load(f)
+
+    return manifest['shard'], manifest['shards'], manifest['sentences']
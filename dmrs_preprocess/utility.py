@@ -1,6 +1,16 @@
+import bz2
+import gzip
 import random
 from itertools import tee, izip
 
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
 random.seed(0)
 
 
@@ -21,6 +31,73 @@ def triple(iterable):
     return izip(a, b, c)
 
 
+def iter_split(stream, separator):
+    """
+    Lazily split a stream of text pieces on separator, without ever holding more than the current chunk in memory.
+    Yields the same chunks as content.strip().split(separator) would for the concatenated content, except that chunks
+    followed only by whitespace chunks keep their trailing whitespace.
+    :param stream: Iterable of unicode strings (e.g. decoded file lines)
+    :param separator: Chunk separator
+    :return: Generator of chunks
+    """
+
+    # Pieces of the current chunk are joined only once it is complete, since appending to a unicode string copies it
+    pieces = []
+    overlap = len(separator) - 1
+    tail = ''
+    started = False
+    separated = False
+    pending = []
+
+    for piece in stream:
+        if not started:
+            piece = piece.lstrip()
+
+            if not piece:
+                continue
+
+            started = True
+
+        pieces.append(piece)
+
+        # Only the new piece and the end of the pieces preceding it can contain a new separator
+        window = tail + piece
+
+        if window.find(separator) == -1:
+            tail = window[max(0, len(window) - overlap):]
+            continue
+
+        chunks = ''.join(pieces).split(separator)
+        buf = chunks.pop()
+        pieces = [buf]
+        tail = buf[max(0, len(buf) - overlap):]
+        separated = True
+
+        for chunk in chunks:
+            # Whitespace-only chunks are held back because they disappear if they turn out to be trailing
+            if not chunk.strip():
+                pending.append(chunk)
+                continue
+
+            for pending_chunk in pending:
+                yield pending_chunk
+
+            pending = []
+            yield chunk
+
+    buf = ''.join(pieces).rstrip()
+
+    # Content ending with a separator that survives stripping has a trailing empty chunk
+    if buf or (separated and separator.strip()):
+        for pending_chunk in pending:
+            yield pending_chunk
+
+        yield buf
+
+    elif not started:
+        yield ''
+
+
 def contains_sublist(lst, sublst):
     n = len(sublst)
     return any((sublst == lst[i:i+n]) for i in xrange(len(lst)-n+1))
@@ -47,7 +124,43 @@ def load_wmap(filename):
     return wmap
 
 
-def strip_source_information(dmrs_xml):
+def open_file(filename, mode='rb'):
+    """
+    Open a file, transparently compressing or decompressing it if its extension is .gz, .bz2 or .xz.
+    Compressed files are read and written incrementally, the same way as plain files.
+    :param filename: File name
+    :param mode: File mode
+    :return: File object
+    """
+
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode, compresslevel=6)
+
+    elif filename.endswith('.bz2'):
+        return bz2.BZ2File(filename, mode)
+
+    elif filename.endswith('.xz'):
+        if lzma is None:
+            raise ImportError('Reading and writing .xz files requires the backports.lzma package.')
+
+        return lzma.open(filename, mode)
+
+    else:
+        return open(filename, mode)
+
+
+def strip_source_information(dmrs_xml, rng=None):
+    """
+    Remove character spans from nodes and shuffle nodes and edges, renumbering nodes in the shuffled order.
+    :param dmrs_xml: DMRS XML object
+    :param rng: random.Random object used for shuffling. By default, the module RNG seeded on import is used, so the
+     shuffle of a sentence depends on the sentences shuffled before it in the same process.
+    :return: Modified DMRS XML object
+    """
+
+    if rng is None:
+        rng = random
+
     nodes = []
     edges = []
 
@@ -67,8 +180,8 @@ def strip_source_information(dmrs_xml):
         dmrs_xml.remove(entity)
 
     # Shuffle
-    random.shuffle(nodes)
-    random.shuffle(edges)
+    rng.shuffle(nodes)
+    rng.shuffle(edges)
 
     # Remap nodeids according to the shuffled order and readd them to DMRS XML
     nodeid_map = {}
@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import socket
+
+from binary_format import BinaryRecord, BinaryWriter, is_binary_filename
+from merge_shards import iter_records, copy_record
+from parallel import chunked
+from utility import open_file
+
+
+class QueueError(Exception):
+    pass
+
+
+class WorkQueue(object):
+    """
+    Coordinator-free work queue on a shared directory. Sentences are split into fixed-size chunks by index and workers
+    claim chunks by creating lease files. A lease that has not been renewed within lease_timeout seconds is considered
+    abandoned and can be claimed by another worker. Chunk output is deterministic and written atomically, so a chunk
+    processed twice after a lease race produces the same file.
+    """
+
+    def __init__(self, dirname, inputs, chunk_size=1000, lease_timeout=600):
+        """
+        :param dirname: Shared queue directory
+        :param inputs: List of input filenames. Workers of the same queue must use the same inputs.
+        :param chunk_size: Number of sentences per chunk. The queue keeps the chunk size of the worker that created it.
+        :param lease_timeout: Number of seconds after which an unrenewed lease expires
+        """
+
+        self.dirname = dirname
+        self.lease_timeout = lease_timeout
+        self.worker_id = '%s.%d' % (socket.gethostname(), os.getpid())
+
+        try:
+            os.makedirs(dirname)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+
+        config = self._create_config({'chunk_size': chunk_size, 'inputs': inputs})
+
+        if config['inputs'] != inputs:
+            raise QueueError('Queue %s was created for files %s, not %s.' %
+                             (dirname, ', '.join(config['inputs']), ', '.join(inputs)))
+
+        self.chunk_size = config['chunk_size']
+
+    def _path(self, name):
+        return os.path.join(self.dirname, name)
+
+    def _write_atomic(self, name, content):
+        tmp_filename = self._path('%s.tmp.%s' % (name, self.worker_id))
+
+        with open(tmp_filename, 'wb') as f:
+            f.write(content)
+
+        os.rename(tmp_filename, self._path(name))
+
+    def _create_config(self, config):
+        """
+        Write queue configuration unless another worker already did and return the configuration in effect.
+        """
+
+        tmp_filename = self._path('queue.json.tmp.%s' % self.worker_id)
+
+        with open(tmp_filename, 'wb') as f:
+            json.dump(config, f)
+
+        # Unlike rename, link fails if the configuration already exists
+        try:
+            os.link(tmp_filename, self._path('queue.json'))
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+        finally:
+            os.remove(tmp_filename)
+
+        with open(self._path('queue.json'), 'rb') as f:
+            return json.load(f)
+
+    @staticmethod
+    def chunk_name(chunk_index):
+        return 'chunk-%08d' % chunk_index
+
+    def claim(self, name):
+        """
+        Try to acquire the lease on name, taking over an expired lease.
+        :param name: Lease name
+        :return: True if the lease was acquired
+        """
+
+        filename = self._path(name + '.lease')
+
+        try:
+            fd = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+
+            try:
+                age = time.time() - os.path.getmtime(filename)
+            except OSError:
+                return False
+
+            if age < self.lease_timeout:
+                return False
+
+            # Only one worker can move the expired lease aside
+            stale_filename = '%s.stale.%s' % (filename, self.worker_id)
+
+            try:
+                os.rename(filename, stale_filename)
+            except OSError:
+                return False
+
+            os.remove(stale_filename)
+            return self.claim(name)
+
+        os.write(fd, self.worker_id)
+        os.close(fd)
+        return True
+
+    def owns(self, name):
+        try:
+            with open(self._path(name + '.lease'), 'rb') as f:
+                return f.read() == self.worker_id
+
+        except IOError:
+            return False
+
+    def renew(self, name):
+        """
+        Renew a lease held by this worker. A lease that expired and was taken over by another worker is left alone.
+        :param name: Lease name
+        :return: True if the lease is still held by this worker
+        """
+
+        if not self.owns(name):
+            return False
+
+        try:
+            os.utime(self._path(name + '.lease'), None)
+        except OSError:
+            return False
+
+        return True
+
+    def release(self, name):
+        if not self.owns(name):
+            return
+
+        try:
+            os.remove(self._path(name + '.lease'))
+        except OSError:
+            pass
+
+    def is_done(self, chunk_index):
+        return os.path.exists(self._path(self.chunk_name(chunk_index) + '.dmrs'))
+
+    def complete(self, chunk_index, records):
+        """
+        Atomically write the output of a chunk and release its lease.
+        :param chunk_index: Chunk index
+        :param records: List of output record strings
+        """
+
+        name = self.chunk_name(chunk_index)
+        self._write_atomic(name + '.dmrs', ''.join(records))
+        self.release(name)
+
+    def set_total(self, sentences):
+        self._write_atomic('total', str(sentences))
+
+    def chunk_count(self):
+        """
+        :return: Number of chunks, or None if no worker has read the whole input yet
+        """
+
+        try:
+            with open(self._path('total'), 'rb') as f:
+                sentences = int(f.read())
+        except IOError:
+            return None
+
+        return (sentences + self.chunk_size - 1) // self.chunk_size
+
+    def finished(self):
+        chunk_count = self.chunk_count()
+        return chunk_count is not None and all(self.is_done(index) for index in xrange(chunk_count))
+
+    def merged(self):
+        return os.path.exists(self._path('merged'))
+
+    def merge(self, output_filename):
+        """
+        Concatenate chunk outputs in order into the output file.
+        :param output_filename: Output file. Set "-" to output to standard output. Chunk outputs are converted if the
+         output file has the binary DMRS extension.
+        """
+
+        binary_output = output_filename != '-' and is_binary_filename(output_filename)
+
+        if output_filename == '-':
+            out = sys.stdout
+            tmp_filename = None
+        else:
+            # Keep the file extension so that compressed output is compressed while it is written
+            dirname, basename = os.path.split(output_filename)
+            tmp_filename = os.path.join(dirname, '.%s.%s' % (self.worker_id, basename))
+            out = open_file(tmp_filename, 'wb')
+
+            if binary_output:
+                out = BinaryWriter(out)
+
+        for chunk_index in xrange(self.chunk_count()):
+            with open(self._path(self.chunk_name(chunk_index) + '.dmrs'), 'rb') as f:
+                if binary_output:
+                    for record in iter_records(f):
+                        copy_record(out, record)
+                else:
+                    shutil.copyfileobj(f, out)
+
+        if tmp_filename is not None:
+            out.close()
+            os.rename(tmp_filename, output_filename)
+
+        self._write_atomic('merged', '')
+
+
+def run_worker(queue, open_sentences, process_chunk, output_filename, poll_interval=10):
+    """
+    Process chunks of a work queue until every chunk is done, then merge the output unless another worker does.
+    Each pass reads the input from the start, processing unclaimed chunks and skipping the rest. Passes are repeated
+    while chunks leased by other workers are unfinished, so that chunks of crashed workers are taken over once their
+    leases expire.
+    :param queue: WorkQueue object
+    :param open_sentences: Function returning a new iterator of (dmrs, untok, tok) tuples over the whole input
+    :param process_chunk: Function taking the input index of the first sentence of a chunk and the list of its
+     (dmrs, untok, tok) sentences, and returning a generator of the processed DMRS in order. The generator is
+     closed before the end if the lease on the chunk is lost.
+    :param output_filename: Merged output file
+    :param poll_interval: Number of seconds to wait between passes
+    :return: Number of chunks processed by this worker
+    """
+
+    processed = 0
+    renew_interval = queue.lease_timeout / 4.0
+
+    while not queue.merged():
+        waiting = False
+        sentences = 0
+
+        for chunk_index, chunk in enumerate(chunked(open_sentences(), queue.chunk_size)):
+            sentences += len(chunk)
+            name = queue.chunk_name(chunk_index)
+
+            if queue.is_done(chunk_index):
+                continue
+
+            if not queue.claim(name):
+                waiting = True
+                continue
+
+            # Another worker may have completed the chunk and released its lease since is_done was checked
+            if queue.is_done(chunk_index):
+                queue.release(name)
+                continue
+
+            processed_iter = process_chunk(chunk_index * queue.chunk_size, chunk)
+            records = []
+            renewed = time.time()
+            lost = False
+
+            for dmrs_processed in processed_iter:
+                # Chunk outputs are XML, also for binary input, whose empty DMRS are passed through as records
+                if isinstance(dmrs_processed, BinaryRecord):
+                    dmrs_processed = dmrs_processed.to_string()
+
+                elif isinstance(dmrs_processed, unicode):
+                    dmrs_processed = dmrs_processed.encode('utf-8')
+
+                records.append('%s\n\n' % dmrs_processed)
+
+                if time.time() - renewed > renew_interval:
+                    if not queue.renew(name):
+                        processed_iter.close()
+                        lost = True
+                        break
+
+                    renewed = time.time()
+
+            # The lease expired and was taken over, so the chunk is left to the other worker
+            if lost:
+                waiting = True
+                continue
+
+            queue.complete(chunk_index, records)
+            processed += 1
+
+        queue.set_total(sentences)
+
+        if not waiting:
+            break
+
+        time.sleep(poll_interval)
+
+    if not queue.merged() and queue.finished() and queue.claim('merge'):
+        # Another worker may have merged and released the lease since merged was checked
+        if not queue.merged():
+            queue.merge(output_filename)
+
+        queue.release('merge')
+
+    return processed
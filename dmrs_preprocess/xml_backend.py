@@ -0,0 +1,114 @@
+"""
+XML backend for parsing and serializing DMRS. lxml's C parser and serializer are used when lxml is installed, and
+ElementTree otherwise. Serialization reproduces ElementTree output byte for byte on both backends, so the choice of
+backend never changes the output.
+
+Modules import this module in place of ElementTree (import xml_backend as xml) and create elements through it, so that
+all elements of a tree come from the same backend.
+"""
+
+import xml.etree.ElementTree as etree
+
+try:
+    import lxml.etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+BACKENDS = ['auto', 'lxml', 'etree']
+
+if lxml_etree is not None:
+    ParseError = (etree.ParseError, lxml_etree.XMLSyntaxError)
+else:
+    ParseError = etree.ParseError
+
+_etree = lxml_etree if lxml_etree is not None else etree
+
+
+def use_backend(name):
+    """
+    Select the XML backend. Worker processes inherit the backend selected before they are started.
+    :param name: auto (lxml if installed, ElementTree otherwise), lxml or etree
+    """
+
+    global _etree
+
+    if name == 'auto':
+        _etree = lxml_etree if lxml_etree is not None else etree
+
+    elif name == 'lxml':
+        if lxml_etree is None:
+            raise ImportError('XML backend lxml requested, but lxml is not installed.')
+
+        _etree = lxml_etree
+
+    elif name == 'etree':
+        _etree = etree
+
+    else:
+        raise ValueError('Unknown XML backend %s. Available backends: %s.' % (name, ', '.join(BACKENDS)))
+
+
+def backend_name():
+    return 'lxml' if _etree is lxml_etree else 'etree'
+
+
+def Element(tag, attrib={}, **extra):
+    return _etree.Element(tag, attrib, **extra)
+
+
+def SubElement(parent, tag, attrib={}, **extra):
+    return _etree.SubElement(parent, tag, attrib, **extra)
+
+
+def fromstring(string):
+    """
+    Parse an XML string.
+    :param string: UTF-8 encoded XML byte string
+    :return: Root XML element
+    """
+
+    if _etree is lxml_etree:
+        return lxml_etree.fromstring(string, parser=lxml_etree.XMLParser(encoding='utf-8', huge_tree=True))
+
+    return etree.fromstring(string, parser=etree.XMLParser(encoding='utf-8'))
+
+
+def tostring(element, encoding='us-ascii'):
+    """
+    Serialize an XML element with its tail the way ElementTree does.
+    :param element: XML element of either backend
+    :param encoding: Output encoding
+    :return: Encoded XML byte string
+    """
+
+    if lxml_etree is None or not isinstance(element, lxml_etree._Element):
+        return etree.tostring(element, encoding=encoding)
+
+    for entity in element.iter(lxml_etree.Element):
+        # ElementTree writes attributes sorted by name and elements with empty text as empty elements
+        attrib = entity.attrib
+
+        if len(attrib) > 1:
+            keys = attrib.keys()
+
+            if keys != sorted(keys):
+                items = sorted(attrib.items())
+                attrib.clear()
+
+                for key, value in items:
+                    attrib[key] = value
+
+        if entity.text == '':
+            entity.text = None
+
+    string = lxml_etree.tostring(element, encoding=encoding)
+
+    # ElementTree writes empty elements as <tag /> and escapes neither tabs nor carriage returns. Markup characters in
+    # text and attribute values are escaped, so these sequences can only come from the serializer itself.
+    string = string.replace('/>', ' />')
+
+    if '&#' in string:
+        string = string.replace('&#9;', '\t').replace('&#13;', '\r')
+
+    return string
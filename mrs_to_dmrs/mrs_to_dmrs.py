@@ -2,16 +2,36 @@
 
 import os
 import sys
+import time
+import shlex
 import errno
+import shutil
 import logging
+import threading
+import subprocess
 import argparse
+from functools import partial
+from operator import itemgetter
+from itertools import chain, groupby, izip, tee
 from collections import OrderedDict
-import xml.etree.ElementTree as xml
+import xml.etree.ElementTree as etree
+from xml.etree.ElementTree import ParseError
 
 from delphin.mrs import simplemrs, dmrx
 from delphin.mrs.components import (nodes, links)
 from delphin.exceptions import XmrsDeserializationError as XDE
 
+# Modules shared by the tools are kept in dmrs_preprocess
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+from parallel import imap_ordered
+from cache import ConversionCache
+from utility import open_file, iter_split
+from shard import parse_shard, select_shard, write_manifest
+from binary_format import BinaryReader, BinaryWriter, is_binary_filename
+import xml_backend as xml
+
 
 def _encode_dmrs(m, strict=False):
     _strict = strict
@@ -32,7 +52,8 @@ def _encode_dmrs(m, strict=False):
         if index_nodeid is not None:
             attributes['index'] = str(index_nodeid)
 
-    e = xml.Element('dmrs', attrib=attributes)
+    # pyDelphin encodes nodes and links as ElementTree elements, so the DMRS element has to be one as well
+    e = etree.Element('dmrs', attrib=attributes)
     for node in nodes(m):
         e.append(dmrx._encode_node(node))
     for link in links(m):
@@ -53,8 +74,108 @@ def extract_mrs_line(file_content):
     return [line if not line.startswith('SKIP:') else None for line in file_content.split('\n')]
 
 
+def iter_ace_mrs(stream):
+    for mrs_chunk in iter_split(stream, '\n\n'):
+        yield '\n'.join(mrs_chunk.strip().split('\n')[1:]) if mrs_chunk.strip().startswith('SENT') else None
+
+
+def iter_mrs_line(stream):
+    for line in iter_split(stream, '\n'):
+        yield line if not line.startswith('SKIP:') else None
+
+
+def iter_file(filename, file_format='ace'):
+    """
+    Read MRS from file one at a time instead of loading the whole file into memory.
+    :param filename: MRS file
+    :param file_format: Format of the MRS file (ace or line)
+    :return: Generator of MRS strings (None for skipped sentences)
+    """
+
+    if file_format == 'ace':
+        extract = iter_ace_mrs
+    elif file_format == 'line':
+        extract = iter_mrs_line
+    else:
+        raise NotImplementedError("File format '%s' not supported" % file_format)
+
+    with open_file(filename, 'rb') as f:
+        for mrs in extract(line.decode('utf-8') for line in f):
+            yield mrs
+
+
+def iter_ace_process(command, input_filename=None):
+    """
+    Run ACE as a subprocess and yield MRS from its output as soon as each SENT/SKIP chunk is complete, so parsing
+    and conversion overlap. Output is only read when the next MRS is requested, so ACE blocks on a full pipe when
+    conversion falls behind instead of output piling up in memory.
+    :param command: ACE command line, e.g. 'ace -g erg.dat -1Tf'
+    :param input_filename: File with sentences to parse, one per line. If None, ACE reads from stdin.
+    :return: Generator of MRS strings (None for skipped sentences)
+    """
+
+    process = subprocess.Popen(shlex.split(command),
+                               stdin=subprocess.PIPE if input_filename is not None else None,
+                               stdout=subprocess.PIPE)
+
+    if input_filename is not None:
+        # Feed ACE from a separate thread to avoid a deadlock between its stdin and stdout pipes
+        def feed():
+            try:
+                with open_file(input_filename, 'rb') as f:
+                    shutil.copyfileobj(f, process.stdin)
+            except IOError:
+                pass
+            finally:
+                process.stdin.close()
+
+        feeder = threading.Thread(target=feed)
+        feeder.daemon = True
+        feeder.start()
+
+    # readline instead of file iteration, which reads ahead in large blocks and would delay complete chunks
+    lines = iter(process.stdout.readline, '')
+    completed = False
+
+    try:
+        for mrs in iter_ace_mrs(line.decode('utf-8') for line in lines):
+            yield mrs
+
+        completed = True
+
+    finally:
+        process.stdout.close()
+
+        # Closed early by the consumer or stopped by an error, so ACE is stopped and that is what gets propagated
+        if not completed:
+            if process.poll() is None:
+                process.terminate()
+
+            process.wait()
+
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def iter_dmrs(stream):
+    for dmrs_chunk in iter_split(stream, '<dmrs'):
+        if dmrs_chunk.strip() != '':
+            yield ('<dmrs' + dmrs_chunk).strip()
+
+
+def iter_dmrs_file(filename):
+    with open_file(filename, 'rb') as f:
+        if is_binary_filename(filename):
+            for record in BinaryReader(f).iter_records():
+                yield record.to_string()
+
+        else:
+            for dmrs in iter_dmrs(line.decode('utf-8') for line in f):
+                yield dmrs
+
+
 def read_file(filename, file_format='ace'):
-    with open(filename, 'rb') as f:
+    with open_file(filename, 'rb') as f:
         content = f.read().decode('utf-8').strip()
 
         if file_format == 'ace':
@@ -65,13 +186,18 @@ def read_file(filename, file_format='ace'):
             raise NotImplementedError("File format '%s' not supported" % file_format)
 
 
+def list_files(dirname):
+    return sorted(os.path.join(dirname, filename) for filename in os.listdir(dirname)
+                  if os.path.isfile(os.path.join(dirname, filename)))
+
+
 def read_dir(dirname, file_format='ace', file_suffix='.dmrs'):
     filenames = [os.path.join(dirname, filename) for filename in os.listdir(dirname)]
     return dict((filename + file_suffix, read_file(filename, file_format)) for filename in filenames)
 
 
 def write_file(filename, dmrs_list):
-    with open(filename, 'wb') as f:
+    with open_file(filename, 'wb') as f:
         f.write('\n\n'.join(dmrs_list))
 
 
@@ -84,39 +210,301 @@ def make_sure_path_exists(path):
             raise
 
 
-def mrs_to_dmrs(mrs, ignore_errors=False):
-    if mrs is None or mrs == '' or mrs.startswith('SKIP'):
+def skipped_mrs(mrs):
+    return mrs is None or mrs == '' or mrs.startswith('SKIP')
+
+
+def mrs_to_dmrs(mrs, ignore_errors=False, cache=None):
+    if skipped_mrs(mrs):
         return '<dmrs></dmrs>'
 
+    if cache is not None:
+        key = cache.key(mrs)
+        dmrs = cache.get(key)
+
+        if dmrs is None:
+            dmrs = mrs_to_dmrs(mrs, ignore_errors=ignore_errors)
+            cache.put(key, dmrs)
+
+        return dmrs
+
     try:
         simplemrs_repr = simplemrs.loads_one(mrs)
-        dmrs_string = dmrx.dumps_one(simplemrs_repr, pretty_print=True)
-
-        parser = xml.XMLParser(encoding='utf-8')
-        dmrs_xml = xml.fromstring(dmrs_string.encode('utf-8'), parser=parser)[0]
+        dmrs_xml = encode_dmrs(simplemrs_repr)
         return xml.tostring(dmrs_xml, encoding='utf-8')
-    
+
     except XDE:
         return '<dmrs></dmrs>'
 
 
-def dmrs_to_mrs(dmrs, ignore_errors=False):
+def encode_dmrs(m):
+    """
+    Build the DMRS XML element directly from a pyDelphin Xmrs object. The result serializes to the same bytes as the
+    <dmrs> element obtained by pretty printing a <dmrs-list> with dmrx.dumps_one and parsing it back, without the
+    extra serialization and parsing passes.
+    :param m: pyDelphin Xmrs object
+    :return: DMRS XML object
+    """
+
+    dmrs_xml = _encode_dmrs(m)
+
+    # Whitespace inserted by dmrx LKB-style pretty printing
+    if len(dmrs_xml) > 0:
+        dmrs_xml.text = '\n'
+
+    for entity in dmrs_xml:
+        entity.tail = '\n'
+
+    dmrs_xml.tail = '\n'
+
+    # Whitespace normalization the XML parser applied to unescaped carriage returns and tabs
+    for entity in dmrs_xml.iter():
+        for key, value in entity.attrib.items():
+            if '\r' in value or '\t' in value:
+                entity.attrib[key] = value.replace('\r', ' ').replace('\t', ' ')
+
+        if entity.text is not None and '\r' in entity.text:
+            entity.text = entity.text.replace('\r\n', '\n').replace('\r', '\n')
+
+    return dmrs_xml
+
+
+worker_cache = None
+
+
+def init_worker_cache(cache_filename):
+    global worker_cache
+    worker_cache = ConversionCache(cache_filename, readonly=True)
+
+
+def convert_chunk(mrs_chunk):
+    return [mrs_to_dmrs(mrs) for mrs in mrs_chunk]
+
+
+def convert_chunk_cached(mrs_chunk):
+    """
+    Convert a chunk of MRS in a worker process, reading from the worker's cache connection.
+    Cache updates are left to the main process, which is the only writer.
+    :return: List of (key, dmrs, hit) tuples. Key is None for skipped MRS.
+    """
+
+    results = []
+
+    for mrs in mrs_chunk:
+        if skipped_mrs(mrs):
+            results.append((None, mrs_to_dmrs(mrs), False))
+            continue
+
+        key = worker_cache.key(mrs)
+        dmrs = worker_cache.lookup(key)
+
+        if dmrs is not None:
+            results.append((key, dmrs, True))
+        else:
+            results.append((key, mrs_to_dmrs(mrs), False))
+
+    return results
+
+
+def update_cache(results, cache):
+    for key, dmrs, hit in results:
+        if key is not None:
+            cache.record(key, hit)
+
+            if not hit:
+                cache.put(key, dmrs)
+
+        yield dmrs
+
+
+def dmrs_to_mrs_line(dmrs, ignore_errors=False):
+    return dmrs_to_mrs(dmrs, ignore_errors=ignore_errors, pretty_print=False).encode('utf-8')
+
+
+def convert_chunk_reverse(dmrs_chunk, ignore_errors=False):
+    return [dmrs_to_mrs_line(dmrs, ignore_errors=ignore_errors) for dmrs in dmrs_chunk]
+
+
+def convert(mrs_iter, jobs=1, chunksize=100, max_inflight=None, cache=None, reverse=False, ignore_errors=False):
+    """
+    Convert a stream of MRS to DMRS, optionally spreading chunks of MRS across worker processes.
+    :param mrs_iter: Iterable of MRS strings (DMRS strings if reverse is True)
+    :param jobs: Number of worker processes. With 1, conversion is done in the current process.
+    :param chunksize: Number of MRS sent to a worker in a single task
+    :param max_inflight: Maximum number of chunks being converted or waiting to be written at any time
+    :param cache: ConversionCache object. Cached DMRS are returned without conversion. Not used in reverse mode.
+    :param reverse: Convert DMRS to single line, UTF-8 encoded MRS instead
+    :param ignore_errors: In reverse mode, return an empty MRS for DMRS that cannot be converted instead of raising
+    :return: Generator of DMRS strings (MRS strings if reverse is True) in input order
+    """
+
+    if reverse:
+        if jobs <= 1:
+            return (dmrs_to_mrs_line(dmrs, ignore_errors=ignore_errors) for dmrs in mrs_iter)
+
+        return imap_ordered(partial(convert_chunk_reverse, ignore_errors=ignore_errors), mrs_iter, jobs,
+                            chunksize=chunksize, max_inflight=max_inflight)
+
+    if jobs <= 1:
+        return (mrs_to_dmrs(mrs, cache=cache) for mrs in mrs_iter)
+
+    if cache is None:
+        return imap_ordered(convert_chunk, mrs_iter, jobs, chunksize=chunksize, max_inflight=max_inflight)
+
+    # Make entries added so far visible to worker processes
+    cache.connection.commit()
+
+    results = imap_ordered(convert_chunk_cached, mrs_iter, jobs, chunksize=chunksize, max_inflight=max_inflight,
+                           initializer=init_worker_cache, initargs=(cache.filename,))
+
+    return update_cache(results, cache)
+
+
+def open_output_file(filename, reverse=False):
+    """
+    Open a conversion output file. DMRS files with the binary extension are written as binary DMRS.
+    """
+
+    out = open_file(filename, 'wb')
+
+    if not reverse and is_binary_filename(filename):
+        out = BinaryWriter(out)
+
+    return out
+
+
+def write_converted(out, record, count, reverse=False):
+    """
+    Write a converted record to an output file opened with open_output_file.
+    :param out: Output file
+    :param record: DMRS string, or single line MRS string if reverse is True
+    :param count: Number of records written to the output file before
+    :param reverse: Write MRS one per line instead of DMRS separated by empty lines
+    """
+
+    if reverse:
+        out.write('%s\n' % record)
+
+    elif isinstance(out, BinaryWriter):
+        out.write(record)
+
+    else:
+        if count > 0:
+            out.write('\n\n')
+
+        out.write(record)
+
+
+def iter_dir_sources(tasks, reverse=False):
+    """
+    :param tasks: List of (input filename, output filename, file format) tuples
+    :param reverse: Read DMRS files instead of MRS files
+    :return: Generator of (task index, MRS string) tuples, or (task index, DMRS string) if reverse is True, over the
+     input files of all tasks in turn
+    """
+
+    for task_index, (input_filename, _, file_format) in enumerate(tasks):
+        if reverse:
+            sources = iter_dmrs_file(input_filename)
+        else:
+            sources = iter_file(input_filename, file_format)
+
+        for source in sources:
+            yield task_index, source
+
+
+def convert_dir(dirname, output_dirname, file_format='ace', file_suffix=None, jobs=1, chunksize=100,
+                max_inflight=None, cache=None, reverse=False, ignore_errors=False, shard=None):
+    """
+    Convert every file in a directory. The sentences of all files are converted as a single stream in chunks, so that
+    large files are spread across worker processes and small files do not leave them idle. Output files are written
+    in turn by the current process as their sentences come back in order, and progress is reported per file.
+    :param dirname: Input directory
+    :param output_dirname: Output directory
+    :param file_format: Format of the MRS files (ace or line)
+    :param file_suffix: Suffix appended to input filenames to create output filenames (default .dmrs, or .mrs if
+     reverse is True)
+    :param jobs: Number of worker processes. With 1, conversion is done in the current process.
+    :param chunksize: Number of MRS sent to a worker in a single task
+    :param max_inflight: Maximum number of chunks being converted or waiting to be written at any time
+    :param cache: ConversionCache object. Worker processes only read from it, the current process writes to it.
+    :param reverse: Convert DMRS files to single line MRS files instead
+    :param ignore_errors: In reverse mode, write an empty MRS for DMRS that cannot be converted instead of raising
+    :param shard: Tuple of (shard index, number of shards) selecting a subset of the files
+    :return: Number of converted sentences
+    """
+
+    if file_suffix is None:
+        file_suffix = '.mrs' if reverse else '.dmrs'
+
+    tasks = [(filename, os.path.join(output_dirname, os.path.basename(filename) + file_suffix), file_format)
+             for filename in select_shard(list_files(dirname), shard)]
+
+    # Task indices are read from a copy of the stream, which only buffers the sentences that are being converted
+    tagged_sources, sources = tee(iter_dir_sources(tasks, reverse))
+    records = convert((source for _, source in sources), jobs, chunksize, max_inflight, cache, reverse=reverse,
+                      ignore_errors=ignore_errors)
+
+    # Files without sentences have no group and are written empty
+    groups = groupby(izip((task_index for task_index, _ in tagged_sources), records), itemgetter(0))
+    group = next(groups, None)
+    total_count = 0
+
+    for task_index, (input_filename, output_filename, _) in enumerate(tasks):
+        start = time.time()
+        count = 0
+
+        with open_output_file(output_filename, reverse) as out:
+            if group is not None and group[0] == task_index:
+                for _, record in group[1]:
+                    write_converted(out, record, count, reverse)
+                    count += 1
+
+                group = next(groups, None)
+
+        sys.stderr.write('[%d/%d] %s: %d sentences in %.1fs\n' %
+                         (task_index + 1, len(tasks), input_filename, count, time.time() - start))
+        total_count += count
+
+    return total_count
+
+
+def iter_stdin():
+    while True:
+        try:
+            yield raw_input().decode('utf-8').strip()
+
+        except EOFError:
+            break
+
+
+def dmrs_to_mrs(dmrs, ignore_errors=False, pretty_print=True):
     if dmrs is None or dmrs == '' or dmrs == '<dmrs></dmrs>':
         return ''
 
+    if isinstance(dmrs, unicode):
+        dmrs = dmrs.encode('utf-8')
+
+    # Single DMRS needs to be wrapped into a DMRS list for pyDelphin
+    if not dmrs.startswith('<dmrs-list'):
+        dmrs = '<dmrs-list>%s</dmrs-list>' % dmrs
+
     try:
         dmrs_repr = dmrx.loads_one(dmrs)
-        mrs_string = simplemrs.dumps_one(dmrs_repr, pretty_print=True)
+        mrs_string = simplemrs.dumps_one(dmrs_repr, pretty_print=pretty_print)
         return mrs_string
 
-    except XDE:
+    except (XDE, ParseError, AttributeError, KeyError, ValueError):
+        # Malformed DMRS can fail anywhere in pyDelphin decoding, not only with XDE
+        if ignore_errors:
+            return ''
+
         raise
 
 
 def dmrs_modify(dmrs_string):
     # Load DMRS into XML
-    parser = xml.XMLParser(encoding='utf-8')
-    dmrs_xml = xml.fromstring(dmrs_string, parser=parser)[0]
+    dmrs_xml = xml.fromstring(dmrs_string)[0]
 
     return xml.tostring(dmrs_xml, encoding='utf-8')
     
@@ -125,57 +513,151 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(description='MRS to DMRS converter.')
     parser.add_argument('-i', '--input', default='-', help='Specify input file or directory. If left empty, program will read MRS from stdin, one per line.')
-    parser.add_argument('-o', '--output', default='-', help='Specify output file or directory. Output will mimic input to decide whether to create a file or directory. If left empty, program will read MRS from stdin, one per line.')
+    parser.add_argument('-o', '--output', default='-', help='Specify output file or directory. Output will mimic input to decide whether to create a file or directory. If left empty, program will read MRS from stdin, one per line. DMRS files ending in .dmrsb are written in the binary format.')
     parser.add_argument('-f', '--format', default='ace', choices=['ace', 'line'], help='Format of the MRS file(s).')
-    parser.add_argument('--suffix', default='.dmrs')
+    parser.add_argument('--suffix', default=None, help='Suffix appended to output filenames for directory input. '
+                                                       'Defaults to .dmrs, or .mrs with --reverse. Use .dmrsb to '
+                                                       'write binary DMRS.')
+    parser.add_argument('--ace', default=None,
+                        help='Run this ACE command line and convert its MRS output while it is still parsing. '
+                             'Input is then the file with sentences to parse, or stdin if left empty.')
+    parser.add_argument('-r', '--reverse', action='store_true',
+                        help='Convert DMRS to MRS instead. Input is read as DMRS, as binary DMRS if it ends in .dmrsb, and MRS are written one per line.')
+    parser.add_argument('--ignore_errors', action='store_true',
+                        help='In reverse mode, write an empty line for DMRS that cannot be converted instead of failing.')
+    parser.add_argument('-j', '--jobs', default=1, type=int, help='Number of worker processes used for conversion.')
+    parser.add_argument('--chunksize', default=100, type=int, help='Number of MRS sent to a worker process at once.')
+    parser.add_argument('--max_inflight', default=None, type=int,
+                        help='Maximum number of chunks in flight between the reader, workers and writer. Defaults to 2 * jobs.')
+    parser.add_argument('--cache', default=None,
+                        help='Persistent conversion cache file. Previously converted MRS are not converted again.')
+    parser.add_argument('--shard', default=None, type=parse_shard,
+                        help='Only convert shard i/N, i.e. sentences i, i + N, i + 2N, ... or, for directory input, '
+                             'files i, i + N, i + 2N, ... Shard outputs are combined with '
+                             'dmrs_preprocess/merge_shards.py.')
+    parser.add_argument('--cache_size', default=1000000, type=int,
+                        help='Maximum number of cached DMRS. Least recently used entries are evicted first.')
+    parser.add_argument('--xml_backend', default='auto', choices=xml.BACKENDS,
+                        help='XML parser and serializer. auto uses lxml if it is installed and ElementTree otherwise. '
+                             'Output is the same with every backend.')
 
     args = parser.parse_args()
 
-    if args.input == '-':
+    try:
+        xml.use_backend(args.xml_backend)
 
+    except ImportError as e:
+        parser.error(str(e))
+
+    if args.reverse and (is_binary_filename(args.output) or (args.suffix is not None and is_binary_filename(args.suffix))):
+        parser.error('MRS output cannot be written in the binary DMRS format.')
+
+    if args.cache is not None and not args.reverse:
+        cache = ConversionCache(args.cache, max_entries=args.cache_size)
+    else:
+        cache = None
+
+    if args.reverse:
+        record_format = '%s\n'
+    else:
+        record_format = '%s\n\n'
+
+    def read_input(filename):
+        if args.reverse:
+            return iter_dmrs_file(filename)
+        else:
+            return iter_file(filename, args.format)
+
+    def open_output():
         if args.output == '-':
-            output = sys.stdout
+            return sys.stdout
+        elif not args.reverse and is_binary_filename(args.output):
+            return BinaryWriter(open_file(args.output, 'wb'))
         else:
-            output = open(args.output, 'wb')
+            return open_file(args.output, 'wb')
 
-        while True:
-            try:
-                mrs = raw_input().decode('utf-8').strip()
-                dmrs = mrs_to_dmrs(mrs)
-                output.write('%s\n\n' % dmrs)
+    def write_output(out, record):
+        if isinstance(out, BinaryWriter):
+            out.write(record)
+        else:
+            out.write(record_format % record)
 
-            except EOFError:
-                break
+    def convert_input(source_iter):
+        return convert(select_shard(source_iter, args.shard), args.jobs, args.chunksize, args.max_inflight, cache,
+                       reverse=args.reverse, ignore_errors=args.ignore_errors)
 
-    elif os.path.isfile(args.input):
-        mrs_list = read_file(args.input, args.format)
+    def finish_shard(count):
+        if args.shard is not None and args.output != '-':
+            write_manifest(args.output, args.shard, count)
 
-        if args.output == '-':
-            out = sys.stdout
+    count = 0
+
+    if args.ace is not None:
+
+        out = open_output()
+
+        mrs_iter = iter_ace_process(args.ace, args.input if args.input != '-' else None)
+
+        for record in convert_input(mrs_iter):
+            write_output(out, record)
+            out.flush()
+            count += 1
+
+        if not args.output == '-':
+            out.close()
+
+        finish_shard(count)
+
+    elif args.input == '-':
+
+        output = open_output()
+
+        if args.reverse:
+            source = iter_dmrs(line.decode('utf-8') for line in sys.stdin)
         else:
-            out = open(args.output, 'wb')
+            source = iter_stdin()
+
+        for record in convert_input(source):
+            write_output(output, record)
+            count += 1
 
-        for mrs in mrs_list:
-            out.write('%s\n\n' %(mrs_to_dmrs(mrs)))
+        if not args.output == '-':
+            output.close()
+
+        finish_shard(count)
+
+    elif os.path.isfile(args.input):
+        out = open_output()
+
+        for record in convert_input(read_input(args.input)):
+            write_output(out, record)
+            count += 1
 
         if not args.output == '-':
             out.close()
 
+        finish_shard(count)
+
     elif os.path.isdir(args.input):
-        mrs_dict = read_dir(args.input, args.format, args.suffix)
-        dmrs_dict = dict((filename, mrs_to_dmrs(mrs)) for filename, mrs in mrs_dict.items())
 
         if args.output == '-':
-            for _, dmrs_list in dmrs_dict.items():
-                sys.stdout.write('%s\n\n' % '\n\n'.join(dmrs_list))
+            sources = chain.from_iterable(read_input(filename)
+                                          for filename in select_shard(list_files(args.input), args.shard))
+
+            for record in convert(sources, args.jobs, args.chunksize, args.max_inflight, cache,
+                                  reverse=args.reverse, ignore_errors=args.ignore_errors):
+                sys.stdout.write(record_format % record)
 
         else:
             make_sure_path_exists(args.output)
-            for filename, dmrs_list in dmrs_dict.items():
-                write_file(filename, dmrs_list)
+            convert_dir(args.input, args.output, args.format, args.suffix, args.jobs, args.chunksize,
+                        args.max_inflight, cache, reverse=args.reverse, ignore_errors=args.ignore_errors,
+                        shard=args.shard)
 
     else:
         print "Can't read input: %s" % args.input
         sys.exit()
 
-
+    if cache is not None:
+        cache.close()
+        sys.stderr.write('%s\n' % cache)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import argparse
+
+
+def read_chunks(filename):
+    """
+    :param filename: Saved ACE output
+    :return: List of SENT/SKIP chunks
+    """
+
+    with open(filename, 'rb') as f:
+        return [chunk for chunk in f.read().strip().split('\n\n') if chunk.strip()]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Stand-in for ACE that replays saved ACE output, writing the next '
+                                                 'SENT/SKIP chunk for every sentence read from stdin.')
+    parser.add_argument('replay', help='Saved ACE output.')
+    parser.add_argument('--piece', default=0, type=int,
+                        help='Write output in pieces of this many bytes, flushing after each, so that chunks arrive '
+                             'split at arbitrary points. Write whole chunks if 0.')
+    parser.add_argument('--wait', default=None,
+                        help='After the first chunk, wait until this file exists before writing the rest.')
+    parser.add_argument('--exit', default=0, type=int, help='Exit status.')
+
+    args = parser.parse_args()
+
+    chunks = read_chunks(args.replay)
+
+    for index, line in enumerate(iter(sys.stdin.readline, '')):
+        if index >= len(chunks):
+            break
+
+        output = chunks[index] + '\n\n'
+        piece = args.piece or len(output)
+
+        for start in xrange(0, len(output), piece):
+            sys.stdout.write(output[start:start + piece])
+            sys.stdout.flush()
+
+        if index == 0 and args.wait is not None:
+            while not os.path.exists(args.wait):
+                time.sleep(0.01)
+
+    sys.exit(args.exit)
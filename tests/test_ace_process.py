@@ -0,0 +1,111 @@
+import os
+import sys
+import pipes
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'mrs_to_dmrs'))
+
+import mrs_to_dmrs
+
+
+FAKE_ACE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_ace.py')
+
+ACE_OUTPUT = '''SENT: the dog barks
+[ LTOP: h0 INDEX: e2 [ e SF: prop TENSE: pres MOOD: indicative PROG: - PERF: - ] RELS: < [ _the_q<0:3> LBL: h4 ARG0: x3 [ x PERS: 3 NUM: sg IND: + ] RSTR: h5 BODY: h6 ]  [ "_dog_n_1_rel"<4:7> LBL: h7 ARG0: x3 ]  [ "_bark_v_1_rel"<8:14> LBL: h1 ARG0: e2 ARG1: x3 ] > HCONS: < h0 qeq h1 h5 qeq h7 > ]
+
+SKIP: some unparsable sentence
+
+SENT: Kim sleeps
+[ LTOP: h0 INDEX: e2 [ e SF: prop TENSE: pres MOOD: indicative PROG: - PERF: - ] RELS: < [ proper_q<0:3> LBL: h4 ARG0: x3 [ x PERS: 3 NUM: sg IND: + ] RSTR: h5 BODY: h6 ]  [ named<0:3> LBL: h7 ARG0: x3 CARG: "Kim" ]  [ "_sleep_v_1_rel"<4:10> LBL: h1 ARG0: e2 ARG1: x3 ] > HCONS: < h0 qeq h1 h5 qeq h7 > ]
+
+SKIP: another unparsable sentence
+
+'''
+
+SENTENCES = 'the dog barks\nsome unparsable sentence\nKim sleeps\nanother unparsable sentence\n'
+
+
+class AceProcessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        self.replay_filename = os.path.join(self.directory, 'replay.ace')
+        with open(self.replay_filename, 'wb') as f:
+            f.write(ACE_OUTPUT)
+
+        self.input_filename = os.path.join(self.directory, 'sentences.txt')
+        with open(self.input_filename, 'wb') as f:
+            f.write(SENTENCES)
+
+        self.expected = list(mrs_to_dmrs.iter_file(self.replay_filename, 'ace'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def command(self, *options):
+        return ' '.join(pipes.quote(arg) for arg in (sys.executable, FAKE_ACE, self.replay_filename) + options)
+
+    def test_whole_chunks(self):
+        mrs = list(mrs_to_dmrs.iter_ace_process(self.command(), self.input_filename))
+
+        self.assertEqual(mrs, self.expected)
+        self.assertEqual([m is None for m in mrs], [False, True, False, True])
+
+    def test_chunk_boundaries(self):
+        # Pieces split chunks inside lines, between the lines of a chunk and between the two newlines ending a chunk
+        for piece in (1, 2, 7, 64):
+            mrs = list(mrs_to_dmrs.iter_ace_process(self.command('--piece', str(piece)), self.input_filename))
+            self.assertEqual(mrs, self.expected, 'MRS differ with pieces of %d bytes' % piece)
+
+    def test_streaming(self):
+        # ACE only continues after the first MRS has been received
+        marker = os.path.join(self.directory, 'received')
+        mrs_iter = mrs_to_dmrs.iter_ace_process(self.command('--wait', marker), self.input_filename)
+
+        self.assertEqual(next(mrs_iter), self.expected[0])
+
+        open(marker, 'wb').close()
+        self.assertEqual(list(mrs_iter), self.expected[1:])
+
+    def test_exit_status(self):
+        mrs = []
+
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            for m in mrs_to_dmrs.iter_ace_process(self.command('--exit', '3'), self.input_filename):
+                mrs.append(m)
+
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertEqual(mrs, self.expected)
+
+    def test_early_close(self):
+        # ACE would wait for the marker forever and then fail, so closing must stop it without checking its status
+        marker = os.path.join(self.directory, 'received')
+        mrs_iter = mrs_to_dmrs.iter_ace_process(self.command('--wait', marker, '--exit', '3'), self.input_filename)
+
+        self.assertEqual(next(mrs_iter), self.expected[0])
+        mrs_iter.close()
+
+    def test_consumer_error(self):
+        mrs_iter = mrs_to_dmrs.iter_ace_process(self.command('--exit', '3'), self.input_filename)
+
+        with self.assertRaises(ValueError):
+            for _ in mrs_iter:
+                raise ValueError('conversion failed')
+
+        mrs_iter.close()
+
+    def test_conversion(self):
+        dmrs = list(mrs_to_dmrs.convert(mrs_to_dmrs.iter_ace_process(self.command('--piece', '5'),
+                                                                     self.input_filename)))
+
+        self.assertEqual(dmrs, [mrs_to_dmrs.mrs_to_dmrs(mrs) for mrs in self.expected])
+        self.assertEqual(dmrs[1], '<dmrs></dmrs>')
+
+
+if __name__ == '__main__':
+    unittest.main()
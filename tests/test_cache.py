@@ -0,0 +1,64 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+from cache import ConversionCache
+
+
+class ConversionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def count(self, cache):
+        return cache.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def test_evict_least_recently_used(self):
+        cache = ConversionCache(self.filename, max_entries=10)
+
+        for index in xrange(10):
+            cache.put(str(index), 'value %d' % index)
+
+        cache.get('0')
+        cache.put('10', 'value 10')
+
+        self.assertEqual(self.count(cache), 9)
+        self.assertEqual(cache.size, 9)
+        self.assertEqual(cache.lookup('0'), 'value 0')
+        self.assertIsNone(cache.lookup('1'))
+        cache.close()
+
+    def test_evict_counts_entries_of_other_writers(self):
+        cache = ConversionCache(self.filename, max_entries=10)
+        other = ConversionCache(self.filename, max_entries=10)
+
+        for index in xrange(8):
+            other.put('other %d' % index, 'value')
+
+        other.connection.commit()
+
+        # This connection still counts its own 3 entries only, but the cache file holds 11
+        for index in xrange(3):
+            cache.put('own %d' % index, 'value')
+
+        self.assertEqual(cache.size, 3)
+        cache.evict()
+
+        self.assertEqual(self.count(cache), 9)
+        self.assertEqual(cache.size, 9)
+
+        other.close()
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
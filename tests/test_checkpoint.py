@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+from checkpoint import CheckpointError, save_checkpoint, load_checkpoint
+from pipeline import Pipeline
+
+
+INPUTS = ['/data/in.dmrs', '/data/in.untok', '/data/in.tok', '/data/out.dmrs']
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'checkpoint')
+        self.stage_keys = Pipeline([('handle_ltop', {}), ('cycle_remove', {'realization': False})]).prefix_keys
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_missing_checkpoint(self):
+        self.assertEqual(load_checkpoint(self.filename, INPUTS, (1, 4), self.stage_keys), (0, 0, None))
+
+    def test_same_run(self):
+        save_checkpoint(self.filename, 2000, 123456, INPUTS, (1, 4), self.stage_keys)
+        self.assertEqual(load_checkpoint(self.filename, INPUTS, (1, 4), self.stage_keys), (2000, 123456, None))
+
+        save_checkpoint(self.filename, 3000, 234567, INPUTS, None, self.stage_keys)
+        self.assertEqual(load_checkpoint(self.filename, INPUTS, None, self.stage_keys), (3000, 234567, None))
+
+    def test_random_state(self):
+        rng = random.Random(0)
+        rng.random()
+        state = rng.getstate()
+        expected = [rng.random() for _ in xrange(5)]
+
+        save_checkpoint(self.filename, 2000, 123456, INPUTS, None, self.stage_keys, state)
+        restored = load_checkpoint(self.filename, INPUTS, None, self.stage_keys)[2]
+
+        self.assertEqual(restored, state)
+
+        rng.setstate(restored)
+        self.assertEqual([rng.random() for _ in xrange(5)], expected)
+
+    def test_different_inputs(self):
+        save_checkpoint(self.filename, 2000, 123456, INPUTS, None, self.stage_keys)
+
+        with self.assertRaises(CheckpointError):
+            load_checkpoint(self.filename, INPUTS[:3] + ['/data/other.dmrs'], None, self.stage_keys)
+
+    def test_different_shard(self):
+        save_checkpoint(self.filename, 2000, 123456, INPUTS, (1, 4), self.stage_keys)
+
+        for shard in (None, (2, 4), (1, 3)):
+            with self.assertRaises(CheckpointError):
+                load_checkpoint(self.filename, INPUTS, shard, self.stage_keys)
+
+    def test_different_stage_options(self):
+        save_checkpoint(self.filename, 2000, 123456, INPUTS, None, self.stage_keys)
+
+        for stages in ([('handle_ltop', {})],
+                       [('handle_ltop', {}), ('cycle_remove', {'realization': True})],
+                       [('handle_ltop', {}), ('cycle_remove', {'realization': False}), ('strip_source', {})]):
+            with self.assertRaises(CheckpointError):
+                load_checkpoint(self.filename, INPUTS, None, Pipeline(stages).prefix_keys)
+
+    def test_checkpoint_without_shard_and_stages(self):
+        # Checkpoints written before shards and stage keys were recorded cannot be resumed safely
+        with open(self.filename, 'wb') as f:
+            json.dump({'sentences': 2000, 'output_offset': 123456, 'inputs': INPUTS}, f)
+
+        with self.assertRaises(CheckpointError):
+            load_checkpoint(self.filename, INPUTS, None, self.stage_keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
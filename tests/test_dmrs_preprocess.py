@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmark'))
+
+import filter_gpred
+import xml_backend as xml
+from dmrs_preprocess import iter_file, process
+from pipeline import Pipeline, preset_pipeline
+from utility import strip_source_information
+
+from generate import CorpusGenerator, write_corpus
+
+
+PREPROCESS_DIR = os.path.join(ROOT, 'dmrs_preprocess')
+
+GPRED_FILTER_FILE = os.path.join(PREPROCESS_DIR, 'config', 'gpred_filter')
+
+SANITY_CHECK_OPTIONS = ['--realization_sanity_check', '-l', '-r', '--cycle_remove', '-f', GPRED_FILTER_FILE]
+
+OPTIONS = ['-l', '-r', '--cycle_remove', '-f', GPRED_FILTER_FILE]
+
+
+class StripSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = list(CorpusGenerator(nodes=20, seed=1).corpus(20))
+        self.pipeline = Pipeline([('handle_ltop', {}), ('label', {}), ('strip_source', {})])
+
+    def test_module_rng(self):
+        # Without an explicit RNG, sentences are shuffled in turn by the module RNG, as by a serial run
+        prefix = Pipeline([('handle_ltop', {}), ('label', {})])
+        rng = random.Random(0)
+        expected = [xml.tostring(strip_source_information(xml.fromstring(prefix.run(dmrs, untok, tok)), rng),
+                                 encoding='utf-8')
+                    for dmrs, untok, tok in self.corpus]
+
+        random.seed(0)
+        self.assertEqual([self.pipeline.run(dmrs, untok, tok) for dmrs, untok, tok in self.corpus], expected)
+
+    def test_strips_source_information(self):
+        for dmrs, untok, tok in self.corpus:
+            stripped = self.pipeline.run(dmrs, untok, tok)
+
+            self.assertNotRegexpMatches(stripped, '<node [^>]*cfrom=')
+            self.assertRegexpMatches(stripped, '<node [^>]*nodeid="10000"')
+
+
+class ProcessTest(unittest.TestCase):
+
+    def test_options_of_every_call(self):
+        dmrs, untok, tok = next(CorpusGenerator(nodes=20, seed=3).corpus(1))
+        labelled = process(dmrs, untok, tok, label_opt=True, handle_ltop_opt=True)
+
+        # Calls with different options are not served by the pipeline of an earlier call
+        self.assertEqual(process(dmrs, untok, tok, handle_ltop_opt=True),
+                         Pipeline([('handle_ltop', {})]).run(dmrs, untok, tok))
+        self.assertNotEqual(process(dmrs, untok, tok, handle_ltop_opt=True), labelled)
+
+    def test_pipeline(self):
+        pipeline = preset_pipeline(label_opt=True, handle_ltop_opt=True, cycle_remove_opt=True)
+
+        for dmrs, untok, tok in CorpusGenerator(nodes=20, seed=3).corpus(5):
+            self.assertEqual(process(dmrs, untok, tok, pipeline=pipeline),
+                             process(dmrs, untok, tok, label_opt=True, handle_ltop_opt=True, cycle_remove_opt=True))
+
+
+class SanityCheckOutputTest(unittest.TestCase):
+    """
+    Output under --realization_sanity_check must be the same as that of a serial run shuffling every sentence in turn
+    with the RNG seeded once.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+
+        cls.corpus = list(CorpusGenerator(nodes=20, seed=1).corpus(40))
+        cls.prefix = os.path.join(cls.directory, 'corpus')
+        write_corpus(cls.prefix, cls.corpus)
+        cls.inputs = [cls.prefix + '.dmrs', cls.prefix + '.untok', cls.prefix + '.tok']
+
+        pipeline = preset_pipeline(label_opt=True, handle_ltop_opt=True, cycle_remove_opt=True,
+                                   gpred_filter=filter_gpred.parse_gpred_filter_file(GPRED_FILTER_FILE),
+                                   realization_sanity_check=True)
+
+        random.seed(0)
+        cls.expected = ''.join('%s\n\n' % pipeline.run(dmrs, untok, tok)
+                               for dmrs, untok, tok in zip(iter_file(cls.inputs[0], 'dmrs'),
+                                                           iter_file(cls.inputs[1], 'untok'),
+                                                           iter_file(cls.inputs[2], 'tok')))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    @classmethod
+    def preprocess(cls, output, *options):
+        """
+        Run dmrs_preprocess.py with the sanity check options.
+        :return: Exit status and output file content
+        """
+
+        output = os.path.join(cls.directory, output)
+        command = [sys.executable, 'dmrs_preprocess.py'] + SANITY_CHECK_OPTIONS + list(options) + cls.inputs + [output]
+
+        with open(os.devnull, 'wb') as devnull:
+            status = subprocess.call(command, cwd=PREPROCESS_DIR, stderr=devnull)
+
+        if not os.path.exists(output):
+            return status, None
+
+        with open(output, 'rb') as f:
+            return status, f.read()
+
+    def test_serial(self):
+        self.assertEqual(self.preprocess('serial.dmrs'), (0, self.expected))
+
+    def test_resume(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+
+        # Interrupt after 20 sentences by running on the first half of the inputs, then resume on the whole inputs
+        write_corpus(self.prefix, self.corpus[:20])
+        try:
+            status, _ = self.preprocess('resumed.dmrs', '--checkpoint', checkpoint, '--checkpoint_interval', '7')
+            self.assertEqual(status, 0)
+        finally:
+            write_corpus(self.prefix, self.corpus)
+
+        self.assertEqual(self.preprocess('resumed.dmrs', '--checkpoint', checkpoint, '--resume'), (0, self.expected))
+
+    def test_parallel_runs_refused(self):
+        queue = os.path.join(self.directory, 'queue')
+        cache = os.path.join(self.directory, 'stages.cache')
+
+        for options in (['-j', '3'], ['--shard', '0/3'], ['--queue', queue], ['--stage_cache', cache]):
+            status, output = self.preprocess('refused.dmrs', *options)
+
+            self.assertEqual(status, 2, 'Sanity check run with %s was not refused' % ' '.join(options))
+            self.assertIsNone(output)
+
+
+class CombinedOptionsTest(unittest.TestCase):
+    """
+    Workers, the work queue, the stage cache and the profile and cycle reports can be combined without changing the
+    output.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+
+        corpus = list(CorpusGenerator(nodes=20, seed=2).corpus(30))
+        prefix = os.path.join(cls.directory, 'corpus')
+        write_corpus(prefix, corpus)
+        cls.inputs = [prefix + '.dmrs', prefix + '.untok', prefix + '.tok']
+
+        pipeline = preset_pipeline(label_opt=True, handle_ltop_opt=True, cycle_remove_opt=True,
+                                   gpred_filter=filter_gpred.parse_gpred_filter_file(GPRED_FILTER_FILE))
+
+        cls.expected = ''.join('%s\n\n' % pipeline.run(dmrs, untok, tok) for dmrs, untok, tok in corpus)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def preprocess(self, output, *options):
+        command = [sys.executable, 'dmrs_preprocess.py'] + OPTIONS + list(options) + self.inputs + [self.path(output)]
+
+        with open(os.devnull, 'wb') as devnull:
+            self.assertEqual(subprocess.call(command, cwd=PREPROCESS_DIR, stderr=devnull), 0)
+
+        with open(self.path(output), 'rb') as f:
+            self.assertEqual(f.read(), self.expected)
+
+    def load_report(self, name):
+        with open(self.path(name), 'rb') as f:
+            return json.load(f)
+
+    def test_queue_workers(self):
+        self.preprocess('queue.dmrs', '--queue', self.path('queue'), '--queue_chunksize', '10', '-j', '2',
+                        '--chunksize', '4', '--stage_cache', self.path('queue.cache'), '--profile',
+                        self.path('queue.profile'), '--cycle_stats', self.path('queue.cycles'))
+
+        self.assertEqual(self.load_report('queue.profile')['sentences'], 30)
+
+        cycles = self.load_report('queue.cycles')
+        self.assertEqual(cycles['sentences'] + cycles['empty'], 30)
+        self.assertEqual(cycles['cached'], 0)
+
+    def test_cached_reports(self):
+        self.preprocess('cold.dmrs', '--stage_cache', self.path('reports.cache'))
+        self.preprocess('warm.dmrs', '--stage_cache', self.path('reports.cache'), '--profile',
+                        self.path('warm.profile'), '--cycle_stats', self.path('warm.cycles'))
+
+        profile = self.load_report('warm.profile')
+        cycles = self.load_report('warm.cycles')
+
+        # Every sentence is restored from the cache, so neither stages nor cycles are recorded
+        self.assertEqual(profile['sentences'], 30)
+        self.assertEqual(profile['stages'].keys(), ['cache'])
+        self.assertEqual(cycles['cached'] + cycles['empty'], 30)
+        self.assertEqual(cycles['sentences'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as etree
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'mrs_to_dmrs'))
+
+from delphin.mrs import simplemrs, dmrx
+
+import mrs_to_dmrs
+import xml_backend
+from cache import ConversionCache
+
+
+SENTENCE_MRS = ('[ LTOP: h0 INDEX: e2 [ e SF: prop TENSE: pres MOOD: indicative PROG: - PERF: - ] '
+                'RELS: < [ _the_q<0:3> LBL: h4 ARG0: x3 [ x PERS: 3 NUM: sg IND: + ] RSTR: h5 BODY: h6 ]  '
+                '[ "_dog_n_1_rel"<4:7> LBL: h7 ARG0: x3 ]  '
+                '[ "_bark_v_1_rel"<8:14> LBL: h1 ARG0: e2 ARG1: x3 ] > '
+                'HCONS: < h0 qeq h1 h5 qeq h7 > ]')
+
+CONJUNCTION_MRS = ('[ LTOP: h0 INDEX: e2 [ e SF: prop TENSE: past MOOD: indicative PROG: - PERF: - ] '
+                   'RELS: < [ proper_q<0:3> LBL: h4 ARG0: x3 [ x PERS: 3 NUM: sg IND: + ] RSTR: h5 BODY: h6 ]  '
+                   '[ named<0:3> LBL: h7 ARG0: x3 CARG: "Kim" ]  '
+                   '[ "_sing_v_1_rel"<4:8> LBL: h8 ARG0: e9 [ e SF: prop TENSE: past ] ARG1: x3 ]  '
+                   '[ "_and_c_rel"<9:12> LBL: h1 ARG0: e2 L-INDEX: e9 R-INDEX: e10 L-HNDL: h8 R-HNDL: h11 ]  '
+                   '[ "_dance_v_1_rel"<13:20> LBL: h11 ARG0: e10 [ e SF: prop TENSE: past ] ARG1: x3 ] > '
+                   'HCONS: < h0 qeq h1 h5 qeq h7 > ]')
+
+SPECIAL_CHARACTERS_MRS = ('[ LTOP: h0 INDEX: e2 [ e SF: prop TENSE: pres MOOD: indicative PROG: - PERF: - ] '
+                          'RELS: < [ proper_q<0:3> LBL: h4 ARG0: x3 [ x PERS: 3 NUM: sg IND: + ] RSTR: h5 BODY: h6 ]  '
+                          '[ named<0:3> LBL: h7 ARG0: x3 CARG: "Kim&<>\\"" ]  '
+                          '[ "_sleep_v_1_rel"<8:14> LBL: h1 ARG0: e2 ARG1: x3 ] > '
+                          'HCONS: < h0 qeq h1 h5 qeq h7 > ]')
+
+WHITESPACE_CARG_MRS = ('[ LTOP: h0 INDEX: e2 [ e SF: prop TENSE: pres MOOD: indicative PROG: - PERF: - ] '
+                       'RELS: < [ proper_q<0:3> LBL: h4 ARG0: x3 [ x PERS: 3 NUM: sg IND: + ] RSTR: h5 BODY: h6 ]  '
+                       '[ named<0:3> LBL: h7 ARG0: x3 CARG: "a\tb\r\nc\rd" ]  '
+                       '[ "_sleep_v_1_rel"<8:14> LBL: h1 ARG0: e2 ARG1: x3 ] > '
+                       'HCONS: < h0 qeq h1 h5 qeq h7 > ]')
+
+EMPTY_MRS = '[ LTOP: h0 INDEX: e2 RELS: < > HCONS: < > ]'
+
+
+def round_trip_dmrs(mrs):
+    """
+    Convert MRS to DMRS the way mrs_to_dmrs did before encode_dmrs: pretty print a <dmrs-list>, parse it back and
+    serialize its first child.
+    """
+
+    dmrs_string = dmrx.dumps_one(simplemrs.loads_one(mrs), pretty_print=True)
+
+    parser = etree.XMLParser(encoding='utf-8')
+    dmrs_xml = etree.fromstring(dmrs_string.encode('utf-8'), parser=parser)[0]
+    return etree.tostring(dmrs_xml, encoding='utf-8')
+
+
+class EncodeDmrsTest(unittest.TestCase):
+
+    def tearDown(self):
+        xml_backend.use_backend('auto')
+
+    def assert_same_as_round_trip(self, mrs):
+        expected = round_trip_dmrs(mrs)
+
+        for backend in ('etree', 'lxml'):
+            if backend == 'lxml' and xml_backend.lxml_etree is None:
+                continue
+
+            xml_backend.use_backend(backend)
+            self.assertEqual(mrs_to_dmrs.mrs_to_dmrs(mrs), expected, 'Output differs with %s' % backend)
+
+    def test_sentence(self):
+        self.assert_same_as_round_trip(SENTENCE_MRS)
+
+    def test_conjunction(self):
+        self.assert_same_as_round_trip(CONJUNCTION_MRS)
+
+    def test_special_characters(self):
+        self.assert_same_as_round_trip(SPECIAL_CHARACTERS_MRS)
+
+    def test_carg_with_tabs_and_carriage_returns(self):
+        self.assert_same_as_round_trip(WHITESPACE_CARG_MRS)
+
+    def test_empty_mrs(self):
+        self.assert_same_as_round_trip(EMPTY_MRS)
+
+    def test_skipped_mrs(self):
+        for mrs in (None, '', 'SKIP: some unparsable sentence'):
+            self.assertEqual(mrs_to_dmrs.mrs_to_dmrs(mrs), '<dmrs></dmrs>')
+
+
+class ConvertDirTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_dirname = os.path.join(self.directory, 'mrs')
+        self.output_dirname = os.path.join(self.directory, 'dmrs')
+        os.mkdir(self.input_dirname)
+        os.mkdir(self.output_dirname)
+
+        lines = [SENTENCE_MRS, CONJUNCTION_MRS, 'SKIP: some unparsable sentence', EMPTY_MRS, SPECIAL_CHARACTERS_MRS]
+
+        # A file spanning several chunks, an empty file and a file sharing a chunk with the end of the first one
+        for name, count in (('a', 23), ('b', 0), ('c', 2)):
+            with open(os.path.join(self.input_dirname, name), 'wb') as f:
+                f.write('\n'.join(lines[index % len(lines)] for index in xrange(count)))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assert_outputs(self):
+        for name in ('a', 'b', 'c'):
+            expected = '\n\n'.join(mrs_to_dmrs.mrs_to_dmrs(mrs) for mrs in
+                                    mrs_to_dmrs.iter_file(os.path.join(self.input_dirname, name), 'line'))
+
+            with open(os.path.join(self.output_dirname, name + '.dmrs'), 'rb') as f:
+                self.assertEqual(f.read(), expected, 'Output of %s differs' % name)
+
+    def test_chunks_across_files(self):
+        count = mrs_to_dmrs.convert_dir(self.input_dirname, self.output_dirname, 'line', jobs=2, chunksize=4)
+
+        # The empty file is read as a single skipped sentence
+        self.assertEqual(count, 26)
+        self.assert_outputs()
+
+    def test_cache(self):
+        for run in xrange(2):
+            cache = ConversionCache(os.path.join(self.directory, 'cache.sqlite'))
+            mrs_to_dmrs.convert_dir(self.input_dirname, self.output_dirname, 'line', jobs=2, chunksize=4,
+                                    cache=cache)
+            cache.close()
+
+            self.assert_outputs()
+
+        # Skipped sentences are not cached
+        self.assertEqual((cache.hits, cache.misses), (20, 0))
+
+    def test_reverse_suffix(self):
+        mrs_dirname = os.path.join(self.directory, 'reverse')
+        os.mkdir(mrs_dirname)
+
+        mrs_to_dmrs.convert_dir(self.input_dirname, self.output_dirname, 'line')
+        mrs_to_dmrs.convert_dir(self.output_dirname, mrs_dirname, reverse=True)
+
+        self.assertEqual(sorted(os.listdir(mrs_dirname)), ['a.dmrs.mrs', 'b.dmrs.mrs', 'c.dmrs.mrs'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+from profiling import CycleStatistics, percentile
+
+
+class PercentileTest(unittest.TestCase):
+
+    def test_exact_ranks(self):
+        values = range(1, 101)
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+
+    def test_rounds_rank_up(self):
+        values = range(1, 21)
+
+        self.assertEqual(percentile(values, 50), 10)
+        self.assertEqual(percentile(values, 95), 19)
+        self.assertEqual(percentile(values, 99), 20)
+
+    def test_small_lists(self):
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([7], 0), 7)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([1, 2], 50), 1)
+        self.assertEqual(percentile([1, 2], 51), 2)
+
+
+class CycleStatisticsTest(unittest.TestCase):
+
+    def test_cached_sentences(self):
+        stats = CycleStatistics()
+        stats.record(0, [('pattern', 0.5), ('pattern', 0.25)])
+        stats.record(1, None)
+        stats.record(2, None, cached=True)
+        stats.record(3, [])
+
+        report = stats.report()
+
+        self.assertEqual((report['sentences'], report['empty'], report['cached']), (2, 1, 1))
+        self.assertEqual(report['cycles'], 2)
+        self.assertEqual(report['patterns']['pattern']['sentences'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
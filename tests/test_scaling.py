@@ -0,0 +1,24 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmark'))
+
+import scaling
+
+
+@unittest.skipUnless(os.environ.get('SCALING_TESTS'), 'takes several minutes, set SCALING_TESTS=1 to run it')
+class ScalingTest(unittest.TestCase):
+
+    def test_budgets(self):
+        results = scaling.check_scaling(scaling.SIZES)
+
+        exceeded = ['%s grows with exponent %.2f, budget %.2f' % (name, result['exponent'], result['budget'])
+                    for name, result in results.items() if not result['passed']]
+
+        self.assertEqual(exceeded, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dmrs_preprocess'))
+
+from work_queue import WorkQueue, run_worker
+
+
+SENTENCES = [('<dmrs id="%d"></dmrs>' % index, u'', []) for index in xrange(10)]
+
+
+class CountingQueue(WorkQueue):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingQueue, self).__init__(*args, **kwargs)
+        self.merges = 0
+
+    def merge(self, output_filename):
+        self.merges += 1
+        super(CountingQueue, self).merge(output_filename)
+
+
+class RacingQueue(CountingQueue):
+    """
+    Queue whose merge lease is taken, used and released by another worker between the merged check and the claim.
+    """
+
+    def __init__(self, other, output_filename, *args, **kwargs):
+        super(RacingQueue, self).__init__(*args, **kwargs)
+        self.other = other
+        self.output_filename = output_filename
+
+    def claim(self, name):
+        if name == 'merge' and self.other.claim('merge'):
+            self.other.merge(self.output_filename)
+            self.other.release('merge')
+
+        return super(RacingQueue, self).claim(name)
+
+
+class CompletingQueue(CountingQueue):
+    """
+    Queue whose chunks are completed by another worker between the is_done check and the claim.
+    """
+
+    def __init__(self, other, *args, **kwargs):
+        super(CompletingQueue, self).__init__(*args, **kwargs)
+        self.other = other
+
+    def claim(self, name):
+        if name.startswith('chunk-') and self.other.claim(name):
+            chunk_index = int(name[len('chunk-'):])
+            chunk = SENTENCES[chunk_index * self.chunk_size:(chunk_index + 1) * self.chunk_size]
+            self.other.complete(chunk_index, ['%s\n\n' % dmrs for dmrs, _, _ in chunk])
+
+        return super(CompletingQueue, self).claim(name)
+
+
+class RunWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.queue_dirname = os.path.join(self.directory, 'queue')
+        self.output_filename = os.path.join(self.directory, 'output.dmrs')
+        self.inputs = ['/data/in.dmrs', '/data/in.untok', '/data/in.tok']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_queue(self, cls=CountingQueue, *args):
+        return cls(*(args + (self.queue_dirname, self.inputs)), chunk_size=3, lease_timeout=60)
+
+    def run_worker(self, queue):
+        return run_worker(queue, lambda: iter(SENTENCES), lambda first, chunk: (dmrs for dmrs, _, _ in chunk),
+                          self.output_filename, poll_interval=0)
+
+    def assert_output(self):
+        with open(self.output_filename, 'rb') as f:
+            self.assertEqual(f.read(), ''.join('%s\n\n' % dmrs for dmrs, _, _ in SENTENCES))
+
+    def test_single_worker(self):
+        queue = self.create_queue()
+
+        self.assertEqual(self.run_worker(queue), 4)
+        self.assertEqual(queue.merges, 1)
+        self.assertTrue(queue.merged())
+        self.assert_output()
+
+    def test_merged_while_claiming(self):
+        other = self.create_queue()
+        other.worker_id += '.other'
+
+        queue = self.create_queue(RacingQueue, other, self.output_filename)
+
+        self.run_worker(queue)
+
+        self.assertEqual(other.merges, 1)
+        self.assertEqual(queue.merges, 0)
+        self.assertFalse(os.path.exists(os.path.join(self.queue_dirname, 'merge.lease')))
+        self.assert_output()
+
+    def test_completed_while_claiming(self):
+        other = self.create_queue()
+        other.worker_id += '.other'
+
+        queue = self.create_queue(CompletingQueue, other)
+
+        self.assertEqual(self.run_worker(queue), 0)
+        self.assertEqual([name for name in os.listdir(self.queue_dirname) if name.endswith('.lease')], [])
+        self.assert_output()
+
+    def test_renew_taken_over_lease(self):
+        queue = self.create_queue()
+        other = self.create_queue()
+        other.worker_id += '.other'
+
+        self.assertTrue(queue.claim('chunk-00000000'))
+        self.assertTrue(queue.renew('chunk-00000000'))
+
+        # The lease expired and another worker took it over
+        os.remove(os.path.join(self.queue_dirname, 'chunk-00000000.lease'))
+        self.assertTrue(other.claim('chunk-00000000'))
+
+        self.assertFalse(queue.renew('chunk-00000000'))
+        queue.release('chunk-00000000')
+        self.assertTrue(other.owns('chunk-00000000'))
+
+
+if __name__ == '__main__':
+    unittest.main()